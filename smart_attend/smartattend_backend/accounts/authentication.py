@@ -0,0 +1,25 @@
+from rest_framework.authtoken.models import Token
+
+
+def get_token_key(request):
+    """
+    Read a DRF token from the ``Authorization: Token <key>`` header, falling
+    back to a ``token`` query parameter for clients such as EventSource that
+    cannot set headers.
+    """
+    header = request.headers.get('Authorization', '')
+    parts = header.split()
+    if len(parts) == 2 and parts[0].lower() == 'token':
+        return parts[1]
+    return request.GET.get('token')
+
+
+async def aget_user_from_token(request):
+    key = get_token_key(request)
+    if not key:
+        return None
+    try:
+        token = await Token.objects.select_related('user').aget(key=key)
+    except Token.DoesNotExist:
+        return None
+    return token.user if token.user.is_active else None
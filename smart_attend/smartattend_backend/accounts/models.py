@@ -9,7 +9,7 @@ class User(AbstractUser):
         ('student', 'Student'),
     )
     
-    role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES, db_index=True)
     semester = models.CharField(max_length=20, blank=True, null=True)
     course = models.CharField(max_length=100, blank=True, null=True)
     section = models.CharField(max_length=10, blank=True, null=True)
@@ -6,8 +6,16 @@ from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate
 from .models import User
 from .serializers import UserSerializer, LoginSerializer, UserProfileSerializer
+from core.budgets import query_budget
+from core.throttling import throttle_scope
+from core.versioning import conditional
 
 
+def profile_scopes(request):
+    return [f"user:{request.user.id}"]
+
+
+@query_budget(7)
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def register_user(request):
@@ -22,6 +30,8 @@ def register_user(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@query_budget(2)
+@throttle_scope('login', field='email')
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def login_user(request):
@@ -36,6 +46,7 @@ def login_user(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@query_budget(2)
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def logout_user(request):
@@ -46,13 +57,16 @@ def logout_user(request):
         return Response({'error': 'Failed to logout.'}, status=status.HTTP_400_BAD_REQUEST)
 
 
+@query_budget(2)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional(profile_scopes)
 def user_profile(request):
     serializer = UserProfileSerializer(request.user)
     return Response(serializer.data)
 
 
+@query_budget(3)
 @api_view(['PUT'])
 @permission_classes([IsAuthenticated])
 def update_profile(request):
@@ -63,6 +77,7 @@ def update_profile(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@query_budget(2)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_students(request):
@@ -74,6 +89,7 @@ def get_students(request):
     return Response(serializer.data)
 
 
+@query_budget(2)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_teachers(request):
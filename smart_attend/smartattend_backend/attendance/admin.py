@@ -1,23 +1,55 @@
 from django.contrib import admin
+from core.changelists import AutocompleteFilter, LargeTableAdmin
+from .checkin import set_presence
 from .models import AttendanceSession, AttendanceRecord, QRCode
 
 
+class ClassFilter(AutocompleteFilter):
+    title = 'class'
+    field_path = 'class_obj'
+
+
+class SessionClassFilter(AutocompleteFilter):
+    title = 'class'
+    field_path = 'session__class_obj'
+
+
 @admin.register(AttendanceSession)
-class AttendanceSessionAdmin(admin.ModelAdmin):
-    list_display = ('class_obj', 'session_date', 'start_time', 'end_time', 'is_active')
-    list_filter = ('is_active', 'session_date', 'class_obj')
+class AttendanceSessionAdmin(LargeTableAdmin):
+    list_display = ('class_obj', 'session_date', 'start_time', 'end_time', 'is_active', 'final_present', 'final_total')
+    list_filter = ('is_active', ClassFilter)
+    list_select_related = ('class_obj',)
+    date_hierarchy = 'session_date'
     search_fields = ('class_obj__course_name', 'class_obj__course_id')
+    autocomplete_fields = ('class_obj',)
 
 
 @admin.register(AttendanceRecord)
-class AttendanceRecordAdmin(admin.ModelAdmin):
+class AttendanceRecordAdmin(LargeTableAdmin):
     list_display = ('student', 'session', 'is_present', 'method', 'recorded_at')
-    list_filter = ('is_present', 'method', 'session__class_obj', 'recorded_at')
+    list_filter = ('is_present', 'method', SessionClassFilter)
+    list_select_related = ('student', 'session__class_obj')
+    date_hierarchy = 'recorded_at'
     search_fields = ('student__username', 'session__class_obj__course_name')
+    autocomplete_fields = ('session', 'student', 'recorded_by')
+    actions = ['mark_present', 'mark_absent']
+
+    @admin.action(description='Mark selected records present')
+    def mark_present(self, request, queryset):
+        changed = set_presence(queryset, True, request.user)
+        self.message_user(request, f"{changed} records marked present.")
+
+    @admin.action(description='Mark selected records absent')
+    def mark_absent(self, request, queryset):
+        changed = set_presence(queryset, False, request.user)
+        self.message_user(request, f"{changed} records marked absent.")
 
 
 @admin.register(QRCode)
-class QRCodeAdmin(admin.ModelAdmin):
+class QRCodeAdmin(LargeTableAdmin):
     list_display = ('session', 'code', 'created_at', 'expires_at', 'is_active')
-    list_filter = ('is_active', 'created_at', 'expires_at')
-    search_fields = ('session__class_obj__course_name', 'code')
\ No newline at end of file
+    list_filter = ('is_active',)
+    list_select_related = ('session__class_obj',)
+    date_hierarchy = 'created_at'
+    search_fields = ('session__class_obj__course_name', 'code')
+    autocomplete_fields = ('session',)
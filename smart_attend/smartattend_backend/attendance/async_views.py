@@ -0,0 +1,170 @@
+"""
+Async views, served natively under ``smartattend.asgi``.
+
+The check-in endpoints mirror their synchronous counterparts in
+``attendance.views`` but use the async ORM, so a worker is not blocked
+while the database answers.
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from accounts.models import User
+from classes.models import Class
+from core.async_api import async_api_view
+from core.budgets import query_budget
+from core.throttling import throttle_scope
+from core.idempotency import idempotent
+from core.writer import awrite
+from .checkin import record_attendance, redeem_qr_code
+from .live import get_backend, hub, session_channel, session_counters
+from .models import AttendanceSession, QRCode
+from .serializers import AttendanceRecordSerializer
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def is_enrolled(class_id, user_id):
+    return await Class.objects.filter(id=class_id, students__id=user_id).aexists()
+
+
+@query_budget(4)
+@async_api_view(['GET'])
+async def session_stream(request, session_id):
+    """
+    Server-sent events for a session: a ``snapshot`` with the current
+    counters, then a ``record`` event for every attendance change.
+    """
+    try:
+        session = await AttendanceSession.objects.select_related('class_obj').aget(id=session_id)
+    except AttendanceSession.DoesNotExist:
+        return JsonResponse({'error': 'Session not found'}, status=404)
+
+    # Check permissions
+    if request.user.role == 'student' and not await is_enrolled(session.class_obj_id, request.user.id):
+        return JsonResponse({'error': 'Permission denied.'}, status=403)
+    elif request.user.role == 'teacher' and session.class_obj.teacher_id != request.user.id:
+        return JsonResponse({'error': 'Permission denied.'}, status=403)
+
+    get_backend().start()
+
+    response = StreamingHttpResponse(_event_stream(session), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def _event_stream(session):
+    channel = session_channel(session.id)
+    backend = get_backend()
+    subscriber = hub.subscribe(channel)
+    loop, queue = subscriber
+    try:
+        await backend.watch(channel)
+        watched_at = loop.time()
+        counters = await sync_to_async(session_counters)(session)
+        yield format_event('snapshot', {'session_id': session.id, 'counters': counters})
+        while True:
+            if loop.time() - watched_at >= settings.LIVE_SESSION_HEARTBEAT:
+                await backend.watch(channel)
+                watched_at = loop.time()
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=settings.LIVE_SESSION_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            yield format_event(message['type'], message)
+    finally:
+        hub.unsubscribe(channel, subscriber)
+
+
+@query_budget(7)
+@async_api_view(['POST'])
+@idempotent
+async def mark_attendance(request, session_id):
+    try:
+        session = await AttendanceSession.objects.select_related('class_obj').aget(id=session_id)
+    except AttendanceSession.DoesNotExist:
+        return JsonResponse({'error': 'Session not found'}, status=404)
+
+    # Check if session is active
+    if not session.is_active:
+        return JsonResponse({'error': 'Session is not active'}, status=400)
+
+    # Check permissions
+    if request.user.role == 'student' and not await is_enrolled(session.class_obj_id, request.user.id):
+        return JsonResponse({'error': 'Permission denied.'}, status=403)
+    elif request.user.role == 'teacher' and session.class_obj.teacher_id != request.user.id:
+        return JsonResponse({'error': 'Permission denied.'}, status=403)
+
+    student_id = request.data.get('student_id')
+
+    # If student_id is not provided, use the current user (for student self-marking)
+    if not student_id:
+        if request.user.role == 'student':
+            student = request.user
+        else:
+            return JsonResponse({'error': 'Student ID required for teacher marking'}, status=400)
+    else:
+        if request.user.role != 'teacher':
+            return JsonResponse({'error': 'Permission denied.'}, status=403)
+        try:
+            student = await User.objects.aget(id=student_id, role='student')
+        except User.DoesNotExist:
+            return JsonResponse({'error': 'Student not found'}, status=404)
+
+    # Check if student is enrolled in the class
+    if not await is_enrolled(session.class_obj_id, student.id):
+        return JsonResponse({'error': 'Student not enrolled in this class'}, status=400)
+
+    record = await awrite(
+        record_attendance, session, student,
+        is_present=request.data.get('is_present', False),
+        method=request.data.get('method', 'manual'),
+        recorded_by=request.user,
+        latitude=request.data.get('latitude'),
+        longitude=request.data.get('longitude'),
+        altitude=request.data.get('altitude')
+    )
+
+    return JsonResponse(AttendanceRecordSerializer(record).data)
+
+
+@query_budget(7)
+@throttle_scope('checkin')
+@async_api_view(['POST'])
+@idempotent
+async def scan_qr_code(request):
+    if request.user.role != 'student':
+        return JsonResponse({'error': 'Permission denied.'}, status=403)
+
+    try:
+        qr_code = await QRCode.objects.select_related('session__class_obj').aget(
+            code=request.data.get('code'), is_active=True
+        )
+    except QRCode.DoesNotExist:
+        return JsonResponse({'error': 'Invalid or expired QR code'}, status=400)
+
+    # Check if QR code is expired
+    if timezone.now() > qr_code.expires_at:
+        qr_code.is_active = False
+        await qr_code.asave(update_fields=['is_active'])
+        return JsonResponse({'error': 'QR code has expired'}, status=400)
+
+    # Check if student is enrolled in the class
+    session = qr_code.session
+    if not await is_enrolled(session.class_obj_id, request.user.id):
+        return JsonResponse({'error': 'You are not enrolled in this class'}, status=400)
+
+    # Mark attendance and deactivate the QR code, unless another scan used it first
+    record = await awrite(redeem_qr_code, qr_code, request.user)
+    if record is None:
+        return JsonResponse({'error': 'Invalid or expired QR code'}, status=400)
+
+    return JsonResponse(AttendanceRecordSerializer(record).data)
@@ -0,0 +1,120 @@
+"""
+Attendance record writes, shared by the synchronous and async views, the
+offline upload, session creation and the admin.
+
+Records are written with ``upsert_records``: one ``INSERT ... ON CONFLICT
+(session_id, student_id) DO UPDATE`` per call however many records it
+holds, so concurrent writers for the same student and session can't
+collide on the unique constraint. The views run these writes through
+``core.writer.write`` (or ``awrite``), so on SQLite they are serialized on
+the writer thread.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.sync import log_changes
+from core.versioning import bump_on_commit
+from .live import publish_record
+from .models import AttendanceRecord, AttendanceSession, QRCode
+from .scheduling import refreeze_sessions
+
+RECORD_FIELDS = ['is_present', 'method', 'recorded_by', 'latitude', 'longitude', 'altitude']
+
+
+def upsert_records(records, fields=RECORD_FIELDS):
+    """
+    Insert ``records``, unsaved and at most one per session and student, or
+    update ``fields`` of the existing records they collide with, in a
+    single statement. ``recorded_at`` becomes the time of the write either
+    way. Each record's ``session`` should be loaded. Returns the records,
+    with their ids set.
+
+    ``bulk_create`` sends no ``post_save``, so this does what the receivers
+    would: bump the sessions' versions, log the changes for sync and
+    publish them to live viewers. Closed sessions get their frozen counts
+    and rollups redone.
+    """
+    if not records:
+        return []
+    # Callers writing more than records make this part of their transaction
+    with transaction.atomic(savepoint=False):
+        AttendanceRecord.objects.bulk_create(
+            records,
+            update_conflicts=True,
+            unique_fields=['session', 'student'],
+            update_fields=[*fields, 'recorded_at']
+        )
+        refreeze_sessions({record.session_id for record in records if record.session.closed_at is not None})
+        log_changes('record', [(record.pk, record.session.class_obj_id, record.student_id) for record in records])
+        bump_on_commit(*{f"sessions:class:{record.session.class_obj_id}" for record in records})
+        for record in records:
+            publish_record(record)
+    return records
+
+
+def record_attendance(session, student, **fields):
+    """
+    Create ``student``'s record for ``session`` with ``fields``, or update
+    them on the existing one.
+    """
+    return upsert_records([AttendanceRecord(session=session, student=student, **fields)], fields=list(fields))[0]
+
+
+def create_session(class_obj, recorded_by, **fields):
+    """
+    Create a session of ``class_obj`` with ``fields`` and an absent record
+    for every enrolled student, in one transaction: a session is never left
+    without its roster. Raises ``IntegrityError`` if the class already has
+    a session that day.
+    """
+    with transaction.atomic():
+        session = AttendanceSession.objects.create(class_obj=class_obj, **fields)
+        upsert_records([
+            AttendanceRecord(session=session, student_id=student_id, method='manual', recorded_by=recorded_by)
+            for student_id in class_obj.students.values_list('id', flat=True)
+        ])
+    return session
+
+
+def redeem_qr_code(qr_code, student):
+    """
+    Use up ``qr_code`` and mark ``student`` present. Returns the record, or
+    ``None`` if the code was used up in the meantime.
+    """
+    with transaction.atomic():
+        if not QRCode.objects.filter(id=qr_code.id, is_active=True).update(is_active=False, used_at=timezone.now()):
+            return None
+        return record_attendance(qr_code.session, student, is_present=True, method='qr', recorded_by=student)
+
+
+def set_presence(records, is_present, recorded_by, chunk_size=None):
+    """
+    Mark the ``records`` queryset present or absent with an UPDATE per
+    ``chunk_size`` records, as marked by hand by ``recorded_by``. Does the
+    same bookkeeping as ``upsert_records``. Returns the number changed.
+    """
+    chunk_size = chunk_size or settings.ADMIN_ACTION_CHUNK_SIZE
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            records.exclude(is_present=is_present).order_by('id')
+            .values_list('id', 'session_id', 'session__class_obj_id', 'student_id')
+        )
+        changed = 0
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            changed += AttendanceRecord.objects.filter(id__in=[row[0] for row in chunk]).update(
+                is_present=is_present, method='manual', recorded_by=recorded_by, recorded_at=now
+            )
+            log_changes('record', [(record_id, class_id, student_id) for record_id, _, class_id, student_id in chunk])
+        refreeze_sessions(list(AttendanceSession.objects.filter(
+            id__in={session_id for _, session_id, _, _ in rows}, closed_at__isnull=False
+        ).values_list('id', flat=True)))
+        bump_on_commit(*{f"sessions:class:{class_id}" for _, _, class_id, _ in rows})
+        for record_id, session_id, _, student_id in rows:
+            publish_record(AttendanceRecord(
+                id=record_id, session_id=session_id, student_id=student_id,
+                is_present=is_present, method='manual', recorded_at=now
+            ))
+    return changed
@@ -0,0 +1,236 @@
+"""
+Live attendance updates.
+
+Writers publish a small message per attendance change on a per-session
+channel; streaming views subscribe to that channel and forward messages to
+the client. Delivery to subscribers in this process goes through ``hub``.
+Messages published in other worker processes reach the hub through the
+configured backend (``settings.LIVE_SESSION_BACKEND``):
+
+    attendance.live.LocalBackend      single process, also used in tests
+    attendance.live.PostgresBackend   fan-out across processes via LISTEN/NOTIFY
+
+Streaming views ``watch`` their channel while they are open, so writers
+only publish for sessions someone is watching.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def session_channel(session_id):
+    return f"attendance.session.{session_id}"
+
+
+class Hub:
+    """
+    Per-process registry of subscribers. Each subscriber is an asyncio
+    queue bound to the event loop that created it; ``deliver`` may be
+    called from any thread.
+    """
+    queue_size = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def has_subscribers(self, channel):
+        return bool(self._subscribers.get(channel))
+
+    def subscribe(self, channel):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        subscriber = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, channel, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def deliver(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_put_nowait, queue, message)
+            except RuntimeError:
+                # The subscriber's loop has shut down; it will unsubscribe itself
+                pass
+
+
+def _put_nowait(queue, message):
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        # Slow consumer: drop the oldest update, the next one carries fresh counters
+        queue.get_nowait()
+        queue.put_nowait(message)
+
+
+hub = Hub()
+
+
+class LocalBackend:
+    """
+    Delivers straight to this process' hub.
+    """
+    def wants(self, channel):
+        return hub.has_subscribers(channel)
+
+    async def watch(self, channel):
+        pass
+
+    def publish(self, channel, message):
+        hub.deliver(channel, message)
+
+    def start(self):
+        pass
+
+
+class PostgresBackend:
+    """
+    Uses PostgreSQL NOTIFY so every worker process sees every message. A
+    daemon thread per process LISTENs and feeds the local hub, reconnecting
+    with backoff if its connection drops.
+
+    Watchers may live in another process, so they keep a marker in the
+    shared cache (``CACHE_BACKEND``) that outlives a few heartbeats.
+    """
+    pg_channel = 'attendance_live'
+    watch_key = 'live:watching:{}'
+    max_backoff = 60  # seconds
+
+    def __init__(self):
+        self._started = False
+        self._lock = threading.Lock()
+
+    def wants(self, channel):
+        return hub.has_subscribers(channel) or cache.get(self.watch_key.format(channel)) is not None
+
+    async def watch(self, channel):
+        await cache.aset(self.watch_key.format(channel), True, timeout=settings.LIVE_SESSION_HEARTBEAT * 3)
+
+    def publish(self, channel, message):
+        payload = json.dumps({'channel': channel, 'message': message}, default=str)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.pg_channel, payload])
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._run, name='attendance-live-listener', daemon=True).start()
+
+    def _run(self):
+        delay = 1
+        try:
+            while True:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    logger.exception('Live attendance listener could not connect, retrying in %ss', delay)
+                else:
+                    delay = 1
+                    try:
+                        self._listen(conn)
+                    except Exception:
+                        logger.exception('Live attendance listener lost its connection, reconnecting')
+                    finally:
+                        conn.close()
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+        finally:
+            # Let the next stream start a new listener
+            with self._lock:
+                self._started = False
+
+    def _connect(self):
+        import psycopg2
+
+        db = settings.DATABASES['default']
+        conn = psycopg2.connect(
+            dbname=db['NAME'], user=db['USER'], password=db['PASSWORD'],
+            host=db['HOST'], port=db['PORT']
+        )
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cursor:
+            cursor.execute(f"LISTEN {self.pg_channel}")
+        return conn
+
+    def _listen(self, conn):
+        while True:
+            if select.select([conn], [], [], 60) == ([], [], []):
+                continue
+            conn.poll()
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+                try:
+                    data = json.loads(notify.payload)
+                except ValueError:
+                    logger.warning('Ignoring malformed live attendance payload')
+                    continue
+                hub.deliver(data['channel'], data['message'])
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.LIVE_SESSION_BACKEND)()
+    return _backend
+
+
+def session_counters(session):
+    counts = session.records.aggregate(
+        present_students=Count('id', filter=Q(is_present=True)),
+        absent_students=Count('id', filter=Q(is_present=False))
+    )
+    counts['total_students'] = session.class_obj.students.count()
+    return counts
+
+
+def publish_record(record):
+    """
+    Publish a record change once the surrounding transaction commits. Skips
+    the counters and the message when no one is watching the session.
+    """
+    channel = session_channel(record.session_id)
+    backend = get_backend()
+    if not backend.wants(channel):
+        return
+
+    def send():
+        message = {
+            'type': 'record',
+            'session_id': record.session_id,
+            'record': {
+                'id': record.id,
+                'student': record.student_id,
+                'is_present': record.is_present,
+                'method': record.method,
+                'recorded_at': record.recorded_at.isoformat() if record.recorded_at else None,
+            },
+            'counters': session_counters(record.session),
+        }
+        backend.publish(channel, message)
+
+    transaction.on_commit(send)
@@ -0,0 +1,131 @@
+import asyncio
+import datetime
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from accounts.models import User
+from attendance.models import AttendanceRecord, AttendanceSession
+from classes.models import Class
+from core.benchmarking import format_summary, scratch_database, summarize
+from core.models import LocationVerification
+
+ENDPOINTS = {
+    'mark': ('mark-attendance', 'async-mark-attendance'),
+    'location': ('verify-location', 'async-verify-location'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the synchronous and async check-in endpoints in-process on a "
+        "scratch database. Each student checks in once per round."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=200)
+        parser.add_argument('--rounds', type=int, default=1)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='mark')
+
+    def handle(self, *args, **options):
+        # Lock errors are counted in the summary rather than logged one by one
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+
+        with scratch_database():
+            session, tokens = self.seed(options['students'])
+            sync_name, async_name = ENDPOINTS[options['endpoint']]
+            requests = [
+                self.build_request(options['endpoint'], session, token)
+                for _ in range(options['rounds'])
+                for token in tokens
+            ]
+
+            sync_path = self.path(sync_name, session)
+            async_path = self.path(async_name, session)
+
+            self.reset()
+            sync_summary = self.run_sync(sync_path, requests, options['concurrency'])
+            self.reset()
+            async_summary = asyncio.run(self.run_async(async_path, requests, options['concurrency']))
+
+        self.stdout.write(format_summary(f"sync  {options['endpoint']}", sync_summary))
+        self.stdout.write(format_summary(f"async {options['endpoint']}", async_summary))
+
+    def seed(self, student_count):
+        teacher = User.objects.create_user('bench-teacher', password='x', role='teacher')
+        class_obj = Class.objects.create(
+            course_id='BENCH', course_name='Benchmark', semester='1', section='A',
+            teacher=teacher, room_number='1', latitude=12.9716, longitude=77.5946,
+            start_time=datetime.time(0, 0), end_time=datetime.time(23, 59)
+        )
+        students = User.objects.bulk_create([
+            User(username=f"bench-student-{i}", role='student') for i in range(student_count)
+        ])
+        class_obj.students.set(students)
+        session = AttendanceSession.objects.create(
+            class_obj=class_obj,
+            session_date=timezone.localdate(),
+            start_time=class_obj.start_time,
+            end_time=class_obj.end_time
+        )
+        tokens = Token.objects.bulk_create([Token(user=student, key=Token.generate_key()) for student in students])
+        return session, [token.key for token in tokens]
+
+    def build_request(self, endpoint, session, token):
+        if endpoint == 'mark':
+            body = {'is_present': True, 'method': 'manual'}
+        else:
+            body = {'class_id': session.class_obj_id, 'latitude': 12.9716, 'longitude': 77.5946}
+        return token, json.dumps(body)
+
+    def path(self, url_name, session):
+        if url_name.endswith('mark-attendance'):
+            return reverse(url_name, args=[session.id])
+        return reverse(url_name)
+
+    def reset(self):
+        AttendanceRecord.objects.all().delete()
+        LocationVerification.objects.all().delete()
+
+    def run_sync(self, path, requests, concurrency):
+        def call(request):
+            token, body = request
+            started = time.perf_counter()
+            response = Client(raise_request_exception=False).post(
+                path, body, content_type='application/json', headers={'Authorization': f"Token {token}"}
+            )
+            return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(call, requests))
+        return self.summarize(results, time.perf_counter() - started)
+
+    async def run_async(self, path, requests, concurrency):
+        client = AsyncClient(raise_request_exception=False)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call(request):
+            token, body = request
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(path, body, content_type='application/json',
+                                             headers={'Authorization': f"Token {token}"})
+                return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(call(request) for request in requests))
+        return self.summarize(results, time.perf_counter() - started)
+
+    def summarize(self, results, elapsed):
+        latencies = [latency for latency, status in results]
+        errors = sum(1 for latency, status in results if status >= 400)
+        return summarize(latencies, elapsed, errors)
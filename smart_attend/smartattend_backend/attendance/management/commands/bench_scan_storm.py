@@ -0,0 +1,212 @@
+import datetime
+import json
+import multiprocessing
+import random
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from accounts.models import User
+from attendance.models import AttendanceRecord, AttendanceSession, QRCode
+from classes.models import Class
+from core import loadgen
+from core.benchmarking import format_summary, summarize
+from core.models import LocationVerification
+
+ENDPOINTS = ('scan', 'mark', 'location')
+
+
+def parse_mix(value):
+    """
+    Parse ``scan:6,mark:3,location:1`` into endpoint weights.
+    """
+    weights = {}
+    for part in value.split(','):
+        name, _, weight = part.partition(':')
+        if name not in ENDPOINTS:
+            raise CommandError(f"Unknown endpoint in --mix: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a class-start check-in storm against a running server: every "
+        "student of a fresh class scans a QR code, marks attendance or "
+        "verifies their location within --window seconds, from --processes "
+        "processes of --threads threads each. Reports throughput, tail "
+        "latency, lock errors and anomalies in the attendance records. The "
+        "class is created in the database this command is configured with, "
+        "which must be the server's, and deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8000', help='Base URL of the running server.')
+        parser.add_argument('--students', type=int, default=300)
+        parser.add_argument('--window', type=float, default=60, help='Seconds over which requests arrive.')
+        parser.add_argument('--mix', type=parse_mix, default='scan:6,mark:3,location:1',
+                            help='Endpoint weights, e.g. scan:6,mark:3,location:1')
+        parser.add_argument('--retry-rate', type=float, default=0.1,
+                            help='Fraction of students who send their request twice, as on a double tap.')
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--threads', type=int, default=16, help='Threads per process.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the report to this JSON file.')
+        parser.add_argument('--keep', action='store_true', help="Don't delete the storm's class and students.")
+        parser.add_argument('--strict', action='store_true', help='Fail if any anomaly is found.')
+
+    def handle(self, *args, **options):
+        url = options['url'].rstrip('/')
+        self.check_server(url)
+
+        prefix = f"storm-{uuid.uuid4().hex[:8]}"
+        session, tokens = self.seed(prefix, options['students'])
+        try:
+            requests = self.plan(session, tokens, options)
+            results = self.run(url, requests, options)
+            report = self.report(session, tokens, results)
+        finally:
+            if not options['keep']:
+                self.cleanup(prefix, session)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+        if options['strict'] and any(report['anomalies'].values()):
+            raise CommandError('Anomalies found in the attendance records.')
+
+    def check_server(self, url):
+        try:
+            urllib.request.urlopen(url + reverse('user-profile'), timeout=5)
+        except urllib.error.HTTPError:
+            pass  # Reachable; the request just wasn't authenticated
+        except (urllib.error.URLError, OSError) as e:
+            raise CommandError(f"No server at {url}: {e}")
+
+    def seed(self, prefix, student_count):
+        teacher = User.objects.create_user(f"{prefix}-teacher", password=None, role='teacher')
+        class_obj = Class.objects.create(
+            course_id=prefix.upper(), course_name='Scan storm', semester='1', section='A',
+            teacher=teacher, room_number='1', latitude=12.9716, longitude=77.5946,
+            start_time=datetime.time(0, 0), end_time=datetime.time(23, 59)
+        )
+        students = User.objects.bulk_create([
+            User(username=f"{prefix}-student-{i}", role='student') for i in range(student_count)
+        ])
+        class_obj.students.set(students)
+        session = AttendanceSession.objects.create(
+            class_obj=class_obj, session_date=timezone.localdate(),
+            start_time=class_obj.start_time, end_time=class_obj.end_time
+        )
+        tokens = Token.objects.bulk_create([Token(user=student, key=Token.generate_key()) for student in students])
+        return session, {token.key: token.user_id for token in tokens}
+
+    def plan(self, session, tokens, options):
+        """
+        One request per student at a random point in the window, plus a
+        repeat shortly after for ``--retry-rate`` of them. QR codes are
+        single use, so every student scans their own code and a repeat
+        scans it again.
+        """
+        rng = random.Random(options['seed'])
+        names, weights = zip(*options['mix'].items())
+        expires_at = timezone.now() + datetime.timedelta(seconds=options['window'] + 300)
+        paths = {
+            'scan': reverse('scan-qr'),
+            'mark': reverse('mark-attendance', args=[session.id]),
+            'location': reverse('verify-location'),
+        }
+
+        requests, codes = [], []
+        for token in tokens:
+            name = rng.choices(names, weights)[0]
+            if name == 'scan':
+                code = f"{token[:8]}-{uuid.uuid4().hex}"
+                codes.append(QRCode(session=session, code=code, expires_at=expires_at))
+                body = {'code': code}
+            elif name == 'mark':
+                body = {'is_present': True, 'method': 'manual'}
+            else:
+                body = {'class_id': session.class_obj_id, 'latitude': 12.9716, 'longitude': 77.5946}
+            offset = rng.uniform(0, options['window'])
+            requests.append((offset, name, paths[name], token, body))
+            if rng.random() < options['retry_rate']:
+                requests.append((offset + rng.uniform(0, 1), name, paths[name], token, body))
+        QRCode.objects.bulk_create(codes)
+        return requests
+
+    def run(self, url, requests, options):
+        processes = max(1, options['processes'])
+        # Leave the workers time to start so the burst keeps its shape
+        start_at = time.time() + 1 + processes * 0.5
+        if processes == 1:
+            return loadgen.fire(url, requests, options['threads'], start_at)
+
+        # Spawned workers import only core.loadgen, never Django
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+            futures = [
+                pool.submit(loadgen.fire, url, requests[i::processes], options['threads'], start_at)
+                for i in range(processes)
+            ]
+            return [result for future in futures for result in future.result()]
+
+    def report(self, session, tokens, results):
+        started = min((r['finished_at'] - r['latency'] for r in results), default=0)
+        elapsed = max((r['finished_at'] for r in results), default=0) - started
+
+        summaries = {}
+        for name in ENDPOINTS + ('total',):
+            selected = [r for r in results if name in (r['name'], 'total')]
+            if selected:
+                errors = sum(r['outcome'] != 'ok' for r in selected)
+                summaries[name] = summarize([r['latency'] for r in selected], elapsed, errors)
+                self.stdout.write(format_summary(name, summaries[name]))
+
+        outcomes = Counter(r['outcome'] for r in results)
+        self.stdout.write('Outcomes: ' + ', '.join(f"{k} {v}" for k, v in sorted(outcomes.items())))
+
+        anomalies = self.anomalies(session, tokens, results)
+        self.stdout.write('Anomalies: ' + ', '.join(f"{k} {v}" for k, v in anomalies.items()))
+        return {'endpoints': summaries, 'outcomes': dict(outcomes), 'anomalies': anomalies}
+
+    def anomalies(self, session, tokens, results):
+        """
+        Compare what the clients were told with what the database holds.
+
+        ``duplicate_records``: students with more than one record for the
+        session. ``lost_writes``: students told their check-in succeeded
+        who aren't marked present. ``unacknowledged_writes``: students
+        marked present whose every check-in failed, who would retry.
+        ``double_scans``: QR codes accepted more than once.
+        """
+        records = AttendanceRecord.objects.filter(session=session)
+        duplicates = records.values('student').annotate(n=Count('id')).filter(n__gt=1).count()
+        present = set(records.filter(is_present=True).values_list('student_id', flat=True))
+
+        checkins = [r for r in results if r['name'] in ('scan', 'mark')]
+        acknowledged = {tokens[r['token']] for r in checkins if r['outcome'] == 'ok'}
+        attempted = {tokens[r['token']] for r in checkins}
+        scans = Counter(r['token'] for r in results if r['name'] == 'scan' and r['outcome'] == 'ok')
+
+        return {
+            'duplicate_records': duplicates,
+            'lost_writes': len(acknowledged - present),
+            'unacknowledged_writes': len((present & attempted) - acknowledged),
+            'double_scans': sum(1 for count in scans.values() if count > 1),
+        }
+
+    def cleanup(self, prefix, session):
+        class_obj = session.class_obj
+        LocationVerification.objects.filter(class_obj=class_obj).delete()
+        class_obj.delete()
+        User.objects.filter(username__startswith=f"{prefix}-").delete()
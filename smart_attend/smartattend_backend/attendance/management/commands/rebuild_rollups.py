@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from attendance.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the attendance rollups of every closed session, e.g. for "
+        "sessions closed before the rollups existed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=settings.ROLLUP_REBUILD_CHUNK_SIZE,
+                            help='Sessions to roll up per transaction.')
+
+    def handle(self, *args, **options):
+        rolled_up = rebuild_rollups(chunk_size=options['chunk_size'])
+        self.stdout.write(f"Rolled up {rolled_up} sessions")
@@ -0,0 +1,26 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from attendance.scheduling import close_expired_sessions, materialize_sessions, open_started_sessions
+
+
+class Command(BaseCommand):
+    help = (
+        "Create upcoming sessions from class schedules, open those that have "
+        "started and close those that have ended. The job worker does this "
+        "periodically; this command runs it on demand."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.SESSION_MATERIALIZE_DAYS,
+                            help='Days ahead to create sessions for.')
+        parser.add_argument('--start', type=datetime.date.fromisoformat, default=None,
+                            help='First date to create sessions for (YYYY-MM-DD), today by default.')
+
+    def handle(self, *args, **options):
+        created = materialize_sessions(start=options['start'], days=options['days'])
+        opened = open_started_sessions()
+        closed = close_expired_sessions()
+        self.stdout.write(f"Created {len(created)} sessions, opened {opened}, closed {closed}")
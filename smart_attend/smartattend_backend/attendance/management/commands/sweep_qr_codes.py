@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from attendance.qr import sweep_qr_codes
+
+
+class Command(BaseCommand):
+    help = (
+        "Deactivate expired QR codes and delete inactive ones past the "
+        "retention period. The job worker does this periodically; this "
+        "command runs it on demand."
+    )
+
+    def handle(self, *args, **options):
+        expired, deleted = sweep_qr_codes()
+        self.stdout.write(f"Expired {expired} QR codes, deleted {deleted}")
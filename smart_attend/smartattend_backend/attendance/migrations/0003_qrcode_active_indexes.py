@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0002_session_close'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='qrcode',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['code'], name='qrcode_active_code_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='qrcode',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['expires_at'], name='qrcode_active_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_sessions(apps, schema_editor):
+    """
+    Fold sessions created twice for the same class and date into the oldest
+    one before the unique constraint is added. Records and QR codes move to
+    the surviving session. Where it already has a record for the student,
+    that record is kept but takes over a present mark from the duplicate.
+
+    This runs in a migration of its own: on PostgreSQL the updates and
+    deletes leave deferred foreign key checks pending until commit, and
+    ALTER TABLE refuses to run in the same transaction.
+    """
+    AttendanceSession = apps.get_model('attendance', 'AttendanceSession')
+    AttendanceRecord = apps.get_model('attendance', 'AttendanceRecord')
+    QRCode = apps.get_model('attendance', 'QRCode')
+    duplicates = (
+        AttendanceSession.objects.values('class_obj_id', 'session_date')
+        .annotate(count=Count('id'), keep=Min('id')).filter(count__gt=1)
+    )
+    for group in duplicates:
+        extra = AttendanceSession.objects.filter(
+            class_obj_id=group['class_obj_id'], session_date=group['session_date']
+        ).exclude(id=group['keep']).order_by('id')
+        for session in extra:
+            kept = AttendanceRecord.objects.filter(session_id=group['keep'])
+            absent = kept.filter(is_present=False).values('student_id')
+            for record in AttendanceRecord.objects.filter(session=session, is_present=True, student_id__in=absent):
+                kept.filter(student_id=record.student_id).update(
+                    is_present=True, method=record.method, recorded_by_id=record.recorded_by_id,
+                    recorded_at=record.recorded_at, latitude=record.latitude, longitude=record.longitude,
+                    altitude=record.altitude
+                )
+            AttendanceRecord.objects.filter(session=session).exclude(
+                student_id__in=kept.values('student_id')
+            ).update(session_id=group['keep'])
+            QRCode.objects.filter(session=session).update(session_id=group['keep'])
+            session.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0003_qrcode_active_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_sessions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0004_merge_duplicate_sessions'),
+        ('classes', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['student', 'is_present'], name='attendance_record_student_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancesession',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['session_date'], name='attendance_session_open_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='attendancesession',
+            constraint=models.UniqueConstraint(fields=('class_obj', 'session_date'), name='attendance_session_class_date_uniq'),
+        ),
+    ]
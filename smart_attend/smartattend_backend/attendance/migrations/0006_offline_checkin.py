@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0005_session_record_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OfflineCheckin',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64)),
+                ('scanned_at', models.DateTimeField()),
+                ('uploaded_at', models.DateTimeField(auto_now_add=True)),
+                ('record', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='offline_checkins', to='attendance.attendancerecord')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='offline_checkins', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('student', 'key'), name='offline_checkin_student_key_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0006_offline_checkin'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['recorded_at'], name='attendance_record_recorded_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0007_admin_date_indexes'),
+        ('classes', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('semester', models.CharField(max_length=20)),
+                ('method', models.CharField(choices=[('manual', 'Manual'), ('qr', 'QR Code'), ('facial', 'Facial Recognition')], max_length=10)),
+                ('start_time', models.TimeField()),
+                ('record_count', models.PositiveIntegerField(default=0)),
+                ('present_count', models.PositiveIntegerField(default=0)),
+                ('class_obj', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_rollups', to='classes.class')),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['granularity', 'teacher', 'period_start'], name='attendance_rollup_teacher_idx'), models.Index(fields=['granularity', 'period_start'], name='attendance_rollup_period_idx')],
+                'constraints': [models.UniqueConstraint(fields=('class_obj', 'granularity', 'period_start', 'method', 'start_time'), name='attendance_rollup_cell_uniq')],
+            },
+        ),
+    ]
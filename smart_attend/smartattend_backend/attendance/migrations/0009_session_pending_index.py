@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-19 20:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0008_attendance_rollup'),
+        ('classes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='attendancesession',
+            name='attendance_session_open_idx',
+        ),
+        migrations.AddIndex(
+            model_name='attendancesession',
+            index=models.Index(condition=models.Q(('closed_at__isnull', True)), fields=['session_date'], name='attendance_session_pending_idx'),
+        ),
+    ]
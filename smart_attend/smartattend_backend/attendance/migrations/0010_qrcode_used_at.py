@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 20:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0009_session_pending_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='qrcode',
+            name='used_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
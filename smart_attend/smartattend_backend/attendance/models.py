@@ -1,8 +1,23 @@
 from django.db import models
+from django.db.models import Q
 from accounts.models import User
 from classes.models import Class
 
 
+class AttendanceSessionQuerySet(models.QuerySet):
+    def with_counts(self):
+        """
+        Annotate ``roster_size`` and ``present_count`` with subqueries so
+        listing sessions doesn't count rows per session.
+        """
+        roster = Class.students.through.objects.filter(class_id=models.OuterRef('class_obj_id')).order_by().values('class_id')
+        present = AttendanceRecord.objects.filter(session=models.OuterRef('pk'), is_present=True).order_by().values('session')
+        return self.select_related('class_obj').annotate(
+            roster_size=models.Subquery(roster.annotate(count=models.Count('id')).values('count')),
+            present_count=models.Subquery(present.annotate(count=models.Count('id')).values('count'))
+        )
+
+
 class AttendanceSession(models.Model):
     class_obj = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='attendance_sessions')
     session_date = models.DateField()
@@ -10,6 +25,22 @@ class AttendanceSession(models.Model):
     end_time = models.TimeField()
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    closed_at = models.DateTimeField(null=True, blank=True)
+    # Attendance frozen when the session is closed
+    final_total = models.PositiveIntegerField(null=True, blank=True)
+    final_present = models.PositiveIntegerField(null=True, blank=True)
+
+    objects = AttendanceSessionQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # One session per class per day; also serves (class_obj, session_date) lookups
+            models.UniqueConstraint(fields=['class_obj', 'session_date'], name='attendance_session_class_date_uniq'),
+        ]
+        indexes = [
+            # The open and close sweeps only look at sessions not closed yet
+            models.Index(fields=['session_date'], condition=Q(closed_at__isnull=True), name='attendance_session_pending_idx'),
+        ]
 
     def __str__(self):
         return f"{self.class_obj.course_name} - {self.session_date}"
@@ -34,6 +65,10 @@ class AttendanceRecord(models.Model):
 
     class Meta:
         unique_together = ('session', 'student')
+        indexes = [
+            models.Index(fields=['student', 'is_present'], name='attendance_record_student_idx'),
+            models.Index(fields=['recorded_at'], name='attendance_record_recorded_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.username} - {self.session.class_obj.course_name} - {'Present' if self.is_present else 'Absent'}"
@@ -45,6 +80,75 @@ class QRCode(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
     is_active = models.BooleanField(default=True)
+    # Set when a scan uses the code up; expiry deactivates it without this
+    used_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Scans and the expiry sweep only ever look at active codes
+            models.Index(fields=['code'], condition=Q(is_active=True), name='qrcode_active_code_idx'),
+            models.Index(fields=['expires_at'], condition=Q(is_active=True), name='qrcode_active_expiry_idx'),
+        ]
 
     def __str__(self):
-        return f"QR for {self.session.class_obj.course_name} - {self.session.session_date}"
\ No newline at end of file
+        return f"QR for {self.session.class_obj.course_name} - {self.session.session_date}"
+
+
+class OfflineCheckin(models.Model):
+    """
+    A check-in queued on a student's device while offline and uploaded
+    later. Its client-generated ``key`` identifies re-uploads of the same
+    item.
+    """
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='offline_checkins')
+    key = models.CharField(max_length=64)
+    record = models.ForeignKey(AttendanceRecord, on_delete=models.SET_NULL, null=True, blank=True, related_name='offline_checkins')
+    scanned_at = models.DateTimeField()
+    uploaded_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'key'], name='offline_checkin_student_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.student.username} - {self.key}"
+
+
+class AttendanceRollup(models.Model):
+    """
+    Records and present marks of closed sessions summed per period, class,
+    method and time slot (see ``attendance.rollups``). ``teacher`` and
+    ``semester`` are the class's when the cell was last rolled up.
+    """
+    GRANULARITY_CHOICES = (
+        ('day', 'Day'),
+        ('week', 'Week'),
+        ('month', 'Month'),
+    )
+
+    granularity = models.CharField(max_length=5, choices=GRANULARITY_CHOICES)
+    period_start = models.DateField()
+    class_obj = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='attendance_rollups')
+    teacher = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attendance_rollups')
+    semester = models.CharField(max_length=20)
+    method = models.CharField(max_length=10, choices=AttendanceRecord.METHOD_CHOICES)
+    start_time = models.TimeField()
+    record_count = models.PositiveIntegerField(default=0)
+    present_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['class_obj', 'granularity', 'period_start', 'method', 'start_time'],
+                name='attendance_rollup_cell_uniq'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['granularity', 'teacher', 'period_start'], name='attendance_rollup_teacher_idx'),
+            models.Index(fields=['granularity', 'period_start'], name='attendance_rollup_period_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.class_obj_id} {self.granularity} {self.period_start} {self.method} {self.start_time}"
+
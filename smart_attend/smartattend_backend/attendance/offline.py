@@ -0,0 +1,198 @@
+"""
+Check-ins queued on a student's device while offline.
+
+The device records the QR code it scanned, when, and where, under a key
+of its own, and uploads a batch once it is back online. Each item is
+checked against what the online scan would have checked at the time of
+the scan: the code existed and hadn't expired, the session was running
+(give or take ``OFFLINE_CHECKIN_CLOCK_SKEW`` for the device's clock), the
+student is enrolled and, with coordinates, was near the classroom.
+
+Codes stay single-use: one already used by a scan or an earlier upload
+is rejected, even once it has expired, and an accepted check-in uses its
+code up. The code's lifetime and the session bound when it can have been
+scanned.
+
+Items are deduplicated by key, both within the batch and against earlier
+uploads, and by session: one check-in per session counts, and one for a
+session the student is already present in changes nothing. Everything
+accepted is written as one upsert of attendance records (see
+``attendance.checkin``), through the SQLite writer where it is on.
+"""
+import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from classes.models import Class
+from core.views import calculate_distance
+from core.writer import write
+from .checkin import upsert_records
+from .models import AttendanceRecord, OfflineCheckin, QRCode
+from .serializers import OfflineCheckinSerializer
+
+RECORDED = 'recorded'
+DUPLICATE = 'duplicate'
+REJECTED = 'rejected'
+
+MAX_DISTANCE = 100  # meters, as for online location verification
+USED = 'QR code has already been used'
+
+
+def session_window(session):
+    """
+    When ``session`` runs, as aware datetimes.
+    """
+    tz = timezone.get_current_timezone()
+    start = datetime.datetime.combine(session.session_date, session.start_time, tzinfo=tz)
+    end = datetime.datetime.combine(session.session_date, session.end_time, tzinfo=tz)
+    return start, end
+
+
+def check(checkin, qr_code, enrolled, now):
+    """
+    Why ``checkin`` can't be accepted, or ``None`` if it can.
+    """
+    skew = datetime.timedelta(seconds=settings.OFFLINE_CHECKIN_CLOCK_SKEW)
+    scanned_at = checkin['scanned_at']
+    if qr_code is None:
+        return 'Invalid QR code'
+    session = qr_code.session
+    if session.class_obj_id not in enrolled:
+        return 'You are not enrolled in this class'
+    if scanned_at > now + skew:
+        return 'Scan time is in the future'
+    if not qr_code.created_at - skew <= scanned_at <= qr_code.expires_at + skew:
+        return 'QR code had expired'
+    start, end = session_window(session)
+    if not start - skew <= scanned_at <= end + skew:
+        return 'Scanned outside the session'
+    class_obj = session.class_obj
+    if checkin.get('latitude') is not None and checkin.get('longitude') is not None:
+        distance = calculate_distance(
+            checkin['latitude'], checkin['longitude'], float(class_obj.latitude), float(class_obj.longitude)
+        )
+        if distance > MAX_DISTANCE:
+            return 'Too far from the class location'
+    return None
+
+
+def coordinate(value, places):
+    return Decimal(str(round(value, places))) if value is not None else None
+
+
+def apply_offline_checkins(student, items, now=None):
+    """
+    Validate, deduplicate and record ``student``'s uploaded ``items``.
+    Returns one outcome per item, in order: ``{'key', 'status', 'record',
+    'error'}`` with ``status`` one of ``recorded``, ``duplicate`` or
+    ``rejected``.
+    """
+    now = now or timezone.now()
+    outcomes = [None] * len(items)
+    checkins = {}
+    repeats = {}  # index -> index of the first item with the same key
+    first = {}
+    for index, item in enumerate(items):
+        serializer = OfflineCheckinSerializer(data=item)
+        if not serializer.is_valid():
+            field, errors = next(iter(serializer.errors.items()))
+            key = item.get('key') if isinstance(item, dict) else None
+            outcomes[index] = {'key': key, 'status': REJECTED, 'record': None, 'error': f"{field}: {errors[0]}"}
+        elif serializer.validated_data['key'] in first:
+            repeats[index] = first[serializer.validated_data['key']]
+        else:
+            first[serializer.validated_data['key']] = index
+            checkins[index] = serializer.validated_data
+
+    # Items uploaded before, and the codes, classes and records involved
+    uploaded = dict(OfflineCheckin.objects.filter(student=student, key__in=first).values_list('key', 'record_id'))
+    codes = {
+        qr_code.code: qr_code for qr_code in
+        QRCode.objects.filter(code__in={checkin['code'] for checkin in checkins.values()})
+        .select_related('session__class_obj')
+    }
+    enrolled = set(Class.students.through.objects.filter(
+        user_id=student.id, class_id__in={qr_code.session.class_obj_id for qr_code in codes.values()}
+    ).values_list('class_id', flat=True))
+    present = dict(AttendanceRecord.objects.filter(
+        student=student, is_present=True, session__in={qr_code.session_id for qr_code in codes.values()}
+    ).values_list('session_id', 'id'))
+
+    # The earliest scan of a session counts; later ones are duplicates of it
+    accepted = {}
+    duplicates = {}  # index -> session id
+    known = []
+    for index, checkin in sorted(checkins.items(), key=lambda item: item[1]['scanned_at']):
+        key = checkin['key']
+        qr_code = codes.get(checkin['code'])
+        if key in uploaded:
+            outcomes[index] = {'key': key, 'status': DUPLICATE, 'record': uploaded[key], 'error': None}
+        elif error := check(checkin, qr_code, enrolled, now):
+            outcomes[index] = {'key': key, 'status': REJECTED, 'record': None, 'error': error}
+        elif qr_code.session_id in present:
+            outcomes[index] = {'key': key, 'status': DUPLICATE, 'record': present[qr_code.session_id], 'error': None}
+            known.append((key, present[qr_code.session_id], checkin['scanned_at']))
+        elif qr_code.used_at is not None:
+            outcomes[index] = {'key': key, 'status': REJECTED, 'record': None, 'error': USED}
+        elif qr_code.session_id in accepted:
+            duplicates[index] = qr_code.session_id
+        else:
+            accepted[qr_code.session_id] = (index, checkin, qr_code)
+
+    # A code another upload used in the meantime gets no record
+    records = write(save_offline_checkins, student, list(accepted.values()), known, now) if accepted or known else {}
+    for session_id, (index, checkin, qr_code) in accepted.items():
+        outcomes[index] = outcome(checkin['key'], RECORDED, records.get(session_id))
+    for index, session_id in duplicates.items():
+        outcomes[index] = outcome(checkins[index]['key'], DUPLICATE, records.get(session_id))
+    for index, original in repeats.items():
+        result = outcomes[original]
+        outcomes[index] = result if result['status'] == REJECTED else {**result, 'status': DUPLICATE}
+    return outcomes
+
+
+def outcome(key, status, record):
+    if record is None:
+        return {'key': key, 'status': REJECTED, 'record': None, 'error': USED}
+    return {'key': key, 'status': status, 'record': record.id, 'error': None}
+
+
+def save_offline_checkins(student, accepted, known, now):
+    """
+    Use up the codes of the accepted check-ins, upsert a present record per
+    check-in whose code was still unused and remember its key and every
+    known one. Returns the records by session id.
+    """
+    with transaction.atomic():
+        unused = set(
+            QRCode.objects.select_for_update()
+            .filter(id__in=[qr_code.id for _, _, qr_code in accepted], used_at__isnull=True)
+            .values_list('id', flat=True)
+        )
+        accepted = [(index, checkin, qr_code) for index, checkin, qr_code in accepted if qr_code.id in unused]
+        QRCode.objects.filter(id__in=unused).update(is_active=False, used_at=now)
+        records = upsert_records([
+            AttendanceRecord(
+                session=qr_code.session, student=student, is_present=True, method='qr', recorded_by=student,
+                latitude=coordinate(checkin.get('latitude'), 6),
+                longitude=coordinate(checkin.get('longitude'), 6),
+                altitude=coordinate(checkin.get('altitude'), 2)
+            )
+            for index, checkin, qr_code in accepted
+        ])
+        by_session = {record.session_id: record for record in records}
+        OfflineCheckin.objects.bulk_create(
+            [
+                OfflineCheckin(student=student, key=checkin['key'], record=by_session[qr_code.session_id],
+                               scanned_at=checkin['scanned_at'])
+                for index, checkin, qr_code in accepted
+            ] + [
+                OfflineCheckin(student=student, key=key, record_id=record_id, scanned_at=scanned_at)
+                for key, record_id, scanned_at in known
+            ],
+            ignore_conflicts=True
+        )
+    return by_session
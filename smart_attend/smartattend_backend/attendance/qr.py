@@ -0,0 +1,53 @@
+"""
+QR code housekeeping.
+
+Codes are normally deactivated when scanned. ``expire_qr_codes`` catches the
+ones nobody scanned, and ``purge_qr_codes`` deletes inactive codes once they
+are past the retention period so the table and its unique index on ``code``
+stay small. ``sweep_qr_codes`` does both and runs periodically on the job
+worker (see ``attendance.tasks``).
+"""
+import datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import QRCode
+
+
+def expire_qr_codes(now=None):
+    """
+    Deactivate every active code past its expiry in one UPDATE. Returns the
+    number of codes expired.
+    """
+    return QRCode.objects.filter(is_active=True, expires_at__lte=now or timezone.now()).update(is_active=False)
+
+
+def purge_qr_codes(before, chunk_size=None):
+    """
+    Delete inactive codes created before ``before``, ``chunk_size`` rows per
+    DELETE so no single statement holds locks for long. Returns the number
+    of codes deleted.
+    """
+    chunk_size = chunk_size or settings.QR_PURGE_CHUNK_SIZE
+    deleted = 0
+    while True:
+        ids = list(
+            QRCode.objects.filter(is_active=False, created_at__lt=before)
+            .order_by('id').values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return deleted
+        count, _ = QRCode.objects.filter(id__in=ids).delete()
+        deleted += count
+
+
+def sweep_qr_codes(now=None):
+    """
+    Expire unscanned codes and purge old ones. Returns
+    ``(expired, deleted)``.
+    """
+    now = now or timezone.now()
+    expired = expire_qr_codes(now)
+    deleted = purge_qr_codes(now - datetime.timedelta(days=settings.QR_RETENTION_DAYS))
+    return expired, deleted
@@ -0,0 +1,192 @@
+"""
+Precomputed attendance trends.
+
+``AttendanceRollup`` holds the records and present marks of closed
+sessions summed per day, week (starting Monday) and month, per class (with
+its teacher and semester), method and time slot. Sessions are rolled up as
+they close (``close_expired_sessions``); a record that changes in a closed
+session later queues a ``rollups.refresh`` job for it.
+
+Rolling up recomputes whole cells rather than adding to them: the day rows
+of the sessions' classes and dates from their records, then the week and
+month rows around those days from the day rows. A refresh can therefore
+run any number of times, and ``python manage.py rebuild_rollups`` fills
+the table for sessions closed before it existed.
+
+``trends`` answers slice-and-dice questions (by weekday, slot, week,
+method, ...) with a single GROUP BY over the rollups of the chosen
+granularity, never touching ``AttendanceRecord``.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import ExtractIsoWeekDay, Trunc
+
+from .models import AttendanceRecord, AttendanceRollup, AttendanceSession
+
+GRANULARITIES = ('day', 'week', 'month')
+# Dimension name -> rollup column
+DIMENSIONS = {
+    'period': 'period_start',
+    'weekday': 'weekday',
+    'slot': 'start_time',
+    'class': 'class_obj_id',
+    'teacher': 'teacher_id',
+    'semester': 'semester',
+    'method': 'method',
+}
+
+
+class InvalidQuery(Exception):
+    pass
+
+
+def period_start(day, granularity):
+    if granularity == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def period_end(start, granularity):
+    if granularity == 'week':
+        return start + datetime.timedelta(days=7)
+    if granularity == 'month':
+        return (start + datetime.timedelta(days=32)).replace(day=1)
+    return start + datetime.timedelta(days=1)
+
+
+def refresh_rollups(session_ids):
+    """
+    Recompute the rollups of the days, weeks and months of those of
+    ``session_ids`` that are closed, for their classes. Returns the number
+    of sessions rolled up.
+    """
+    cells = list(
+        AttendanceSession.objects.filter(id__in=session_ids, closed_at__isnull=False)
+        .values_list('class_obj_id', 'session_date')
+    )
+    if not cells:
+        return 0
+    class_ids = {class_id for class_id, _ in cells}
+    dates = {day for _, day in cells}
+
+    with transaction.atomic():
+        days = (
+            AttendanceRecord.objects.filter(
+                session__class_obj_id__in=class_ids, session__session_date__in=dates,
+                session__closed_at__isnull=False
+            )
+            .values(
+                'method',
+                period=F('session__session_date'), class_id=F('session__class_obj_id'),
+                teacher_id=F('session__class_obj__teacher_id'), semester=F('session__class_obj__semester'),
+                start_time=F('session__start_time')
+            )
+            .annotate(records=Count('id'), present=Count('id', filter=Q(is_present=True)))
+            .order_by()
+        )
+        replace_cells('day', class_ids, Q(period_start__in=dates), days)
+
+        for granularity in ('week', 'month'):
+            start = period_start(min(dates), granularity)
+            end = period_end(period_start(max(dates), granularity), granularity)
+            periods = (
+                AttendanceRollup.objects.filter(
+                    granularity='day', class_obj_id__in=class_ids, period_start__gte=start, period_start__lt=end
+                )
+                .values(
+                    'method', 'semester', 'start_time', 'teacher_id',
+                    period=Trunc('period_start', granularity), class_id=F('class_obj_id')
+                )
+                .annotate(records=Sum('record_count'), present=Sum('present_count'))
+                .order_by()
+            )
+            replace_cells(granularity, class_ids, Q(period_start__gte=start, period_start__lt=end), periods)
+    return len(cells)
+
+
+def rebuild_rollups(chunk_size=None):
+    """
+    Roll up every closed session, ``chunk_size`` at a time in date order so
+    each refresh spans few weeks and months. Returns the number of sessions
+    rolled up.
+    """
+    chunk_size = chunk_size or settings.ROLLUP_REBUILD_CHUNK_SIZE
+    session_ids = list(
+        AttendanceSession.objects.filter(closed_at__isnull=False)
+        .order_by('session_date', 'id').values_list('id', flat=True)
+    )
+    return sum(
+        refresh_rollups(session_ids[start:start + chunk_size])
+        for start in range(0, len(session_ids), chunk_size)
+    )
+
+
+def replace_cells(granularity, class_ids, periods, rows):
+    """
+    Swap the ``granularity`` rollups of ``class_ids`` in ``periods`` for
+    ``rows``.
+    """
+    rows = list(rows)
+    AttendanceRollup.objects.filter(periods, granularity=granularity, class_obj_id__in=class_ids).delete()
+    AttendanceRollup.objects.bulk_create([
+        AttendanceRollup(
+            granularity=granularity, period_start=row['period'], class_obj_id=row['class_id'],
+            teacher_id=row['teacher_id'], semester=row['semester'], method=row['method'],
+            start_time=row['start_time'], record_count=row['records'], present_count=row['present']
+        )
+        for row in rows
+    ])
+
+
+def trends(granularity='week', by=('period',), class_id=None, teacher_id=None, semester=None, method=None,
+           start=None, end=None):
+    """
+    Attendance of closed sessions from the ``granularity`` rollups, grouped
+    by the dimensions in ``by`` and filtered by the rest. ``start`` and
+    ``end`` bound the periods' first days, inclusive. Returns a row per
+    group, ordered by the dimensions.
+    """
+    if granularity not in GRANULARITIES:
+        raise InvalidQuery(f"Unknown granularity: {granularity}")
+    for name in by:
+        if name not in DIMENSIONS:
+            raise InvalidQuery(f"Unknown dimension: {name}")
+    if 'weekday' in by and granularity != 'day':
+        raise InvalidQuery('weekday needs day granularity')
+
+    rollups = AttendanceRollup.objects.filter(granularity=granularity)
+    if class_id is not None:
+        rollups = rollups.filter(class_obj_id=class_id)
+    if teacher_id is not None:
+        rollups = rollups.filter(teacher_id=teacher_id)
+    if semester is not None:
+        rollups = rollups.filter(semester=semester)
+    if method is not None:
+        rollups = rollups.filter(method=method)
+    if start is not None:
+        rollups = rollups.filter(period_start__gte=start)
+    if end is not None:
+        rollups = rollups.filter(period_start__lte=end)
+    if 'weekday' in by:
+        rollups = rollups.annotate(weekday=ExtractIsoWeekDay('period_start'))
+
+    columns = [DIMENSIONS[name] for name in by]
+    groups = (
+        rollups.values(*columns)
+        .annotate(records=Sum('record_count'), present=Sum('present_count'))
+        .order_by(*columns)
+    )
+    return [
+        {
+            **{name: group[DIMENSIONS[name]] for name in by},
+            'records': group['records'],
+            'present': group['present'],
+            'attendance_percentage': round(group['present'] / group['records'] * 100, 2) if group['records'] else 0,
+        }
+        for group in groups
+    ]
@@ -0,0 +1,186 @@
+"""
+Schedule-driven session lifecycle.
+
+``materialize_sessions`` creates the sessions (and their absent-by-default
+rosters) that ``ClassSchedule`` rows call for over the coming days. They
+start out inactive, so nobody can check in days ahead;
+``open_started_sessions`` activates them at their start time.
+``close_expired_sessions`` deactivates sessions whose end time has passed,
+freezes their final attendance and rolls it up (see ``attendance.rollups``).
+All of them work in a handful of bulk queries and are run periodically by
+the job worker (see ``attendance.tasks``).
+"""
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from classes.models import Class, ClassSchedule
+from core.jobs import enqueue
+from core.sync import log_changes
+from core.versioning import bump
+from .models import AttendanceRecord, AttendanceSession
+from .rollups import refresh_rollups
+
+WEEKDAYS = [value for value, label in ClassSchedule.WEEKDAY_CHOICES]
+
+
+def materialize_sessions(start=None, days=7):
+    """
+    Create the scheduled sessions for ``days`` days from ``start`` (today by
+    default) that don't exist yet, each with an attendance record per
+    enrolled student. Returns the created sessions.
+
+    A class gets at most one session per date; if several schedules fall on
+    the same day the earliest one wins.
+    """
+    start = start or timezone.localdate()
+    dates = [start + datetime.timedelta(days=offset) for offset in range(days)]
+    dates_by_weekday = {}
+    for date in dates:
+        dates_by_weekday.setdefault(WEEKDAYS[date.weekday()], []).append(date)
+
+    schedules = ClassSchedule.objects.filter(weekday__in=dates_by_weekday).order_by('start_time')
+    existing = set(
+        AttendanceSession.objects.filter(session_date__range=(dates[0], dates[-1]))
+        .values_list('class_obj_id', 'session_date')
+    )
+
+    sessions = []
+    for schedule in schedules:
+        for date in dates_by_weekday[schedule.weekday]:
+            if (schedule.class_obj_id, date) in existing:
+                continue
+            existing.add((schedule.class_obj_id, date))
+            sessions.append(AttendanceSession(
+                class_obj_id=schedule.class_obj_id,
+                session_date=date,
+                start_time=schedule.start_time,
+                end_time=schedule.end_time,
+                is_active=False
+            ))
+    if not sessions:
+        return []
+
+    class_ids = {session.class_obj_id for session in sessions}
+    teachers = dict(Class.objects.filter(id__in=class_ids).values_list('id', 'teacher_id'))
+    rosters = {}
+    for class_id, student_id in Class.students.through.objects.filter(
+        class_id__in=class_ids
+    ).values_list('class_id', 'user_id'):
+        rosters.setdefault(class_id, []).append(student_id)
+
+    with transaction.atomic():
+        AttendanceSession.objects.bulk_create(sessions)
+        AttendanceRecord.objects.bulk_create(
+            [
+                AttendanceRecord(
+                    session=session,
+                    student_id=student_id,
+                    method='manual',
+                    recorded_by_id=teachers[session.class_obj_id]
+                )
+                for session in sessions
+                for student_id in rosters.get(session.class_obj_id, [])
+            ],
+            batch_size=1000,
+            ignore_conflicts=True
+        )
+        # Records inserted with ignore_conflicts come back without ids
+        log_changes('session', [(session.pk, session.class_obj_id, None) for session in sessions])
+        log_changes('record', AttendanceRecord.objects.filter(session__in=sessions).values_list(
+            'id', 'session__class_obj_id', 'student_id'
+        ))
+        bump(*(f"sessions:class:{class_id}" for class_id in class_ids))
+    return sessions
+
+
+def started_sessions(now=None):
+    """
+    Scheduled sessions not opened yet that are under way.
+    """
+    now = timezone.localtime(now)
+    return AttendanceSession.objects.filter(
+        closed_at__isnull=True, is_active=False, session_date=now.date(),
+        start_time__lte=now.time(), end_time__gt=now.time()
+    )
+
+
+def expired_sessions(now=None):
+    """
+    Sessions not closed yet, opened or not, whose date and end time are in
+    the past.
+    """
+    now = timezone.localtime(now)
+    return AttendanceSession.objects.filter(closed_at__isnull=True).filter(
+        Q(session_date__lt=now.date()) | Q(session_date=now.date(), end_time__lte=now.time())
+    )
+
+
+def final_counts():
+    """
+    ``update()`` arguments that freeze a session's record and present
+    counts, computed in the UPDATE itself.
+    """
+    records = AttendanceRecord.objects.filter(session=OuterRef('pk')).order_by().values('session')
+    total = records.annotate(count=Count('id')).values('count')
+    present = records.filter(is_present=True).annotate(count=Count('id')).values('count')
+    return {
+        'final_total': Coalesce(Subquery(total, output_field=IntegerField()), Value(0)),
+        'final_present': Coalesce(Subquery(present, output_field=IntegerField()), Value(0)),
+    }
+
+
+def open_started_sessions(now=None):
+    """
+    Open every scheduled session whose start time has come in one UPDATE.
+    Returns the number of sessions opened.
+    """
+    started = list(started_sessions(now).values_list('id', 'class_obj_id'))
+    if not started:
+        return 0
+    class_ids = {class_id for _, class_id in started}
+
+    with transaction.atomic():
+        opened = AttendanceSession.objects.filter(
+            id__in=[session_id for session_id, _ in started], is_active=False, closed_at__isnull=True
+        ).update(is_active=True)
+        log_changes('session', [(session_id, class_id, None) for session_id, class_id in started])
+        bump(*(f"sessions:class:{class_id}" for class_id in class_ids))
+    return opened
+
+
+def close_expired_sessions(now=None):
+    """
+    Close every expired session in one UPDATE, freezing its record and
+    present counts alongside. Returns the number of sessions closed.
+    """
+    now = now or timezone.now()
+    expired = list(expired_sessions(now).values_list('id', 'class_obj_id'))
+    if not expired:
+        return 0
+    sessions = AttendanceSession.objects.filter(
+        id__in=[session_id for session_id, _ in expired], closed_at__isnull=True
+    )
+    class_ids = {class_id for _, class_id in expired}
+
+    with transaction.atomic():
+        closed = sessions.update(is_active=False, closed_at=now, **final_counts())
+        log_changes('session', [(session_id, class_id, None) for session_id, class_id in expired])
+        bump(*(f"sessions:class:{class_id}" for class_id in class_ids))
+        refresh_rollups([session_id for session_id, _ in expired])
+    return closed
+
+
+def refreeze_sessions(session_ids):
+    """
+    Redo the frozen counts of closed sessions whose records changed, and
+    queue their rollups for a refresh.
+    """
+    if not session_ids:
+        return
+    AttendanceSession.objects.filter(id__in=session_ids).update(**final_counts())
+    for session_id in session_ids:
+        enqueue('rollups.refresh', {'session_ids': [session_id]}, dedupe_key=f"rollups.refresh:{session_id}")
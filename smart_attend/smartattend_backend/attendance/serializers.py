@@ -12,13 +12,23 @@ class AttendanceSessionSerializer(serializers.ModelSerializer):
     class Meta:
         model = AttendanceSession
         fields = ('id', 'class_obj', 'class_name', 'session_date', 'start_time', 'end_time', 
-                  'is_active', 'created_at', 'total_students', 'present_students')
-        read_only_fields = ('id', 'class_name', 'created_at', 'total_students', 'present_students')
+                  'is_active', 'created_at', 'closed_at', 'total_students', 'present_students')
+        read_only_fields = ('id', 'class_name', 'created_at', 'closed_at', 'total_students', 'present_students')
 
+    # Closed sessions report the counts frozen when they ended; listings
+    # annotate the live ones (see AttendanceSessionQuerySet.with_counts)
     def get_total_students(self, obj):
+        if obj.final_total is not None:
+            return obj.final_total
+        if hasattr(obj, 'roster_size'):
+            return obj.roster_size or 0
         return obj.class_obj.students.count()
 
     def get_present_students(self, obj):
+        if obj.final_present is not None:
+            return obj.final_present
+        if hasattr(obj, 'present_count'):
+            return obj.present_count or 0
         return obj.records.filter(is_present=True).count()
 
 
@@ -65,4 +75,16 @@ class StudentAttendanceSerializer(serializers.Serializer):
     total_classes = serializers.IntegerField()
     present_classes = serializers.IntegerField()
     absent_classes = serializers.IntegerField()
-    attendance_percentage = serializers.DecimalField(max_digits=5, decimal_places=2)
\ No newline at end of file
+    attendance_percentage = serializers.DecimalField(max_digits=5, decimal_places=2)
+
+
+class OfflineCheckinSerializer(serializers.Serializer):
+    """
+    One item of an offline check-in upload.
+    """
+    key = serializers.CharField(max_length=64)
+    code = serializers.CharField(max_length=100)
+    scanned_at = serializers.DateTimeField()
+    latitude = serializers.FloatField(required=False, allow_null=True, min_value=-90, max_value=90)
+    longitude = serializers.FloatField(required=False, allow_null=True, min_value=-180, max_value=180)
+    altitude = serializers.FloatField(required=False, allow_null=True)
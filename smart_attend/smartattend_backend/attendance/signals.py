@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .live import publish_record
+from .models import AttendanceRecord
+
+
+@receiver(post_save, sender=AttendanceRecord)
+def publish_record_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        publish_record(instance)
@@ -0,0 +1,34 @@
+"""
+Background job handlers for the attendance app.
+"""
+from django.conf import settings
+
+from core.jobs import job
+from .qr import sweep_qr_codes
+from .rollups import refresh_rollups
+from .scheduling import close_expired_sessions, materialize_sessions, open_started_sessions
+
+
+@job('sessions.materialize', every=settings.SESSION_MATERIALIZE_INTERVAL)
+def materialize_scheduled_sessions(days=None):
+    materialize_sessions(days=days or settings.SESSION_MATERIALIZE_DAYS)
+
+
+@job('sessions.open', every=settings.SESSION_OPEN_INTERVAL)
+def open_scheduled_sessions():
+    open_started_sessions()
+
+
+@job('sessions.close', every=settings.SESSION_CLOSE_INTERVAL)
+def close_ended_sessions():
+    close_expired_sessions()
+
+
+@job('qr.sweep', every=settings.QR_SWEEP_INTERVAL)
+def sweep_expired_qr_codes():
+    sweep_qr_codes()
+
+
+@job('rollups.refresh')
+def refresh_session_rollups(session_ids):
+    refresh_rollups(session_ids)
@@ -1,3 +1,666 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import json
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import LiveServerTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from accounts.models import User
+from classes.models import ClassSchedule
+from core.models import ChangeLog
+from core.testing import make_class
+from .checkin import record_attendance, upsert_records
+from .live import LocalBackend, PostgresBackend, hub, session_channel
+from .models import AttendanceRecord, AttendanceRollup, AttendanceSession, OfflineCheckin, QRCode
+from .views import upload_offline_checkins
+from .qr import expire_qr_codes, purge_qr_codes, sweep_qr_codes
+from .rollups import trends
+from .scheduling import close_expired_sessions, materialize_sessions, open_started_sessions
+
+
+def parse_event(chunk):
+    if isinstance(chunk, bytes):
+        chunk = chunk.decode()
+    lines = dict(line.split(': ', 1) for line in chunk.strip().splitlines())
+    return lines['event'], json.loads(lines['data'])
+
+
+class LiveSessionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher', password='x', role='teacher')
+        cls.student = User.objects.create_user('student', password='x', role='student')
+        cls.outsider = User.objects.create_user('outsider', password='x', role='student')
+        cls.class_obj = make_class(cls.teacher, [cls.student])
+        cls.session = AttendanceSession.objects.create(
+            class_obj=cls.class_obj,
+            session_date=datetime.date(2026, 1, 5),
+            start_time=datetime.time(9, 0),
+            end_time=datetime.time(10, 0)
+        )
+        cls.token = Token.objects.create(user=cls.teacher)
+
+    async def test_hub_delivers_to_subscribers_of_the_channel(self):
+        channel = session_channel(self.session.id)
+        loop, queue = subscriber = hub.subscribe(channel)
+        try:
+            LocalBackend().publish(channel, {'type': 'record'})
+            LocalBackend().publish(session_channel(0), {'type': 'other'})
+            message = await asyncio.wait_for(queue.get(), timeout=1)
+        finally:
+            hub.unsubscribe(channel, subscriber)
+
+        self.assertEqual(message, {'type': 'record'})
+        self.assertTrue(queue.empty())
+        self.assertFalse(hub.has_subscribers(channel))
+
+    def test_record_save_without_subscribers_publishes_nothing(self):
+        with mock.patch.object(LocalBackend, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                AttendanceRecord.objects.create(session=self.session, student=self.student, method='manual')
+
+        publish.assert_not_called()
+
+    async def test_postgres_backend_only_wants_watched_channels(self):
+        backend = PostgresBackend()
+        channel = session_channel(self.session.id)
+        self.addCleanup(cache.delete, backend.watch_key.format(channel))
+
+        self.assertFalse(backend.wants(channel))
+        await backend.watch(channel)  # as a stream in another process would
+        self.assertTrue(backend.wants(channel))
+
+    async def test_stream_sends_snapshot_then_record_deltas(self):
+        response = await self.async_client.get(
+            reverse('session-stream', args=[self.session.id]),
+            headers={'Authorization': f"Token {self.token.key}"}
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+
+        event, data = parse_event(await anext(stream))
+        self.assertEqual(event, 'snapshot')
+        self.assertEqual(data['counters'], {'present_students': 0, 'absent_students': 0, 'total_students': 1})
+
+        def mark_present():
+            with self.captureOnCommitCallbacks(execute=True):
+                AttendanceRecord.objects.create(
+                    session=self.session, student=self.student, method='qr', is_present=True
+                )
+
+        await sync_to_async(mark_present)()
+        event, data = parse_event(await asyncio.wait_for(anext(stream), timeout=1))
+        await stream.aclose()
+
+        self.assertEqual(event, 'record')
+        self.assertEqual(data['record']['student'], self.student.id)
+        self.assertEqual(data['counters']['present_students'], 1)
+
+    async def test_stream_requires_membership(self):
+        token = await Token.objects.acreate(user=self.outsider)
+
+        response = await self.async_client.get(
+            reverse('session-stream', args=[self.session.id]), {'token': token.key}
+        )
+
+        self.assertEqual(response.status_code, 403)
+
+
+class SessionListConditionalGetTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher', password='x', role='teacher')
+        cls.student = User.objects.create_user('student', password='x', role='student')
+        cls.class_obj = make_class(cls.teacher, [cls.student])
+        cls.session = AttendanceSession.objects.create(
+            class_obj=cls.class_obj,
+            session_date=datetime.date(2026, 1, 5),
+            start_time=datetime.time(9, 0),
+            end_time=datetime.time(10, 0)
+        )
+
+    def test_attendance_write_invalidates_session_listing(self):
+        self.client.force_authenticate(self.teacher)
+        url = reverse('get-sessions')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            AttendanceRecord.objects.create(session=self.session, student=self.student, method='manual', is_present=True)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['present_students'], 1)
+
+
+class AsyncCheckInTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher', password='x', role='teacher')
+        cls.student = User.objects.create_user('student', password='x', role='student')
+        cls.outsider = User.objects.create_user('outsider', password='x', role='student')
+        cls.class_obj = make_class(cls.teacher, [cls.student])
+        cls.session = AttendanceSession.objects.create(
+            class_obj=cls.class_obj,
+            session_date=datetime.date(2026, 1, 5),
+            start_time=datetime.time(9, 0),
+            end_time=datetime.time(10, 0)
+        )
+        cls.tokens = {user.username: Token.objects.create(user=user).key for user in (cls.teacher, cls.student, cls.outsider)}
+
+    def post(self, url, user, data):
+        return self.async_client.post(
+            url, data, content_type='application/json',
+            headers={'Authorization': f"Token {self.tokens[user.username]}"}
+        )
+
+    async def test_student_self_marks(self):
+        url = reverse('async-mark-attendance', args=[self.session.id])
+
+        response = await self.post(url, self.student, {'is_present': True})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['is_present'])
+        self.assertTrue(await AttendanceRecord.objects.filter(student=self.student, is_present=True).aexists())
+
+    async def test_teacher_marks_student(self):
+        url = reverse('async-mark-attendance', args=[self.session.id])
+
+        response = await self.post(url, self.teacher, {'student_id': self.student.id, 'is_present': True})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['recorded_by'], self.teacher.id)
+
+    async def test_unenrolled_student_cannot_mark(self):
+        url = reverse('async-mark-attendance', args=[self.session.id])
+
+        response = await self.post(url, self.outsider, {'is_present': True})
+
+        self.assertEqual(response.status_code, 403)
+
+    async def test_scan_marks_present_and_consumes_code(self):
+        qr_code = await QRCode.objects.acreate(
+            session=self.session, code='abc', expires_at=timezone.now() + datetime.timedelta(minutes=5)
+        )
+
+        response = await self.post(reverse('async-scan-qr'), self.student, {'code': 'abc'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['method'], 'qr')
+        await qr_code.arefresh_from_db()
+        self.assertFalse(qr_code.is_active)
+
+    async def test_scan_rejects_expired_code(self):
+        await QRCode.objects.acreate(
+            session=self.session, code='old', expires_at=timezone.now() - datetime.timedelta(minutes=1)
+        )
+
+        response = await self.post(reverse('async-scan-qr'), self.student, {'code': 'old'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'QR code has expired'})
+
+    async def test_requires_token(self):
+        response = await self.async_client.post(reverse('async-scan-qr'), {}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 401)
+
+
+class SessionSchedulingTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher', password='x', role='teacher')
+        cls.students = [User.objects.create_user(f"s{i}", password='x', role='student') for i in range(3)]
+        cls.class_obj = make_class(cls.teacher, cls.students)
+        ClassSchedule.objects.create(
+            class_obj=cls.class_obj, weekday='monday', start_time=datetime.time(9, 0), end_time=datetime.time(10, 0)
+        )
+        ClassSchedule.objects.create(
+            class_obj=cls.class_obj, weekday='wednesday', start_time=datetime.time(14, 0), end_time=datetime.time(15, 0)
+        )
+
+    def test_materializes_sessions_and_rosters_once(self):
+        monday = datetime.date(2026, 1, 5)
+
+        created = materialize_sessions(start=monday, days=7)
+        again = materialize_sessions(start=monday, days=14)
+
+        self.assertEqual([session.session_date for session in created], [monday, monday + datetime.timedelta(days=2)])
+        self.assertEqual(len(again), 2)  # only the following week is new
+        self.assertEqual(AttendanceSession.objects.count(), 4)
+        self.assertEqual(AttendanceRecord.objects.filter(is_present=False, recorded_by=self.teacher).count(), 12)
+
+    def test_sessions_open_at_their_start_time(self):
+        session, later = materialize_sessions(start=datetime.date(2026, 1, 5), days=3)
+        self.assertFalse(session.is_active)
+
+        self.client.force_authenticate(self.students[0])
+        url = reverse('mark-attendance', args=[session.id])
+        self.assertEqual(self.client.post(url, {}).status_code, 400)
+
+        self.assertEqual(open_started_sessions(timezone.make_aware(datetime.datetime(2026, 1, 5, 8, 59))), 0)
+        self.assertEqual(open_started_sessions(timezone.make_aware(datetime.datetime(2026, 1, 5, 9, 0))), 1)
+        self.assertEqual(self.client.post(url, {}).status_code, 200)
+        later.refresh_from_db()
+        self.assertFalse(later.is_active)
+
+    def test_session_never_opened_is_still_closed(self):
+        session, _ = materialize_sessions(start=datetime.date(2026, 1, 5), days=3)
+
+        self.assertEqual(close_expired_sessions(timezone.make_aware(datetime.datetime(2026, 1, 5, 10, 30))), 1)
+
+        session.refresh_from_db()
+        self.assertIsNotNone(session.closed_at)
+        self.assertEqual(open_started_sessions(timezone.make_aware(datetime.datetime(2026, 1, 5, 9, 30))), 0)
+
+    def test_close_freezes_final_counts(self):
+        ended, upcoming = materialize_sessions(start=datetime.date(2026, 1, 5), days=3)
+        AttendanceRecord.objects.filter(session=ended, student=self.students[0]).update(is_present=True)
+        now = timezone.make_aware(datetime.datetime(2026, 1, 5, 10, 30))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(close_expired_sessions(now), 1)
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "attendance_attendancesession"')]
+        self.assertEqual(len(updates), 1)
+
+        ended.refresh_from_db()
+        upcoming.refresh_from_db()
+        self.assertFalse(ended.is_active)
+        self.assertEqual((ended.final_present, ended.final_total), (1, 3))
+        self.assertIsNone(upcoming.closed_at)
+
+        # Later enrollment changes don't alter a closed session's figures
+        self.class_obj.students.remove(self.students[1])
+        self.client.force_authenticate(self.teacher)
+        response = self.client.get(reverse('session-detail', args=[ended.id]))
+        self.assertEqual((response.data['present_students'], response.data['total_students']), (1, 3))
+        self.assertIsNotNone(response.data['closed_at'])
+
+        response = self.client.post(reverse('mark-attendance', args=[ended.id]),
+                                    {'student_id': self.students[2].id, 'is_present': True})
+        self.assertEqual(response.status_code, 400)
+
+
+class QRCodeSweepTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        teacher = User.objects.create_user('teacher', password='x', role='teacher')
+        cls.session = AttendanceSession.objects.create(
+            class_obj=make_class(teacher),
+            session_date=datetime.date(2026, 1, 5),
+            start_time=datetime.time(9, 0),
+            end_time=datetime.time(10, 0)
+        )
+
+    def make_code(self, code, expires_in, is_active=True, age=datetime.timedelta(0)):
+        qr_code = QRCode.objects.create(
+            session=self.session, code=code, is_active=is_active,
+            expires_at=timezone.now() + expires_in
+        )
+        QRCode.objects.filter(id=qr_code.id).update(created_at=timezone.now() - age)
+        return qr_code
+
+    def test_expires_unscanned_codes(self):
+        self.make_code('stale', datetime.timedelta(minutes=-1))
+        fresh = self.make_code('fresh', datetime.timedelta(minutes=10))
+
+        self.assertEqual(expire_qr_codes(), 1)
+        self.assertEqual(list(QRCode.objects.filter(is_active=True)), [fresh])
+
+    def test_purges_old_inactive_codes_in_chunks(self):
+        for i in range(5):
+            self.make_code(f"old-{i}", datetime.timedelta(days=-30), is_active=False, age=datetime.timedelta(days=30))
+        recent = self.make_code('recent', datetime.timedelta(minutes=-1), is_active=False)
+
+        with CaptureQueriesContext(connection) as queries:
+            deleted = purge_qr_codes(timezone.now() - datetime.timedelta(days=7), chunk_size=2)
+
+        self.assertEqual(deleted, 5)
+        self.assertEqual(sum(q['sql'].startswith('DELETE') for q in queries), 3)
+        self.assertEqual(list(QRCode.objects.all()), [recent])
+
+    def test_sweep_expires_then_purges(self):
+        self.make_code('abandoned', datetime.timedelta(days=-10), age=datetime.timedelta(days=10))
+
+        self.assertEqual(sweep_qr_codes(), (1, 1))
+        self.assertFalse(QRCode.objects.exists())
+
+
+class SessionUniquenessTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher', password='x', role='teacher')
+        cls.class_obj = make_class(cls.teacher)
+
+    def test_duplicate_session_is_rejected(self):
+        self.client.force_authenticate(self.teacher)
+        data = {'class_id': self.class_obj.id, 'session_date': '2026-01-05', 'start_time': '09:00', 'end_time': '10:00'}
+
+        self.assertEqual(self.client.post(reverse('create-session'), data).status_code, 201)
+        response = self.client.post(reverse('create-session'), data)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error': 'Session already exists for this date'})
+
+    def test_session_is_not_left_without_its_roster(self):
+        self.client.force_authenticate(self.teacher)
+        data = {'class_id': self.class_obj.id, 'session_date': '2026-01-05', 'start_time': '09:00', 'end_time': '10:00'}
+
+        with mock.patch('attendance.checkin.upsert_records', side_effect=RuntimeError('roster failed')):
+            with self.assertRaises(RuntimeError):
+                self.client.post(reverse('create-session'), data)
+
+        self.assertFalse(AttendanceSession.objects.exists())
+
+    def test_constraint_holds_without_the_view(self):
+        fields = {'class_obj': self.class_obj, 'session_date': datetime.date(2026, 1, 5),
+                  'start_time': datetime.time(9, 0), 'end_time': datetime.time(10, 0)}
+        AttendanceSession.objects.create(**fields)
+
+        with self.assertRaises(IntegrityError):
+            AttendanceSession.objects.create(**fields)
+
+
+class RecordUpsertTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher', password='x', role='teacher')
+        cls.student = User.objects.create_user('student', password='x', role='student')
+        cls.class_obj = make_class(cls.teacher, [cls.student])
+        cls.session = AttendanceSession.objects.create(
+            class_obj=cls.class_obj,
+            session_date=datetime.date(2026, 1, 5),
+            start_time=datetime.time(9, 0),
+            end_time=datetime.time(10, 0)
+        )
+
+    def test_marking_upserts_without_reading_the_record(self):
+        self.client.force_authenticate(self.teacher)
+        url = reverse('mark-attendance', args=[self.session.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'student_id': self.student.id, 'is_present': True}, format='json')
+
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'student_id': self.student.id, 'is_present': False}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        record = AttendanceRecord.objects.get(session=self.session, student=self.student)
+        self.assertEqual(response.data['id'], record.id)
+        self.assertFalse(record.is_present)
+        touching = [query['sql'] for query in queries if 'attendance_attendancerecord' in query['sql']]
+        self.assertEqual(len(touching), 1)
+        self.assertIn('ON CONFLICT', touching[0])
+        self.assertEqual(ChangeLog.objects.filter(kind='record', object_id=record.id).count(), 2)
+
+    def test_record_attendance_keeps_fields_it_was_not_given(self):
+        record_attendance(self.session, self.student, method='manual', latitude=12.5, longitude=77.25)
+        record = record_attendance(self.session, self.student, is_present=True, method='qr')
+
+        record.refresh_from_db()
+        self.assertTrue(record.is_present)
+        self.assertEqual(record.method, 'qr')
+        self.assertEqual((record.latitude, record.longitude), (12.5, 77.25))
+        self.assertEqual(AttendanceRecord.objects.filter(session=self.session).count(), 1)
+
+    def test_upsert_into_closed_session_refreezes_counts(self):
+        close_expired_sessions(now=timezone.make_aware(datetime.datetime(2026, 1, 5, 12, 0)))
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.final_present, 0)
+
+        upsert_records([AttendanceRecord(session=self.session, student=self.student, is_present=True, method='manual')])
+
+        self.session.refresh_from_db()
+        self.assertEqual((self.session.final_total, self.session.final_present), (1, 1))
+
+
+class RecordAdminActionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', password='x', role='admin')
+        cls.teacher = User.objects.create_user('teacher', password='x', role='teacher')
+        cls.students = [User.objects.create_user(f"student{i}", password='x', role='student') for i in range(3)]
+        cls.class_obj = make_class(cls.teacher, cls.students)
+        cls.session = AttendanceSession.objects.create(
+            class_obj=cls.class_obj,
+            session_date=datetime.date(2026, 1, 5),
+            start_time=datetime.time(9, 0),
+            end_time=datetime.time(10, 0)
+        )
+        for student in cls.students:
+            AttendanceRecord.objects.create(session=cls.session, student=student, method='qr')
+
+    def test_mark_present_updates_in_bulk_and_refreezes(self):
+        close_expired_sessions(now=timezone.make_aware(datetime.datetime(2026, 1, 5, 12, 0)))
+        ids = list(AttendanceRecord.objects.values_list('id', flat=True))
+        self.client.force_login(self.admin)
+
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('admin:attendance_attendancerecord_changelist'),
+                             {'action': 'mark_present', '_selected_action': ids[:2]})
+
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "attendance_attendancerecord"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(AttendanceRecord.objects.filter(is_present=True, recorded_by=self.admin).count(), 2)
+        self.session.refresh_from_db()
+        self.assertEqual((self.session.final_total, self.session.final_present), (3, 2))
+        self.assertEqual(ChangeLog.objects.filter(kind='record', object_id__in=ids[:2], action='upsert').count(), 2)
+
+
+class AttendanceRollupTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher', password='x', role='teacher')
+        cls.other_teacher = User.objects.create_user('other', password='x', role='teacher')
+        cls.admin = User.objects.create_user('admin', password='x', role='admin')
+        cls.students = [User.objects.create_user(f"student{i}", password='x', role='student') for i in range(3)]
+        cls.class_obj = make_class(cls.teacher, cls.students)
+        # Monday and Wednesday of one week, Monday of the next; the first
+        # student misses the Wednesday, the second checks in by QR
+        cls.sessions = []
+        for day in (5, 7, 12):
+            session = AttendanceSession.objects.create(
+                class_obj=cls.class_obj,
+                session_date=datetime.date(2026, 1, day),
+                start_time=datetime.time(9, 0),
+                end_time=datetime.time(10, 0)
+            )
+            for student in cls.students:
+                AttendanceRecord.objects.create(
+                    session=session, student=student, is_present=not (day == 7 and student == cls.students[0]),
+                    method='qr' if student == cls.students[1] else 'manual'
+                )
+            cls.sessions.append(session)
+
+    def close(self):
+        close_expired_sessions(now=timezone.make_aware(datetime.datetime(2026, 1, 12, 12, 0)))
+
+    def test_closing_rolls_up_days_weeks_and_months(self):
+        self.close()
+
+        counts = {
+            granularity: AttendanceRollup.objects.filter(granularity=granularity).count()
+            for granularity in ('day', 'week', 'month')
+        }
+        self.assertEqual(counts, {'day': 6, 'week': 4, 'month': 2})  # manual and qr cells
+        weeks = trends('week', by=('period',))
+        self.assertEqual(
+            [(row['period'], row['records'], row['present']) for row in weeks],
+            [(datetime.date(2026, 1, 5), 6, 5), (datetime.date(2026, 1, 12), 3, 3)]
+        )
+        self.assertEqual(weeks[0]['attendance_percentage'], 83.33)
+
+        # Closing again recomputes rather than adding
+        call_command('rebuild_rollups', stdout=open(os.devnull, 'w'))
+        self.assertEqual(trends('month', by=('period',))[0]['records'], 9)
+
+    def test_trends_slice_by_weekday_and_method(self):
+        self.close()
+
+        by_weekday = trends('day', by=('weekday',))
+        self.assertEqual([(row['weekday'], row['records'], row['present']) for row in by_weekday], [(1, 6, 6), (3, 3, 2)])
+        by_method = trends('month', by=('method',), start=datetime.date(2026, 1, 1), end=datetime.date(2026, 1, 1))
+        self.assertEqual([(row['method'], row['records'], row['present']) for row in by_method],
+                         [('manual', 6, 5), ('qr', 3, 3)])
+
+        with CaptureQueriesContext(connection) as queries:
+            trends('week', by=('slot', 'class'), teacher_id=self.teacher.id)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('attendance_attendancerecord', queries[0]['sql'])
+
+    @override_settings(JOBS_ALWAYS_EAGER=True)
+    def test_late_change_to_closed_session_refreshes_rollups(self):
+        self.close()
+        session = AttendanceSession.objects.get(id=self.sessions[1].id)
+
+        upsert_records([AttendanceRecord(session=session, student=self.students[0], is_present=True, method='manual')])
+
+        self.assertEqual(trends('week', by=('period',), end=datetime.date(2026, 1, 5))[0]['present'], 6)
+        self.assertEqual(trends('month', by=('period',))[0]['present'], 9)
+
+    def test_trends_endpoint(self):
+        self.close()
+        url = reverse('attendance-trends')
+
+        self.client.force_authenticate(self.students[0])
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_authenticate(self.other_teacher)
+        response = self.client.get(url, {'teacher_id': self.teacher.id})
+        self.assertEqual(response.data['rows'], [])
+
+        self.client.force_authenticate(self.teacher)
+        response = self.client.get(url, {'granularity': 'day', 'by': 'weekday,method'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['rows']), 4)
+        self.assertEqual(self.client.get(url, {'by': 'weekday'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'by': 'room'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': 'monday'}).status_code, 400)
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(url, {'granularity': 'month', 'class_id': self.class_obj.id})
+        self.assertEqual(response.data['rows'][0]['records'], 9)
+
+
+class OfflineCheckinTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher', password='x', role='teacher')
+        cls.student = User.objects.create_user('student', password='x', role='student')
+        cls.class_obj = make_class(cls.teacher, [cls.student])
+        # Closed while the student was offline
+        cls.session = AttendanceSession.objects.create(
+            class_obj=cls.class_obj, session_date=datetime.date(2026, 1, 5),
+            start_time=datetime.time(9, 0), end_time=datetime.time(10, 0),
+            is_active=False, closed_at=timezone.now(), final_total=1, final_present=0
+        )
+        cls.record = AttendanceRecord.objects.create(session=cls.session, student=cls.student, method='manual')
+        cls.qr_code = QRCode.objects.create(session=cls.session, code='offline', expires_at=cls.at(9, 15))
+        QRCode.objects.filter(id=cls.qr_code.id).update(created_at=cls.at(9, 0))
+
+    @staticmethod
+    def at(hour, minute):
+        return datetime.datetime(2026, 1, 5, hour, minute, tzinfo=timezone.get_current_timezone())
+
+    def checkin(self, key, scanned_at, code='offline', **kwargs):
+        return {'key': key, 'code': code, 'scanned_at': scanned_at.isoformat(), **kwargs}
+
+    def upload(self, *checkins, user=None):
+        self.client.force_authenticate(user or self.student)
+        return self.client.post(reverse('offline-checkins'), {'checkins': list(checkins)}, format='json')
+
+    def test_validates_and_deduplicates_each_checkin(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.upload(
+                self.checkin('late', self.at(9, 10)),
+                self.checkin('first', self.at(9, 5), latitude=12.9716, longitude=77.5946),
+                self.checkin('first', self.at(9, 5)),
+                self.checkin('after-expiry', self.at(9, 40)),
+                self.checkin('unknown', self.at(9, 5), code='nope'),
+                self.checkin('far', self.at(9, 5), latitude=13.5, longitude=77.5946),
+                {'key': 'no-time', 'code': 'offline'},
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(queries), upload_offline_checkins.query_budget.queries)
+        results = response.data['results']
+        self.assertEqual([r['status'] for r in results],
+                         ['duplicate', 'recorded', 'duplicate', 'rejected', 'rejected', 'rejected', 'rejected'])
+        self.assertEqual({results[0]['record'], results[1]['record'], results[2]['record']}, {self.record.id})
+        self.assertEqual(results[3]['error'], 'QR code had expired')
+        self.assertEqual(results[4]['error'], 'Invalid QR code')
+        self.assertEqual(results[5]['error'], 'Too far from the class location')
+        self.assertTrue(results[6]['error'].startswith('scanned_at'))
+
+        self.record.refresh_from_db()
+        self.assertEqual((self.record.is_present, self.record.method), (True, 'qr'))
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.final_present, 1)
+        self.assertFalse(QRCode.objects.get(id=self.qr_code.id).is_active)
+
+    def test_reupload_changes_nothing(self):
+        self.upload(self.checkin('scan', self.at(9, 5)))
+        # The teacher corrects the record before the device retries
+        AttendanceRecord.objects.filter(id=self.record.id).update(is_present=False)
+
+        results = self.upload(self.checkin('scan', self.at(9, 5))).data['results']
+
+        self.assertEqual(results[0]['status'], 'duplicate')
+        self.assertFalse(AttendanceRecord.objects.get(id=self.record.id).is_present)
+        self.assertEqual(OfflineCheckin.objects.filter(student=self.student).count(), 1)
+
+    def test_rejects_scans_outside_the_session_or_class(self):
+        outsider = User.objects.create_user('outsider', password='x', role='student')
+        QRCode.objects.filter(id=self.qr_code.id).update(expires_at=self.at(12, 0))
+
+        self.assertEqual(self.upload(self.checkin('late', self.at(11, 0))).data['results'][0]['error'],
+                         'Scanned outside the session')
+        self.assertEqual(self.upload(self.checkin('x', self.at(9, 5)), user=outsider).data['results'][0]['error'],
+                         'You are not enrolled in this class')
+
+    def test_codes_stay_single_use(self):
+        classmate = User.objects.create_user('classmate', password='x', role='student')
+        self.class_obj.students.add(classmate)
+        # Expiry deactivates the code but doesn't use it up
+        expire_qr_codes()
+
+        self.assertEqual(self.upload(self.checkin('mine', self.at(9, 5))).data['results'][0]['status'], 'recorded')
+        result = self.upload(self.checkin('shared', self.at(9, 6)), user=classmate).data['results'][0]
+        self.assertEqual((result['status'], result['error']), ('rejected', 'QR code has already been used'))
+        self.assertFalse(AttendanceRecord.objects.filter(student=classmate, is_present=True).exists())
+
+    def test_batch_is_checked(self):
+        self.assertEqual(self.upload(user=self.teacher).status_code, 403)
+        self.assertEqual(self.upload().status_code, 400)
+        with self.settings(OFFLINE_CHECKIN_MAX_BATCH=1):
+            self.assertEqual(self.upload(self.checkin('a', self.at(9, 5)), self.checkin('b', self.at(9, 6))).status_code, 400)
+
+
+class ScanStormTests(LiveServerTestCase):
+    def test_storm_reports_and_cleans_up(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'storm.json')
+            call_command(
+                'bench_scan_storm', url=self.live_server_url, students=12, window=0, retry_rate=0.5,
+                processes=1, threads=1, output=output, stdout=open(os.devnull, 'w')
+            )
+            with open(output) as f:
+                report = json.load(f)
+
+        self.assertEqual(set(report['endpoints']) - {'scan', 'mark', 'location'}, {'total'})
+        self.assertGreaterEqual(report['endpoints']['total']['requests'], 12)
+        self.assertGreater(report['outcomes']['ok'], 0)
+        # Serialized requests don't race, so the records must match the responses
+        self.assertEqual(set(report['anomalies'].values()), {0})
+        self.assertFalse(User.objects.filter(username__startswith='storm-').exists())
+        self.assertFalse(AttendanceSession.objects.exists())
@@ -2,7 +2,9 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from django.conf import settings
 from django.utils import timezone
+from django.db import IntegrityError
 from django.db.models import Count, Q
 from .models import AttendanceSession, AttendanceRecord, QRCode
 from .serializers import (
@@ -11,12 +13,31 @@ from .serializers import (
 )
 from classes.models import Class
 from accounts.models import User
+from core.notifications import notify_session_started
+from core.budgets import query_budget
+from core.throttling import low_priority, throttle_scope
+from core.idempotency import idempotent
+from core.writer import write
+from .checkin import create_session, record_attendance, redeem_qr_code
+from .offline import apply_offline_checkins
+from . import rollups
+from core.replicas import replica_reads
+from core.versioning import conditional
 import uuid
 import datetime
 
 
+def session_list_scopes(request):
+    scopes = ['classes', f"enrollment:user:{request.user.id}"]
+    for class_id in Class.objects.visible_to(request.user).values_list('id', flat=True):
+        scopes += [f"class:{class_id}", f"sessions:class:{class_id}"]
+    return scopes
+
+
+@query_budget(4)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional(session_list_scopes, cache=True)
 def get_attendance_sessions(request):
     # Admin can see all sessions
     # Teacher can see sessions for their classes
@@ -30,12 +51,14 @@ def get_attendance_sessions(request):
     else:
         return Response({'error': 'Invalid user role'}, status=status.HTTP_400_BAD_REQUEST)
     
-    serializer = AttendanceSessionSerializer(sessions, many=True)
+    serializer = AttendanceSessionSerializer(sessions.with_counts(), many=True)
     return Response(serializer.data)
 
 
+@query_budget(12)
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def create_attendance_session(request):
     if request.user.role != 'teacher':
         return Response({'error': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
@@ -50,35 +73,26 @@ def create_attendance_session(request):
     except Class.DoesNotExist:
         return Response({'error': 'Class not found or not authorized'}, status=status.HTTP_404_NOT_FOUND)
     
-    # Check if session already exists for this date and class
-    existing_session = AttendanceSession.objects.filter(
-        class_obj=class_obj,
-        session_date=session_date
-    ).first()
-    
-    if existing_session:
+    # One session per class per date, enforced by a unique constraint so
+    # concurrent requests can't both create one. The session and its
+    # absent-by-default roster are written together.
+    try:
+        session = write(
+            create_session, class_obj, request.user,
+            session_date=session_date,
+            start_time=start_time,
+            end_time=end_time
+        )
+    except IntegrityError:
         return Response({'error': 'Session already exists for this date'}, status=status.HTTP_400_BAD_REQUEST)
     
-    session = AttendanceSession.objects.create(
-        class_obj=class_obj,
-        session_date=session_date,
-        start_time=start_time,
-        end_time=end_time
-    )
-    
-    # Create attendance records for all students in the class
-    for student in class_obj.students.all():
-        AttendanceRecord.objects.create(
-            session=session,
-            student=student,
-            method='manual',
-            recorded_by=request.user
-        )
+    notify_session_started(session)
     
     serializer = AttendanceSessionSerializer(session)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+@query_budget(6)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_session_detail(request, session_id):
@@ -97,8 +111,10 @@ def get_session_detail(request, session_id):
     return Response(serializer.data)
 
 
+@query_budget(9)
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def mark_attendance(request, session_id):
     try:
         session = AttendanceSession.objects.get(id=session_id)
@@ -141,23 +157,21 @@ def mark_attendance(request, session_id):
         return Response({'error': 'Student not enrolled in this class'}, status=status.HTTP_400_BAD_REQUEST)
     
     # Update or create attendance record
-    record, created = AttendanceRecord.objects.update_or_create(
-        session=session,
-        student=student,
-        defaults={
-            'is_present': is_present,
-            'method': method,
-            'recorded_by': request.user,
-            'latitude': latitude,
-            'longitude': longitude,
-            'altitude': altitude
-        }
+    record = write(
+        record_attendance, session, student,
+        is_present=is_present,
+        method=method,
+        recorded_by=request.user,
+        latitude=latitude,
+        longitude=longitude,
+        altitude=altitude
     )
     
     serializer = AttendanceRecordSerializer(record)
     return Response(serializer.data)
 
 
+@query_budget(3)
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def generate_qr_code(request, session_id):
@@ -183,8 +197,11 @@ def generate_qr_code(request, session_id):
     return Response(serializer.data)
 
 
+@query_budget(9)
+@throttle_scope('checkin')
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def scan_qr_code(request):
     if request.user.role != 'student':
         return Response({'error': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
@@ -207,27 +224,44 @@ def scan_qr_code(request):
     if request.user not in session.class_obj.students.all():
         return Response({'error': 'You are not enrolled in this class'}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Mark attendance
-    record, created = AttendanceRecord.objects.update_or_create(
-        session=session,
-        student=request.user,
-        defaults={
-            'is_present': True,
-            'method': 'qr',
-            'recorded_by': request.user
-        }
-    )
-    
-    # Deactivate QR code after use
-    qr_code.is_active = False
-    qr_code.save()
+    # Mark attendance and deactivate the QR code, unless another scan used it first
+    record = write(redeem_qr_code, qr_code, request.user)
+    if record is None:
+        return Response({'error': 'Invalid or expired QR code'}, status=status.HTTP_400_BAD_REQUEST)
     
     serializer = AttendanceRecordSerializer(record)
     return Response(serializer.data)
 
 
+@query_budget(15)
+@throttle_scope('checkin')
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def upload_offline_checkins(request):
+    """
+    Apply QR check-ins queued on the device while offline (Student only).
+    Responds with an outcome per check-in; see attendance.offline.
+    """
+    if request.user.role != 'student':
+        return Response({'error': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
+    
+    checkins = request.data.get('checkins')
+    if not isinstance(checkins, list) or not checkins:
+        return Response({'error': 'checkins must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(checkins) > settings.OFFLINE_CHECKIN_MAX_BATCH:
+        return Response(
+            {'error': f"At most {settings.OFFLINE_CHECKIN_MAX_BATCH} check-ins per upload"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    return Response({'results': apply_offline_checkins(request.user, checkins)})
+
+
+@query_budget(4)
+@low_priority
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@replica_reads
 def get_class_attendance_summary(request, class_id):
     try:
         class_obj = Class.objects.get(id=class_id)
@@ -269,8 +303,11 @@ def get_class_attendance_summary(request, class_id):
     return Response(serializer.data)
 
 
+@query_budget(4)
+@low_priority
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@replica_reads
 def get_student_attendance(request, student_id=None):
     # If no student_id provided, use current user
     if not student_id:
@@ -287,13 +324,7 @@ def get_student_attendance(request, student_id=None):
             try:
                 student = User.objects.get(id=student_id, role='student')
                 # Check if student is in any of the teacher's classes
-                teacher_classes = Class.objects.filter(teacher=request.user)
-                student_in_teacher_class = False
-                for class_obj in teacher_classes:
-                    if student in class_obj.students.all():
-                        student_in_teacher_class = True
-                        break
-                if not student_in_teacher_class:
+                if not Class.objects.filter(teacher=request.user, students=student).exists():
                     return Response({'error': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
             except User.DoesNotExist:
                 return Response({'error': 'Student not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -345,4 +376,42 @@ def get_student_attendance(request, student_id=None):
         })
     
     serializer = StudentAttendanceSerializer(attendance_data, many=True)
-    return Response(serializer.data)
\ No newline at end of file
+    return Response(serializer.data)
+
+
+@query_budget(2)
+@low_priority
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@replica_reads
+def get_attendance_trends(request):
+    """
+    Attendance trends from the rollups (see ``attendance.rollups``):
+    ``granularity`` (day, week or month) and ``by``, a comma-separated list
+    of dimensions, with ``class_id``, ``teacher_id``, ``semester``,
+    ``method``, ``start`` and ``end`` as filters. Teachers only see their
+    own classes.
+    """
+    if request.user.role not in ('teacher', 'admin'):
+        return Response({'error': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
+    
+    params = request.query_params
+    filters = {'semester': params.get('semester'), 'method': params.get('method')}
+    try:
+        for name in ('class_id', 'teacher_id'):
+            filters[name] = int(params[name]) if params.get(name) else None
+        for name in ('start', 'end'):
+            filters[name] = datetime.date.fromisoformat(params[name]) if params.get(name) else None
+    except ValueError:
+        return Response({'error': 'Invalid filter'}, status=status.HTTP_400_BAD_REQUEST)
+    if request.user.role == 'teacher':
+        filters['teacher_id'] = request.user.id
+    
+    granularity = params.get('granularity', 'week')
+    by = [name.strip() for name in params.get('by', 'period').split(',') if name.strip()]
+    try:
+        rows = rollups.trends(granularity, by, **filters)
+    except rollups.InvalidQuery as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'granularity': granularity, 'by': by, 'rows': rows})
+
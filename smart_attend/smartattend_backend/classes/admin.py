@@ -1,4 +1,5 @@
 from django.contrib import admin
+from core.changelists import AutocompleteFilter, LargeTableAdmin
 from .models import Class, ClassSchedule
 
 
@@ -7,15 +8,29 @@ class ClassScheduleInline(admin.TabularInline):
     extra = 1
 
 
+class TeacherFilter(AutocompleteFilter):
+    title = 'teacher'
+    field_path = 'teacher'
+
+
+class ClassFilter(AutocompleteFilter):
+    title = 'class'
+    field_path = 'class_obj'
+
+
 @admin.register(Class)
-class ClassAdmin(admin.ModelAdmin):
+class ClassAdmin(LargeTableAdmin):
     list_display = ('course_name', 'course_id', 'semester', 'section', 'teacher', 'room_number')
-    list_filter = ('semester', 'section', 'teacher')
+    list_filter = ('semester', 'section', TeacherFilter)
+    list_select_related = ('teacher',)
     search_fields = ('course_name', 'course_id', 'teacher__username')
+    autocomplete_fields = ('teacher',)
     inlines = [ClassScheduleInline]
 
 
 @admin.register(ClassSchedule)
-class ClassScheduleAdmin(admin.ModelAdmin):
+class ClassScheduleAdmin(LargeTableAdmin):
     list_display = ('class_obj', 'weekday', 'start_time', 'end_time')
-    list_filter = ('weekday', 'class_obj')
\ No newline at end of file
+    list_filter = ('weekday', ClassFilter)
+    list_select_related = ('class_obj',)
+    autocomplete_fields = ('class_obj',)
@@ -2,6 +2,30 @@ from django.db import models
 from accounts.models import User
 
 
+class ClassQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """
+        Classes a user may see: all for admins, taught classes for teachers
+        and enrolled classes for students. Unknown roles see nothing.
+        """
+        if user.role == 'admin':
+            return self.all()
+        elif user.role == 'teacher':
+            return self.filter(teacher=user)
+        elif user.role == 'student':
+            return self.filter(students=user)
+        return self.none()
+
+    def with_details(self):
+        """
+        Fetch everything ``ClassSerializer`` renders in a fixed number of
+        queries, however many classes are listed.
+        """
+        return self.select_related('teacher').prefetch_related(
+            'schedules', models.Prefetch('students', queryset=User.objects.only('id'))
+        )
+
+
 class Class(models.Model):
     course_id = models.CharField(max_length=20)
     course_name = models.CharField(max_length=100)
@@ -18,6 +42,8 @@ class Class(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ClassQuerySet.as_manager()
+
     class Meta:
         verbose_name_plural = "Classes"
 
@@ -1,6 +1,27 @@
 from rest_framework import serializers
 from .models import Class, ClassSchedule
 from accounts.models import User
+from core.sync import log_changes
+from core.versioning import bump
+
+
+class UserListField(serializers.ListField):
+    """
+    A list of user ids, validated with one query for the whole list rather
+    than one per id as ``PrimaryKeyRelatedField(many=True)`` does.
+    """
+    child = serializers.IntegerField()
+
+    def to_internal_value(self, data):
+        ids = super().to_internal_value(data)
+        users = list(User.objects.filter(id__in=ids))
+        missing = set(ids) - {user.id for user in users}
+        if missing:
+            raise serializers.ValidationError(f'Invalid pk "{min(missing)}" - object does not exist.')
+        return users
+
+    def to_representation(self, value):
+        return [user.pk for user in value.all()]
 
 
 class ClassScheduleSerializer(serializers.ModelSerializer):
@@ -38,6 +59,7 @@ class ClassSerializer(serializers.ModelSerializer):
 
 class ClassCreateSerializer(serializers.ModelSerializer):
     schedules = ClassScheduleSerializer(many=True, required=False)
+    students = UserListField(required=False)
 
     class Meta:
         model = Class
@@ -52,12 +74,16 @@ class ClassCreateSerializer(serializers.ModelSerializer):
         class_obj = Class.objects.create(**validated_data)
         
         # Add students to the class
-        for student in students_data:
-            class_obj.students.add(student)
+        class_obj.students.add(*students_data)
         
         # Create schedules
-        for schedule_data in schedules_data:
-            ClassSchedule.objects.create(class_obj=class_obj, **schedule_data)
+        if schedules_data:
+            ClassSchedule.objects.bulk_create([
+                ClassSchedule(class_obj=class_obj, **schedule_data) for schedule_data in schedules_data
+            ])
+            # bulk_create sends no post_save for the version bump or change log
+            bump(f"class:{class_obj.pk}")
+            log_changes('class', [(class_obj.pk, class_obj.pk, None)])
             
         return class_obj
 
@@ -77,13 +103,19 @@ class ClassCreateSerializer(serializers.ModelSerializer):
         # Update schedules
         if schedules_data:
             instance.schedules.all().delete()
-            for schedule_data in schedules_data:
-                ClassSchedule.objects.create(class_obj=instance, **schedule_data)
+            ClassSchedule.objects.bulk_create([
+                ClassSchedule(class_obj=instance, **schedule_data) for schedule_data in schedules_data
+            ])
+            # bulk_create sends no post_save for the version bump or change log
+            bump(f"class:{instance.pk}")
+            log_changes('class', [(instance.pk, instance.pk, None)])
             
         return instance
 
 
 class ClassEnrollmentSerializer(serializers.ModelSerializer):
+    students = UserListField()
+
     class Meta:
         model = Class
         fields = ('id', 'students')
\ No newline at end of file
@@ -1,3 +1,94 @@
-from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from accounts.models import User
+from core.testing import make_class
+from .models import ClassSchedule
+
+
+class ConditionalGetTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='x', role='admin')
+        cls.teacher = User.objects.create_user('teacher', password='x', role='teacher')
+        cls.student = User.objects.create_user('student', password='x', role='student')
+        cls.class_obj = make_class(cls.teacher, [cls.student])
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_listing_returns_304_without_serializing(self):
+        self.client.force_authenticate(self.student)
+        url = reverse('get-classes')
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(2):  # visible class ids + versions
+            response = self.revalidate(url, etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_schedule_change_invalidates_listing_and_detail(self):
+        self.client.force_authenticate(self.student)
+        list_url = reverse('get-classes')
+        detail_url = reverse('class-detail', args=[self.class_obj.id])
+        list_etag = self.client.get(list_url)['ETag']
+        detail_etag = self.client.get(detail_url)['ETag']
+
+        ClassSchedule.objects.create(
+            class_obj=self.class_obj, weekday='monday',
+            start_time=self.class_obj.start_time, end_time=self.class_obj.end_time
+        )
+
+        self.assertEqual(self.revalidate(list_url, list_etag).status_code, 200)
+        self.assertEqual(self.revalidate(detail_url, detail_etag).status_code, 200)
+
+    def test_unenrolled_student_gets_fresh_response_not_304(self):
+        self.client.force_authenticate(self.student)
+        detail_url = reverse('class-detail', args=[self.class_obj.id])
+        etag = self.client.get(detail_url)['ETag']
+
+        self.class_obj.students.remove(self.student)
+
+        self.assertEqual(self.revalidate(detail_url, etag).status_code, 403)
+
+    def test_enrollment_changes_student_listing(self):
+        other = make_class(self.teacher, course_id='CS102')
+        self.client.force_authenticate(self.student)
+        url = reverse('student-classes', args=[self.student.id])
+        etag = self.client.get(url)['ETag']
+
+        other.students.add(self.student)
+        response = self.revalidate(url, etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+
+    def test_teacher_profile_change_invalidates_teacher_listing(self):
+        self.client.force_authenticate(self.admin)
+        url = reverse('teacher-classes', args=[self.teacher.id])
+        etag = self.client.get(url)['ETag']
+
+        self.teacher.first_name = 'Ada'
+        self.teacher.save()
+
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+    def test_etag_is_per_user(self):
+        url = reverse('get-classes')
+        self.client.force_authenticate(self.admin)
+        etag = self.client.get(url)['ETag']
+
+        self.client.force_authenticate(self.teacher)
+
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+    def test_profile_etag(self):
+        self.client.force_authenticate(self.student)
+        url = reverse('user-profile')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.revalidate(url, etag).status_code, 304)
+
+        self.client.put(reverse('update-profile'), {'section': 'B'})
+
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
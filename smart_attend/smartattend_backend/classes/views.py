@@ -5,10 +5,53 @@ from rest_framework.response import Response
 from .models import Class, ClassSchedule
 from .serializers import ClassSerializer, ClassCreateSerializer, ClassEnrollmentSerializer
 from accounts.models import User
+from core.notifications import notify_class_updated
+from core.budgets import query_budget
+from core.versioning import conditional
 
 
+def class_list_scopes(classes, *extra):
+    scopes = ['classes', *extra]
+    for class_id, teacher_id in classes.values_list('id', 'teacher_id'):
+        scopes += [f"class:{class_id}", f"user:{teacher_id}"]
+    return scopes
+
+
+def visible_class_scopes(request):
+    return class_list_scopes(
+        Class.objects.visible_to(request.user), f"enrollment:user:{request.user.id}"
+    )
+
+
+def class_detail_scopes(request, class_id):
+    teacher_id = Class.objects.filter(id=class_id).values_list('teacher_id', flat=True).first()
+    if teacher_id is None:
+        return None
+    if request.user.role == 'teacher' and teacher_id != request.user.id:
+        return None
+    if request.user.role == 'student' and not request.user.enrolled_classes.filter(id=class_id).exists():
+        return None
+    return [f"class:{class_id}", f"user:{teacher_id}"]
+
+
+def teacher_classes_scopes(request, teacher_id):
+    if request.user.role != 'admin' and request.user.id != int(teacher_id):
+        return None
+    return class_list_scopes(Class.objects.filter(teacher_id=teacher_id))
+
+
+def student_classes_scopes(request, student_id):
+    if request.user.role != 'admin' and request.user.id != int(student_id):
+        return None
+    return class_list_scopes(
+        Class.objects.filter(students__id=student_id), f"enrollment:user:{student_id}"
+    )
+
+
+@query_budget(6)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional(visible_class_scopes, cache=True)
 def get_classes(request):
     # Admin can see all classes
     # Teacher can see their classes
@@ -22,10 +65,11 @@ def get_classes(request):
     else:
         return Response({'error': 'Invalid user role'}, status=status.HTTP_400_BAD_REQUEST)
     
-    serializer = ClassSerializer(classes, many=True)
+    serializer = ClassSerializer(classes.with_details(), many=True)
     return Response(serializer.data)
 
 
+@query_budget(16)
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def create_class(request):
@@ -39,8 +83,10 @@ def create_class(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@query_budget(10)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional(class_detail_scopes)
 def get_class_detail(request, class_id):
     try:
         class_obj = Class.objects.get(id=class_id)
@@ -57,6 +103,7 @@ def get_class_detail(request, class_id):
     return Response(serializer.data)
 
 
+@query_budget(19)
 @api_view(['PUT'])
 @permission_classes([IsAuthenticated])
 def update_class(request, class_id):
@@ -71,10 +118,12 @@ def update_class(request, class_id):
     serializer = ClassCreateSerializer(class_obj, data=request.data, partial=True)
     if serializer.is_valid():
         serializer.save()
+        notify_class_updated(class_obj)
         return Response(ClassSerializer(class_obj).data)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@query_budget(30)
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
 def delete_class(request, class_id):
@@ -90,6 +139,7 @@ def delete_class(request, class_id):
     return Response({'message': 'Class deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
 
 
+@query_budget(14)
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def enroll_students(request, class_id):
@@ -108,8 +158,10 @@ def enroll_students(request, class_id):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@query_budget(7)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional(teacher_classes_scopes, cache=True)
 def get_teacher_classes(request, teacher_id):
     if request.user.role != 'admin' and request.user.id != int(teacher_id):
         return Response({'error': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
@@ -119,13 +171,15 @@ def get_teacher_classes(request, teacher_id):
     except User.DoesNotExist:
         return Response({'error': 'Teacher not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    classes = Class.objects.filter(teacher=teacher)
+    classes = Class.objects.filter(teacher=teacher).with_details()
     serializer = ClassSerializer(classes, many=True)
     return Response(serializer.data)
 
 
+@query_budget(7)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional(student_classes_scopes, cache=True)
 def get_student_classes(request, student_id):
     if request.user.role != 'admin' and request.user.id != int(student_id):
         return Response({'error': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
@@ -135,6 +189,6 @@ def get_student_classes(request, student_id):
     except User.DoesNotExist:
         return Response({'error': 'Student not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    classes = student.enrolled_classes.all()
+    classes = student.enrolled_classes.with_details()
     serializer = ClassSerializer(classes, many=True)
     return Response(serializer.data)
\ No newline at end of file
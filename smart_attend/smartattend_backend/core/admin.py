@@ -1,28 +1,72 @@
 from django.contrib import admin
-from .models import LocationVerification, FacialRecognitionData, AttendanceAnalytics, Notification
+from .changelists import AutocompleteFilter, LargeTableAdmin
+from .models import LocationVerification, FacialRecognitionData, AttendanceAnalytics, Notification, Job
+from .notifications import set_read
+
+
+class ClassFilter(AutocompleteFilter):
+    title = 'class'
+    field_path = 'class_obj'
 
 
 @admin.register(LocationVerification)
-class LocationVerificationAdmin(admin.ModelAdmin):
+class LocationVerificationAdmin(LargeTableAdmin):
     list_display = ('user', 'class_obj', 'latitude', 'longitude', 'is_verified', 'verified_at')
-    list_filter = ('is_verified', 'verified_at', 'class_obj')
+    list_filter = ('is_verified', ClassFilter)
+    list_select_related = ('user', 'class_obj')
+    date_hierarchy = 'verified_at'
     search_fields = ('user__username', 'class_obj__course_name')
+    autocomplete_fields = ('user', 'class_obj')
+    actions = ['mark_verified', 'mark_unverified']
+
+    @admin.action(description='Mark selected verifications verified')
+    def mark_verified(self, request, queryset):
+        changed = queryset.exclude(is_verified=True).update(is_verified=True)
+        self.message_user(request, f"{changed} verifications marked verified.")
+
+    @admin.action(description='Mark selected verifications unverified')
+    def mark_unverified(self, request, queryset):
+        changed = queryset.exclude(is_verified=False).update(is_verified=False)
+        self.message_user(request, f"{changed} verifications marked unverified.")
 
 
 @admin.register(FacialRecognitionData)
 class FacialRecognitionDataAdmin(admin.ModelAdmin):
     list_display = ('user', 'created_at', 'updated_at')
+    list_select_related = ('user',)
     search_fields = ('user__username',)
 
 
 @admin.register(AttendanceAnalytics)
 class AttendanceAnalyticsAdmin(admin.ModelAdmin):
     list_display = ('class_obj', 'total_sessions', 'total_attendance', 'average_attendance', 'last_updated')
+    list_select_related = ('class_obj',)
     search_fields = ('class_obj__course_name',)
 
 
 @admin.register(Notification)
-class NotificationAdmin(admin.ModelAdmin):
+class NotificationAdmin(LargeTableAdmin):
     list_display = ('user', 'title', 'notification_type', 'is_read', 'created_at')
-    list_filter = ('notification_type', 'is_read', 'created_at')
-    search_fields = ('user__username', 'title')
\ No newline at end of file
+    list_filter = ('notification_type', 'is_read')
+    list_select_related = ('user',)
+    date_hierarchy = 'created_at'
+    search_fields = ('user__username', 'title')
+    autocomplete_fields = ('user',)
+    actions = ['mark_read', 'mark_unread']
+
+    @admin.action(description='Mark selected notifications read')
+    def mark_read(self, request, queryset):
+        changed = set_read(queryset, True)
+        self.message_user(request, f"{changed} notifications marked read.")
+
+    @admin.action(description='Mark selected notifications unread')
+    def mark_unread(self, request, queryset):
+        changed = set_read(queryset, False)
+        self.message_user(request, f"{changed} notifications marked unread.")
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'priority', 'attempts', 'run_at', 'created_at', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'dedupe_key')
@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.utils.module_loading import autodiscover_modules
+
+        from . import signals  # noqa: F401
+        from .metrics import install_query_tracking
+        from .profiling import install_query_log
+
+        connection_created.connect(install_query_tracking, dispatch_uid='core.metrics')
+        connection_created.connect(install_query_log, dispatch_uid='core.profiling')
+
+        # Register job handlers from every app's tasks module
+        autodiscover_modules('tasks')
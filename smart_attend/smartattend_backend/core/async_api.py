@@ -0,0 +1,47 @@
+"""
+Minimal async counterpart of DRF's ``@api_view`` for native async views.
+
+DRF views are synchronous, so async endpoints authenticate with the same
+token table themselves, go through the same throttles, and receive the
+parsed JSON body as ``request.data``.
+"""
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+
+from accounts.authentication import aget_user_from_token
+from .throttling import throttle_delay, throttled
+
+
+def async_api_view(methods):
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+
+            user = await aget_user_from_token(request)
+            if user is None:
+                return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+            request.user = user
+
+            delay = await sync_to_async(throttle_delay)(request)
+            if delay:
+                return throttled(delay)
+
+            request.data = {}
+            if request.body:
+                try:
+                    request.data = json.loads(request.body)
+                except ValueError:
+                    return JsonResponse({'detail': 'JSON parse error.'}, status=400)
+                if not isinstance(request.data, dict):
+                    return JsonResponse({'detail': 'Expected a JSON object.'}, status=400)
+
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
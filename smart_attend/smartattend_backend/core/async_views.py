@@ -0,0 +1,104 @@
+"""
+Async versions of the check-in verification endpoints in ``core.views``.
+"""
+import json
+
+from django.http import JsonResponse
+
+from classes.models import Class
+from .async_api import async_api_view
+from .budgets import query_budget
+from .throttling import low_priority, throttle_scope
+from .writer import awrite
+from .models import LocationVerification, FacialRecognitionData
+from .serializers import LocationVerificationSerializer
+from .views import calculate_distance, compare_facial_encodings
+
+
+async def get_enrolled_class(class_id, user):
+    """
+    Return ``(class_obj, error_response)`` for a class the user must be
+    enrolled in.
+    """
+    try:
+        class_obj = await Class.objects.aget(id=class_id)
+    except (Class.DoesNotExist, ValueError, TypeError):
+        return None, JsonResponse({'error': 'Class not found'}, status=404)
+
+    if not await class_obj.students.filter(id=user.id).aexists():
+        return None, JsonResponse({'error': 'You are not enrolled in this class'}, status=400)
+    return class_obj, None
+
+
+@query_budget(4)
+@low_priority
+@throttle_scope('verification')
+@async_api_view(['POST'])
+async def verify_location(request):
+    """
+    Verify student's location against class location
+    """
+    if request.user.role != 'student':
+        return JsonResponse({'error': 'Permission denied.'}, status=403)
+
+    latitude = request.data.get('latitude')
+    longitude = request.data.get('longitude')
+    altitude = request.data.get('altitude')
+
+    class_obj, error = await get_enrolled_class(request.data.get('class_id'), request.user)
+    if error:
+        return error
+
+    # Calculate distance between student and class location
+    distance = calculate_distance(
+        float(latitude), float(longitude),
+        float(class_obj.latitude), float(class_obj.longitude)
+    )
+
+    # Consider location verified if within 100 meters
+    verification = await awrite(
+        LocationVerification.objects.create,
+        user=request.user,
+        class_obj=class_obj,
+        latitude=latitude,
+        longitude=longitude,
+        altitude=altitude,
+        is_verified=distance <= 100
+    )
+
+    return JsonResponse(LocationVerificationSerializer(verification).data)
+
+
+@query_budget(4)
+@low_priority
+@throttle_scope('verification')
+@async_api_view(['POST'])
+async def verify_facial_data(request):
+    """
+    Verify facial data for attendance
+    """
+    if request.user.role != 'student':
+        return JsonResponse({'error': 'Permission denied.'}, status=403)
+
+    facial_encoding = request.data.get('facial_encoding')
+
+    if not facial_encoding:
+        return JsonResponse({'error': 'Facial encoding required'}, status=400)
+
+    class_obj, error = await get_enrolled_class(request.data.get('class_id'), request.user)
+    if error:
+        return error
+
+    # Get stored facial data
+    try:
+        stored_data = await FacialRecognitionData.objects.aget(user=request.user)
+    except FacialRecognitionData.DoesNotExist:
+        return JsonResponse({'error': 'No facial data found for user'}, status=404)
+
+    similarity = compare_facial_encodings(facial_encoding, json.loads(stored_data.facial_encoding))
+
+    # Consider verified if similarity is above threshold
+    return JsonResponse({
+        'verified': similarity > 0.6,
+        'similarity': similarity
+    })
@@ -0,0 +1,167 @@
+"""
+Helpers shared by the benchmark management commands.
+"""
+import contextlib
+import os
+import statistics
+import tempfile
+
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.utils import timezone
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+@contextlib.contextmanager
+def scratch_database():
+    """
+    Run the block against a freshly migrated, file-backed copy of the
+    default database that is thrown away afterwards, so benchmarks never
+    touch real data. A file (rather than SQLite's in-memory test database)
+    lets concurrent threads contend the way they would in production.
+    """
+    setup_test_environment()
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_test_name = test_settings.get('NAME')
+    scratch_dir = None
+    if connection.vendor == 'sqlite':
+        scratch_dir = tempfile.mkdtemp(prefix='smartattend-bench-')
+        test_settings['NAME'] = os.path.join(scratch_dir, 'bench.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        test_settings['NAME'] = old_test_name
+        teardown_test_environment()
+        if scratch_dir:
+            with contextlib.suppress(OSError):
+                os.rmdir(scratch_dir)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, elapsed, errors=0):
+    """
+    Summary statistics for a run. Latencies and elapsed are in seconds,
+    reported latencies in milliseconds.
+    """
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': errors,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(count / elapsed, 1) if elapsed else 0.0,
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def format_summary(name, summary):
+    return (
+        f"{name:<28} {summary['requests']:>6} req  {summary['errors']:>4} err  "
+        f"{summary['throughput_rps']:>8} req/s  p50 {summary['p50_ms']:>8} ms  "
+        f"p95 {summary['p95_ms']:>8} ms  p99 {summary['p99_ms']:>8} ms"
+    )
+
+
+# LoginSerializer passes email= to authenticate(), which the default
+# ModelBackend ignores, so login is measured on its rejection path
+EXPECTED_STATUS = {'login': 400}
+
+
+def endpoint_requests(data):
+    """
+    One representative request per URL name against an institution from
+    ``core.synthetic.generate_institution``: ``(method, user, url kwargs,
+    body)``. ``method`` is ``'stream'`` for the server-sent events endpoint.
+    """
+    location = {'class_id': data.class_obj.id, 'latitude': 12.971599, 'longitude': 77.594566}
+    facial = {'class_id': data.class_obj.id, 'facial_encoding': [0.1] * 128}
+    roster = [student.id for student in data.students[:50]]
+    return {
+        'register': ('post', None, {}, {
+            'username': 'newcomer', 'email': 'new@example.com', 'password': 'x', 'role': 'student'
+        }),
+        'login': ('post', None, {}, {'email': 'student@example.com', 'password': 'x'}),
+        'logout': ('post', data.student, {}, {}),
+        'user-profile': ('get', data.student, {}, None),
+        'update-profile': ('put', data.student, {}, {'first_name': 'Ada'}),
+        'get-students': ('get', data.admin, {}, None),
+        'get-teachers': ('get', data.admin, {}, None),
+        'get-classes': ('get', data.teacher, {}, None),
+        'create-class': ('post', data.admin, {}, {
+            'course_id': 'CS900', 'course_name': 'New', 'semester': '3rd', 'section': 'B',
+            'teacher': data.teacher.id, 'room_number': '9', 'latitude': 1, 'longitude': 1,
+            'start_time': '09:00', 'end_time': '10:00', 'students': roster,
+            'schedules': [{'weekday': 'monday', 'start_time': '09:00', 'end_time': '10:00'}] * 3
+        }),
+        'class-detail': ('get', data.student, {'class_id': data.class_obj.id}, None),
+        'update-class': ('put', data.admin, {'class_id': data.class_obj.id}, {'room_number': '42', 'students': roster}),
+        'delete-class': ('delete', data.admin, {'class_id': data.class_obj.id}, None),
+        'enroll-students': ('post', data.admin, {'class_id': data.class_obj.id}, {'students': roster}),
+        'teacher-classes': ('get', data.teacher, {'teacher_id': data.teacher.id}, None),
+        'student-classes': ('get', data.student, {'student_id': data.student.id}, None),
+        'get-sessions': ('get', data.teacher, {}, None),
+        'create-session': ('post', data.teacher, {}, {
+            'class_id': data.class_obj.id, 'session_date': '2030-01-07', 'start_time': '09:00', 'end_time': '10:00'
+        }),
+        'session-detail': ('get', data.teacher, {'session_id': data.session.id}, None),
+        'session-stream': ('stream', data.teacher, {'session_id': data.session.id}, None),
+        'mark-attendance': ('post', data.teacher, {'session_id': data.session.id}, {
+            'student_id': data.student.id, 'is_present': True
+        }),
+        'generate-qr': ('post', data.teacher, {'session_id': data.session.id}, {}),
+        'scan-qr': ('post', data.student, {}, {'code': data.qr_code.code}),
+        'offline-checkins': ('post', data.student, {}, {'checkins': [
+            {'key': f"offline-{n}", 'code': data.qr_code.code, 'scanned_at': timezone.now().isoformat(),
+             'latitude': 12.971599, 'longitude': 77.594566}
+            for n in range(20)
+        ]}),
+        'class-attendance-summary': ('get', data.teacher, {'class_id': data.class_obj.id}, None),
+        'student-attendance': ('get', data.teacher, {'student_id': data.student.id}, None),
+        'my-attendance': ('get', data.student, {}, None),
+        'attendance-trends': ('get', data.teacher, {}, None),
+        'verify-location': ('post', data.student, {}, location),
+        'save-facial-data': ('post', data.student, {}, {'facial_encoding': [0.2] * 128}),
+        'verify-facial-data': ('post', data.student, {}, facial),
+        'get-notifications': ('get', data.student, {}, None),
+        'unread-notification-count': ('get', data.student, {}, None),
+        'mark-notifications-read': ('post', data.student, {}, {'before': timezone.now().isoformat()}),
+        'mark-notification-read': ('post', data.student, {'notification_id': data.notification.id}, {}),
+        'get-analytics': ('get', data.teacher, {'class_id': data.class_obj.id}, None),
+        'update-analytics': ('post', data.teacher, {'class_id': data.class_obj.id}, {}),
+        'metrics': ('get', data.admin, {}, None),
+        'sync': ('get', data.student, {}, None),
+        'dashboard': ('get', data.student, {}, None),
+        'async-mark-attendance': ('post', data.student, {'session_id': data.session.id}, {'is_present': True}),
+        'async-scan-qr': ('post', data.student, {}, {'code': data.qr_code.code}),
+        'async-verify-location': ('post', data.student, {}, location),
+        'async-verify-facial-data': ('post', data.student, {}, facial),
+    }
+
+
+def send(client, async_client, method, user, url, body):
+    """
+    Make one request with ``user``'s token. Streams are read up to their
+    first event and then closed.
+    """
+    headers = {'Authorization': f"Token {user.auth_token.key}"} if user else {}
+    if method == 'stream':
+        async def first_event():
+            response = await async_client.get(url, headers=headers)
+            await anext(response.streaming_content)
+            await response.streaming_content.aclose()
+            return response
+        return async_to_sync(first_event)()
+    if body is None:
+        return getattr(client, method)(url, headers=headers)
+    return getattr(client, method)(url, body, content_type='application/json', headers=headers)
@@ -0,0 +1,20 @@
+"""
+Per-view query and latency budgets.
+
+``@query_budget`` goes on top of a view and declares how many database
+queries a single request may make and how many milliseconds it may take.
+The view itself is unchanged. ``QueryBudgetTests`` requests every URL
+against a seeded dataset and fails when a view goes over its budget.
+"""
+from collections import namedtuple
+
+Budget = namedtuple('Budget', 'queries ms')
+
+DEFAULT_MS = 250
+
+
+def query_budget(queries, ms=DEFAULT_MS):
+    def decorator(view):
+        view.query_budget = Budget(queries, ms)
+        return view
+    return decorator
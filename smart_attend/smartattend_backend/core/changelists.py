@@ -0,0 +1,128 @@
+"""
+Admin changelists for large tables.
+
+A stock changelist on a table with millions of rows COUNTs it twice per
+page, renders every related object's ``__str__`` with a query of its own
+and lists every class or user in its filter sidebar. ``LargeTableAdmin``
+avoids all three:
+
+* the unfiltered row count comes from the database's statistics once the
+  table has more than ``ADMIN_ESTIMATED_COUNT_THRESHOLD`` rows, and the
+  second, unfiltered COUNT shown next to filtered results is skipped;
+* ``list_select_related`` must name what the listed ``__str__`` methods
+  reach, which the admin test checks with a query count;
+* foreign-key filters are ``AutocompleteFilter`` subclasses, which search
+  the related admin's ``search_fields`` as you type instead of listing
+  every object, and facet counts, a COUNT per filter choice, are off.
+
+Admin actions on these tables change rows with bulk UPDATEs, and do the
+bookkeeping that ``post_save`` would have done themselves.
+"""
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.utils import get_fields_from_path
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+
+def estimated_count(model, using='default'):
+    """
+    The row count of ``model``'s table according to the database's
+    statistics, or ``None`` if it has none.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)', [table])
+        elif connection.vendor == 'sqlite':
+            # sqlite_stat1 only exists once ANALYZE (or PRAGMA optimize) has run
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    # Postgres reports -1 for a table that was never analyzed
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    A paginator that takes an unfiltered queryset's count from the
+    database's statistics once the table is big enough for an exact COUNT
+    to hurt.
+    """
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class AutocompleteFilter(admin.SimpleListFilter):
+    """
+    Filter on the foreign key at ``field_path`` with an autocomplete box.
+    The related model's admin needs ``search_fields``.
+    """
+    template = 'admin/autocomplete_filter.html'
+    field_path = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # The admin allows the lookup by the class attribute
+        cls.parameter_name = f"{cls.field_path}__id"
+
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        field = get_fields_from_path(model, self.field_path)[-1]
+        self.widget_id = f"filter_{self.parameter_name}"
+        form_field = field.formfield(required=False, widget=AutocompleteSelect(field, model_admin.admin_site))
+        self.rendered_widget = form_field.widget.render(self.parameter_name, self.value(), {'id': self.widget_id})
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.parameter_name: self.value()})
+        return queryset
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name, 'p']),
+            'display': _('All'),
+        }
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    A ``ModelAdmin`` for tables too big for the stock changelist; see the
+    module docstring.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+
+    @property
+    def media(self):
+        media = super().media
+        if any(isinstance(spec, type) and issubclass(spec, AutocompleteFilter) for spec in self.list_filter):
+            # select2 and the admin's autocomplete script, which only depend
+            # on the language
+            media += AutocompleteSelect(None, self.admin_site).media
+        return media
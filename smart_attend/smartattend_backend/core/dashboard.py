@@ -0,0 +1,125 @@
+"""
+Home-screen dashboards.
+
+``GET /api/dashboard/`` returns in one response what the app's home screen
+would otherwise fetch from the profile, class, session, notification and
+attendance endpoints, each paying for authentication again. Every role has
+its own set of sections, each a fixed number of queries however much data
+the user has:
+
+    profile        the user                                  (no query)
+    overview       admins: user, class and open session totals  (3)
+    classes        students and teachers: their classes      (3)
+    sessions       sessions of the last DASHBOARD_SESSION_DAYS  (1)
+    notifications  latest notifications and the unread count (2, or 5
+                   while the user has no unread counter yet)
+    attendance     students: present/total per class         (1)
+
+``?sections=`` picks some of them, comma separated.
+"""
+import datetime
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from accounts.models import User
+from accounts.serializers import UserProfileSerializer
+from attendance.models import AttendanceRecord, AttendanceSession
+from attendance.serializers import AttendanceSessionSerializer
+from classes.models import Class
+from classes.serializers import ClassSerializer
+from .models import Notification
+from .notifications import unread_count
+from .serializers import NotificationSerializer
+
+SECTIONS = {
+    'student': ('profile', 'classes', 'sessions', 'notifications', 'attendance'),
+    'teacher': ('profile', 'classes', 'sessions', 'notifications'),
+    'admin': ('profile', 'overview', 'sessions', 'notifications'),
+}
+
+
+class UnknownSection(Exception):
+    pass
+
+
+def dashboard(user, sections=None):
+    """
+    The response body for ``GET /api/dashboard/``: ``sections`` of
+    ``user``'s dashboard, or all of them.
+    """
+    available = SECTIONS.get(user.role, ())
+    if sections is None:
+        sections = available
+    for name in sections:
+        if name not in available:
+            raise UnknownSection(name)
+    return {name: BUILDERS[name](user) for name in sections}
+
+
+def profile(user):
+    return UserProfileSerializer(user).data
+
+
+def overview(user):
+    users = User.objects.aggregate(
+        students=Count('id', filter=Q(role='student', is_active=True)),
+        teachers=Count('id', filter=Q(role='teacher', is_active=True)),
+    )
+    return {
+        **users,
+        'classes': Class.objects.count(),
+        'open_sessions': AttendanceSession.objects.filter(is_active=True).count(),
+    }
+
+
+def classes(user):
+    return ClassSerializer(Class.objects.visible_to(user).with_details(), many=True).data
+
+
+def sessions(user):
+    start = timezone.localdate() - datetime.timedelta(days=settings.DASHBOARD_SESSION_DAYS)
+    recent = AttendanceSession.objects.filter(session_date__gte=start, session_date__lte=timezone.localdate())
+    if user.role != 'admin':
+        recent = recent.filter(class_obj__in=Class.objects.visible_to(user).values('id'))
+    recent = recent.with_counts().order_by('-session_date', '-start_time')[:settings.DASHBOARD_SESSION_LIMIT]
+    return AttendanceSessionSerializer(recent, many=True).data
+
+
+def notifications(user):
+    latest = Notification.objects.filter(user=user).select_related('user').order_by('-created_at')
+    return {
+        'unread_count': unread_count(user.id),
+        'latest': NotificationSerializer(latest[:settings.DASHBOARD_NOTIFICATION_LIMIT], many=True).data,
+    }
+
+
+def attendance(user):
+    rows = (
+        AttendanceRecord.objects.filter(student=user)
+        .values('session__class_obj_id', 'session__class_obj__course_name')
+        .annotate(total=Count('id'), present=Count('id', filter=Q(is_present=True)))
+        .order_by('session__class_obj__course_name')
+    )
+    return [
+        {
+            'class_id': row['session__class_obj_id'],
+            'class_name': row['session__class_obj__course_name'],
+            'total_classes': row['total'],
+            'present_classes': row['present'],
+            'absent_classes': row['total'] - row['present'],
+            'attendance_percentage': round(row['present'] / row['total'] * 100, 2),
+        }
+        for row in rows
+    ]
+
+
+BUILDERS = {
+    'profile': profile,
+    'overview': overview,
+    'classes': classes,
+    'sessions': sessions,
+    'notifications': notifications,
+    'attendance': attendance,
+}
@@ -0,0 +1,134 @@
+"""
+``Idempotency-Key`` support for write endpoints.
+
+Mobile clients retry writes whose response got lost. A request sent with
+an ``Idempotency-Key`` header has its response kept in the cache for
+``IDEMPOTENCY_KEY_TTL`` seconds, per user and view; a retry with the same
+key gets that response back, marked ``Idempotent-Replayed: true``, without
+running the view again. While the first request is still running, retries
+get a 409. Reusing a key for a different request body is a 422.
+
+Responses with a 5xx status aren't kept, so the retry runs the view again.
+Entries live in the default cache, which workers must share (see
+``CACHES``) for retries to be recognised across workers.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+from rest_framework.renderers import JSONRenderer
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def cache_key(user_id, view_name, key):
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f"idempotency:{view_name}:{user_id}:{digest}"
+
+
+def fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f"{request.get_full_path()}|{body}".encode()).hexdigest()
+
+
+def check_key(key):
+    if len(key) > MAX_KEY_LENGTH:
+        return JsonResponse({'error': f"{HEADER} is longer than {MAX_KEY_LENGTH} characters"}, status=400)
+    return None
+
+
+def replay(entry, request):
+    """
+    The stored response for ``entry``, or an error if ``request`` isn't
+    the request it was stored for.
+    """
+    if entry['fingerprint'] != fingerprint(request):
+        return JsonResponse({'error': f"{HEADER} was already used for a different request"}, status=422)
+    response = HttpResponse(entry['body'], status=entry['status'], content_type=entry['content_type'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def in_progress():
+    return JsonResponse({'error': f"A request with this {HEADER} is still in progress"}, status=409)
+
+
+def make_entry(request, response):
+    if response.status_code >= 500:
+        return None
+    if hasattr(response, 'data'):
+        # A DRF response that api_view hasn't rendered yet
+        body, content_type = JSONRenderer().render(response.data), 'application/json'
+    else:
+        body, content_type = response.content, response['Content-Type']
+    return {
+        'fingerprint': fingerprint(request),
+        'status': response.status_code,
+        'body': body,
+        'content_type': content_type,
+    }
+
+
+def idempotent(view):
+    """
+    Honour ``Idempotency-Key`` on ``view``. Place it below
+    ``@api_view``/``@permission_classes`` (or ``@async_api_view``) so the
+    user is authenticated.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return await view(request, *args, **kwargs)
+            error = check_key(key)
+            if error:
+                return error
+
+            entry_key = cache_key(request.user.pk, f"{view.__module__}.{view.__name__}", key)
+            entry = await cache.aget(entry_key)
+            if entry is not None:
+                return replay(entry, request)
+            lock_key = f"{entry_key}:lock"
+            if not await cache.aadd(lock_key, 1, timeout=settings.IDEMPOTENCY_LOCK_TIMEOUT):
+                return in_progress()
+            try:
+                response = await view(request, *args, **kwargs)
+                entry = make_entry(request, response)
+                if entry is not None:
+                    await cache.aset(entry_key, entry, timeout=settings.IDEMPOTENCY_KEY_TTL)
+                return response
+            finally:
+                await cache.adelete(lock_key)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(request, *args, **kwargs)
+        error = check_key(key)
+        if error:
+            return error
+
+        entry_key = cache_key(request.user.pk, f"{view.__module__}.{view.__name__}", key)
+        entry = cache.get(entry_key)
+        if entry is not None:
+            return replay(entry, request)
+        lock_key = f"{entry_key}:lock"
+        if not cache.add(lock_key, 1, timeout=settings.IDEMPOTENCY_LOCK_TIMEOUT):
+            return in_progress()
+        try:
+            response = view(request, *args, **kwargs)
+            entry = make_entry(request, response)
+            if entry is not None:
+                cache.set(entry_key, entry, timeout=settings.IDEMPOTENCY_KEY_TTL)
+            return response
+        finally:
+            cache.delete(lock_key)
+    return wrapper
@@ -0,0 +1,234 @@
+"""
+Database-backed background jobs.
+
+Handlers are plain functions registered with ``@job('name')`` in an app's
+``tasks`` module; they receive the job payload as keyword arguments.
+``enqueue`` inserts a row in the current transaction, so a job only becomes
+visible to workers once the work that scheduled it has committed.
+``python manage.py run_jobs`` claims and runs queued jobs on a thread or
+process pool. No broker is involved.
+
+Handlers registered with ``every=<seconds>`` are periodic: the worker keeps
+one pending run of each queued, ``every`` seconds after the last one.
+
+A running job's ``locked_at`` is refreshed every ``JOBS_HEARTBEAT_INTERVAL``
+seconds, so only jobs whose worker died go stale. A run that outlives its
+lock anyway doesn't record its outcome over a newer run's.
+"""
+import logging
+import random
+import threading
+import traceback
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+periodic = {}
+
+
+def job(name, every=None):
+    """
+    Register a function as the handler for jobs called ``name``, optionally
+    run by the worker every ``every`` seconds.
+    """
+    def decorator(func):
+        registry[name] = func
+        if every is not None:
+            periodic[name] = every
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, priority=0, dedupe_key='', run_at=None, max_attempts=None):
+    """
+    Queue a job and return it. If a job with the same ``dedupe_key`` is
+    already queued or running, that job is returned instead.
+
+    With ``settings.JOBS_ALWAYS_EAGER`` the handler runs immediately instead
+    (useful in tests and one-off scripts).
+    """
+    if name not in registry:
+        raise KeyError(f"No job handler registered for {name!r}")
+
+    job = Job(
+        name=name,
+        payload=payload or {},
+        priority=priority,
+        dedupe_key=dedupe_key,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS
+    )
+    if settings.JOBS_ALWAYS_EAGER:
+        registry[name](**job.payload)
+        return job
+
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        if not dedupe_key:
+            raise
+        return Job.objects.filter(dedupe_key=dedupe_key, status__in=['queued', 'running']).first()
+    return job
+
+
+def schedule_periodic():
+    """
+    Queue the next run of every periodic job that has none pending.
+    Returns the jobs queued.
+    """
+    if settings.JOBS_ALWAYS_EAGER or not periodic:
+        return []
+    pending = set(
+        Job.objects.filter(
+            dedupe_key__in=[f"periodic:{name}" for name in periodic], status__in=['queued', 'running']
+        ).values_list('dedupe_key', flat=True)
+    )
+    now = timezone.now()
+    return [
+        enqueue(name, dedupe_key=f"periodic:{name}", run_at=now + timedelta(seconds=every))
+        for name, every in periodic.items()
+        if f"periodic:{name}" not in pending
+    ]
+
+
+def claim(worker_id, limit):
+    """
+    Atomically take up to ``limit`` due jobs for ``worker_id``, highest
+    priority first. Safe to call from many workers at once: a job is only
+    claimed by the worker whose UPDATE flips it from ``queued``.
+    """
+    now = timezone.now()
+    candidates = list(
+        Job.objects.filter(status='queued', run_at__lte=now)
+        .order_by('-priority', 'run_at', 'id')
+        .values_list('id', flat=True)[:limit]
+    )
+    if not candidates:
+        return []
+
+    token = f"{worker_id}:{uuid.uuid4().hex[:8]}"
+    Job.objects.filter(id__in=candidates, status='queued').update(
+        status='running', locked_by=token, locked_at=now, attempts=F('attempts') + 1
+    )
+    return list(Job.objects.filter(locked_by=token, status='running').order_by('-priority', 'run_at', 'id'))
+
+
+def release_stale(timeout=None):
+    """
+    Requeue jobs whose worker died mid-run, or fail them if that run was
+    their last attempt: a job that kills its worker would otherwise be
+    picked up forever. Returns the number requeued.
+    """
+    timeout = timeout if timeout is not None else settings.JOBS_LOCK_TIMEOUT
+    now = timezone.now()
+    # claim() already counted the lost run as an attempt
+    stale = Job.objects.filter(status='running', locked_at__lt=now - timedelta(seconds=timeout))
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', finished_at=now, locked_by='', locked_at=None,
+        last_error='Worker stopped responding during the last attempt'
+    )
+    if failed:
+        logger.error('%s stale jobs failed permanently', failed)
+    return stale.update(status='queued', locked_by='', locked_at=None)
+
+
+def backoff(attempts):
+    """
+    Exponential backoff with jitter for the given attempt number.
+    """
+    delay = min(settings.JOBS_BACKOFF_BASE * 2 ** (attempts - 1), settings.JOBS_BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+@contextmanager
+def heartbeat(job_id, token, interval=None):
+    """
+    Refresh the ``locked_at`` of the job ``token`` holds every ``interval``
+    seconds, from a thread of its own, while the block runs.
+    """
+    interval = interval or settings.JOBS_HEARTBEAT_INTERVAL
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(interval):
+                try:
+                    Job.objects.filter(id=job_id, status='running', locked_by=token).update(locked_at=timezone.now())
+                except DatabaseError:
+                    logger.warning('Heartbeat of job %s failed', job_id, exc_info=True)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f"job-{job_id}-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def execute(job_id):
+    """
+    Run a claimed job and record the outcome. Returns the final status, or
+    ``None`` if the job was released and claimed again while it ran.
+    """
+    try:
+        job = Job.objects.get(id=job_id)
+        token = job.locked_by
+        handler = registry.get(job.name)
+        try:
+            if handler is None:
+                raise KeyError(f"No job handler registered for {job.name!r}")
+            with heartbeat(job.id, token):
+                handler(**job.payload)
+        except Exception:
+            job.last_error = traceback.format_exc()
+            if job.attempts >= job.max_attempts:
+                job.status = 'failed'
+                job.finished_at = timezone.now()
+                logger.error('Job %s (%s) failed permanently', job.id, job.name)
+            else:
+                job.status = 'queued'
+                job.run_at = timezone.now() + backoff(job.attempts)
+                logger.warning('Job %s (%s) failed, retrying at %s', job.id, job.name, job.run_at)
+        else:
+            job.status = 'done'
+            job.finished_at = timezone.now()
+        # Only while this run still holds the job
+        owned = Job.objects.filter(id=job.id, status='running', locked_by=token).update(
+            status=job.status, run_at=job.run_at, last_error=job.last_error, finished_at=job.finished_at,
+            locked_by='', locked_at=None
+        )
+        if not owned:
+            logger.warning('Job %s (%s) was taken over while it ran, dropping its outcome', job.id, job.name)
+            return None
+        return job.status
+    finally:
+        close_old_connections()
+
+
+def run_pending(worker_id='inline', limit=100):
+    """
+    Claim and run due jobs in the calling thread until none are left.
+    Returns the number of jobs run.
+    """
+    count = 0
+    while True:
+        jobs = claim(worker_id, limit)
+        if not jobs:
+            return count
+        for claimed in jobs:
+            execute(claimed.id)
+            count += 1
@@ -0,0 +1,77 @@
+"""
+HTTP load generation against a running server.
+
+Only the standard library is used here so ``fire`` can run in freshly
+spawned worker processes without setting Django up.
+"""
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Substrings of error responses, as rendered by SQLite, PostgreSQL and the
+# Django debug page, used to tell what went wrong on the server
+LOCK_ERRORS = ('database is locked', 'deadlock detected', 'lock timeout', 'could not obtain lock')
+INTEGRITY_ERRORS = ('UNIQUE constraint failed', 'duplicate key value', 'IntegrityError')
+
+
+def classify(status, body):
+    """
+    Sort a response into ``ok``, ``client_error``, ``lock``, ``integrity``,
+    ``server_error`` or ``connection``.
+    """
+    if status is None:
+        return 'connection'
+    if status < 400:
+        return 'ok'
+    if any(text in body for text in LOCK_ERRORS):
+        return 'lock'
+    if any(text in body for text in INTEGRITY_ERRORS):
+        return 'integrity'
+    return 'client_error' if status < 500 else 'server_error'
+
+
+def send(base_url, request, timeout):
+    offset, name, path, token, body = request
+    data = json.dumps(body).encode()
+    http_request = urllib.request.Request(
+        base_url + path, data=data, method='POST',
+        headers={'Authorization': f"Token {token}", 'Content-Type': 'application/json'}
+    )
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(http_request, timeout=timeout) as response:
+            response.read()
+            status, text = response.status, ''
+    except urllib.error.HTTPError as e:
+        status, text = e.code, e.read().decode(errors='replace')
+    except (urllib.error.URLError, OSError):
+        status, text = None, ''
+    return {
+        'name': name,
+        'offset': offset,
+        'latency': time.perf_counter() - started,
+        'status': status,
+        'outcome': classify(status, text),
+        'token': token,
+        'finished_at': time.time(),
+    }
+
+
+def fire(base_url, requests, threads, start_at, timeout=30):
+    """
+    Send ``requests`` (``(offset, name, path, token, body)`` tuples) from
+    ``threads`` threads, each no earlier than ``start_at + offset`` on the
+    wall clock, and return one result dict per request.
+    """
+    base_url = base_url.rstrip('/')
+
+    def scheduled(request):
+        delay = start_at + request[0] - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        return send(base_url, request, timeout)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(scheduled, sorted(requests)))
@@ -0,0 +1,136 @@
+import json
+import logging
+import time
+import urllib.error
+import urllib.request
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.benchmarking import (
+    EXPECTED_STATUS, endpoint_requests, format_summary, scratch_database, send, summarize
+)
+from core.synthetic import generate_institution, load_institution
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every API endpoint and report latency percentiles, "
+        "throughput and query counts, optionally against a saved baseline. "
+        "By default requests go through the test client against a generated "
+        "institution on a scratch database; writes are rolled back after "
+        "each request. With --url, read endpoints are requested from a "
+        "running server whose database was filled by seed_institution."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help='Requests per endpoint.')
+        parser.add_argument('--endpoint', action='append', dest='endpoints', help='Only these URL names (repeatable).')
+        parser.add_argument('--url', help='Base URL of a running server, e.g. http://localhost:8000')
+        parser.add_argument('--teachers', type=int, default=5)
+        parser.add_argument('--students', type=int, default=500)
+        parser.add_argument('--classes', type=int, default=30)
+        parser.add_argument('--roster-size', type=int, default=60)
+        parser.add_argument('--days', type=int, default=120)
+        parser.add_argument('--baseline', help='Compare against this baseline JSON file.')
+        parser.add_argument('--save-baseline', help='Write the results to this JSON file.')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed p95 slowdown against the baseline, as a fraction.')
+
+    def handle(self, *args, **options):
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+
+        if options['url']:
+            results = self.run_server(options)
+        else:
+            with scratch_database():
+                data = generate_institution(
+                    teachers=options['teachers'], students=options['students'], classes=options['classes'],
+                    roster_size=options['roster_size'], days=options['days']
+                )
+                results = self.run_in_process(data, options)
+
+        for name, result in results.items():
+            self.stdout.write(f"{format_summary(name, result)}  {result['queries']:>4} queries")
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Baseline written to {options['save_baseline']}")
+        if options['baseline']:
+            self.compare(results, options['baseline'], options['tolerance'])
+
+    def selected(self, requests, options):
+        names = options['endpoints'] or list(requests)
+        unknown = set(names) - set(requests)
+        if unknown:
+            raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+        return {name: requests[name] for name in names}
+
+    def run_in_process(self, data, options):
+        client, async_client = Client(raise_request_exception=False), AsyncClient(raise_request_exception=False)
+        results = {}
+        for name, (method, user, kwargs, body) in self.selected(endpoint_requests(data), options).items():
+            url = reverse(name, kwargs=kwargs)
+            latencies, errors, queries = [], 0, 0
+            # The first request warms up imports and caches and isn't counted
+            for iteration in range(options['iterations'] + 1):
+                cache.clear()
+                with transaction.atomic(), CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = send(client, async_client, method, user, url, body)
+                    elapsed = time.perf_counter() - started
+                    transaction.set_rollback(True)
+                if not iteration:
+                    continue
+                latencies.append(elapsed)
+                expected = EXPECTED_STATUS.get(name)
+                errors += response.status_code != expected if expected else response.status_code >= 400
+                queries = max(queries, sum('SAVEPOINT' not in q['sql'] for q in captured))
+            results[name] = {**summarize(latencies, sum(latencies), errors), 'queries': queries}
+        return results
+
+    def run_server(self, options):
+        data = load_institution()
+        requests = {
+            name: spec for name, spec in endpoint_requests(data).items() if spec[0] == 'get'
+        }
+        results = {}
+        for name, (method, user, kwargs, body) in self.selected(requests, options).items():
+            url = options['url'].rstrip('/') + reverse(name, kwargs=kwargs)
+            request = urllib.request.Request(url, headers={'Authorization': f"Token {user.auth_token.key}"})
+            latencies, errors = [], 0
+            for iteration in range(options['iterations'] + 1):
+                started = time.perf_counter()
+                try:
+                    with urllib.request.urlopen(request) as response:
+                        response.read()
+                except urllib.error.HTTPError:
+                    errors += bool(iteration)
+                if iteration:
+                    latencies.append(time.perf_counter() - started)
+            # Query counts aren't visible from outside the server
+            results[name] = {**summarize(latencies, sum(latencies), errors), 'queries': 0}
+        return results
+
+    def compare(self, results, path, tolerance):
+        with open(path) as f:
+            baseline = json.load(f)
+
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            if result['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+                regressions.append(f"{name}: p95 {before['p95_ms']} -> {result['p95_ms']} ms")
+            if result['queries'] > before['queries']:
+                regressions.append(f"{name}: {before['queries']} -> {result['queries']} queries")
+
+        if regressions:
+            raise CommandError('Regressions against baseline:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(f"No regressions against {path}")
@@ -0,0 +1,66 @@
+import os
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from multiprocessing import get_context
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+
+# Process-pool workers are spawned fresh, so this module must stay importable
+# before Django is set up: core.jobs is only imported once the app registry
+# is ready.
+def _setup_process():
+    import django
+    django.setup()
+
+
+def _execute(job_id):
+    from core import jobs
+    return jobs.execute(job_id)
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs on a thread or process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Jobs run concurrently.')
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when idle.')
+        parser.add_argument('--once', action='store_true', help='Exit once no due jobs are left.')
+
+    def handle(self, *args, **options):
+        from core import jobs
+
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        workers = options['workers']
+        if options['pool'] == 'process':
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'), initializer=_setup_process)
+        else:
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+
+        self.stdout.write(f"Worker {worker_id} running up to {workers} jobs on a {options['pool']} pool")
+        in_flight = set()
+        try:
+            while True:
+                jobs.release_stale()
+                jobs.schedule_periodic()
+                claimed = jobs.claim(worker_id, workers - len(in_flight)) if len(in_flight) < workers else []
+                for job in claimed:
+                    in_flight.add(pool.submit(_execute, job.id))
+                close_old_connections()
+
+                if in_flight:
+                    done, in_flight = wait(in_flight, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future.exception() is not None:
+                            self.stderr.write(f"Job runner error: {future.exception()!r}")
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping, waiting for running jobs to finish')
+        finally:
+            pool.shutdown(wait=True)
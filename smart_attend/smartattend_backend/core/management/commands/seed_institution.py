@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from core.synthetic import generate_institution
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with a synthetic institution: teachers, students, "
+        "classes with schedules and rosters, and days of attendance history."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teachers', type=int, default=20)
+        parser.add_argument('--students', type=int, default=2000)
+        parser.add_argument('--classes', type=int, default=100)
+        parser.add_argument('--roster-size', type=int, default=60)
+        parser.add_argument('--days', type=int, default=365, help='Days of attendance history.')
+        parser.add_argument('--meetings-per-week', type=int, default=3, choices=range(1, 6))
+        parser.add_argument('--attendance-rate', type=float, default=0.8)
+        parser.add_argument('--password', default='password', help='Password for the admin, teacher and student users.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__in=['admin', 'teacher', 'student']).exists():
+            raise CommandError('The database already has generated users; seed an empty database.')
+
+        data = generate_institution(
+            teachers=options['teachers'],
+            students=options['students'],
+            classes=options['classes'],
+            roster_size=options['roster_size'],
+            days=options['days'],
+            meetings_per_week=options['meetings_per_week'],
+            attendance_rate=options['attendance_rate'],
+            password=options['password'],
+            seed=options['seed']
+        )
+        self.stdout.write(
+            f"Created {len(data.classes)} classes for {len(data.students) + 1} students. "
+            f"Users admin, teacher and student have password {options['password']!r} and an API token."
+        )
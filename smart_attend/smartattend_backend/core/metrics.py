@@ -0,0 +1,207 @@
+"""
+Request metrics in Prometheus text format.
+
+``MetricsMiddleware`` records, per route and method, request counts by
+status, latency, query count, time spent in the database and response size.
+Each worker process keeps its own samples in memory and writes them to its
+own file in ``METRICS_DIR`` at most every ``METRICS_FLUSH_INTERVAL``
+seconds; ``render`` adds up the files of every worker, so any worker can
+answer a scrape for all of them. Clear ``METRICS_DIR`` when the server is
+restarted, as Prometheus would a process's own counters.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+# name: (type, help, buckets)
+METRICS = {
+    'smartattend_http_requests_total': ('counter', 'Requests by route, method and status.', None),
+    'smartattend_http_request_duration_seconds': ('histogram', 'Time to produce a response.', LATENCY_BUCKETS),
+    'smartattend_http_request_queries': ('histogram', 'Database queries per request.', QUERY_BUCKETS),
+    'smartattend_http_request_db_seconds': ('histogram', 'Time spent in the database per request.', LATENCY_BUCKETS),
+    'smartattend_http_response_size_bytes': ('histogram', 'Size of non-streaming response bodies.', SIZE_BUCKETS),
+}
+
+# [queries, seconds] of the request being handled in this context
+_db_usage = contextvars.ContextVar('db_usage', default=None)
+
+
+def track_queries(execute, sql, params, many, context):
+    """
+    Database execute wrapper, installed on every connection, that adds each
+    query to the usage of the request it runs for, if any.
+    """
+    usage = _db_usage.get()
+    if usage is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        usage[0] += 1
+        usage[1] += time.perf_counter() - started
+
+
+def install_query_tracking(sender, connection, **kwargs):
+    """
+    ``connection_created`` receiver.
+    """
+    if track_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(track_queries)
+
+
+class Registry:
+    """
+    Samples of this process, keyed by ``(name, labels)``.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.samples = defaultdict(float)
+        self.flushed_at = time.monotonic()
+
+    def inc(self, name, labels, value=1):
+        with self.lock:
+            self.samples[name, labels] += value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        with self.lock:
+            for bound in buckets:
+                if value <= bound:
+                    self.samples[f"{name}_bucket", labels + (('le', str(bound)),)] += 1
+            self.samples[f"{name}_bucket", labels + (('le', '+Inf'),)] += 1
+            self.samples[f"{name}_sum", labels] += value
+            self.samples[f"{name}_count", labels] += 1
+
+    def path(self):
+        return os.path.join(settings.METRICS_DIR, f"{os.getpid()}.json")
+
+    def flush(self, force=False):
+        """
+        Write this process's samples to its file if the flush interval has
+        passed (or ``force``).
+        """
+        if not force and time.monotonic() - self.flushed_at < settings.METRICS_FLUSH_INTERVAL:
+            return
+        with self.lock:
+            rows = [[name, list(labels), value] for (name, labels), value in self.samples.items()]
+            self.flushed_at = time.monotonic()
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        path = self.path()
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(rows, f)
+        os.replace(f"{path}.tmp", path)
+
+
+registry = Registry()
+# Children forked from a preloaded server start counting from zero
+os.register_at_fork(after_in_child=registry.clear)
+
+
+def collect():
+    """
+    Samples summed over every worker's file.
+    """
+    registry.flush(force=True)
+    totals = defaultdict(float)
+    for filename in os.listdir(settings.METRICS_DIR):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(settings.METRICS_DIR, filename)) as f:
+                rows = json.load(f)
+        except (OSError, ValueError):
+            continue  # The worker's file was replaced while we listed the directory
+        for name, labels, value in rows:
+            totals[name, tuple(tuple(label) for label in labels)] += value
+    return totals
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for key, value in labels
+    )
+    return f"{{{pairs}}}"
+
+
+def render():
+    """
+    Every worker's metrics in the Prometheus text exposition format.
+    """
+    samples = collect()
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        names = (f"{name}_bucket", f"{name}_sum", f"{name}_count") if buckets else (name,)
+        for (sample, labels), value in sorted(samples.items()):
+            if sample in names:
+                lines.append(f"{sample}{format_labels(labels)} {value:g}")
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """
+    Record every request in ``registry``. Place it first so the time spent
+    in other middleware counts too.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        usage = [0, 0.0]
+        token = _db_usage.set(usage)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _db_usage.reset(token)
+        self.record(request, response, time.perf_counter() - started, usage)
+        return response
+
+    async def __acall__(self, request):
+        usage = [0, 0.0]
+        token = _db_usage.set(usage)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _db_usage.reset(token)
+        self.record(request, response, time.perf_counter() - started, usage)
+        return response
+
+    def record(self, request, response, elapsed, usage):
+        match = request.resolver_match
+        labels = (('route', match.view_name if match else 'unmatched'), ('method', request.method))
+        registry.inc('smartattend_http_requests_total', labels + (('status', str(response.status_code)),))
+        registry.observe('smartattend_http_request_duration_seconds', labels, elapsed)
+        registry.observe('smartattend_http_request_queries', labels, usage[0])
+        registry.observe('smartattend_http_request_db_seconds', labels, usage[1])
+        if not response.streaming:
+            registry.observe('smartattend_http_response_size_bytes', labels, len(response.content))
+        registry.flush()
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-19 18:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_notification_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntityVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=100, unique=True)),
+                ('version', models.BigIntegerField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-19 19:29
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_notification_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('class', 'Class'), ('enrollment', 'Enrollment'), ('session', 'Attendance session'), ('record', 'Attendance record'), ('notification', 'Notification')], max_length=20)),
+                ('action', models.CharField(choices=[('upsert', 'Created or updated'), ('delete', 'Deleted')], default='upsert', max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('class_id', models.BigIntegerField(blank=True, null=True)),
+                ('user_id', models.BigIntegerField(blank=True, null=True)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['class_id', 'id'], name='changelog_class_idx'), models.Index(fields=['user_id', 'id'], name='changelog_user_idx'), models.Index(fields=['changed_at'], name='changelog_changed_at_idx')],
+            },
+        ),
+    ]
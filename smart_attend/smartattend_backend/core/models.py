@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
 from accounts.models import User
 from classes.models import Class
 
@@ -12,6 +14,11 @@ class LocationVerification(models.Model):
     verified_at = models.DateTimeField(auto_now_add=True)
     is_verified = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['verified_at'], name='location_verified_at_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.class_obj.course_name} - Verified: {self.is_verified}"
 
@@ -50,6 +57,114 @@ class Notification(models.Model):
     notification_type = models.CharField(max_length=20, choices=NOTIFICATION_TYPES)
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    dedupe_key = models.CharField(max_length=100, blank=True, default='', db_index=True)
+    digest_count = models.PositiveIntegerField(default=1)  # Notifications coalesced into this row
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'is_read', 'created_at'], name='notification_user_unread_idx'),
+            models.Index(fields=['user', 'created_at'], name='notification_user_created_idx'),
+            models.Index(fields=['created_at'], name='notification_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} - {self.user.username}"
+
+
+class NotificationCounter(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='notification_counter')
+    unread_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.unread_count} unread"
+
+
+class EntityVersion(models.Model):
+    """
+    Version stamp for a cache scope such as ``class:3``. Bumped whenever
+    something in the scope is written, so readers can tell whether a
+    response is still fresh without rebuilding it.
+    """
+    scope = models.CharField(max_length=100, unique=True)
+    version = models.BigIntegerField()
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.scope} @ {self.version}"
+
+
+class Job(models.Model):
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    priority = models.SmallIntegerField(default=0)  # Higher runs first
+    dedupe_key = models.CharField(max_length=150, blank=True, default='')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'priority', 'run_at'], name='job_queue_idx'),
+        ]
+        constraints = [
+            # At most one pending job per dedupe key
+            models.UniqueConstraint(
+                fields=['dedupe_key'],
+                condition=Q(status__in=['queued', 'running']) & ~Q(dedupe_key=''),
+                name='job_unique_pending_dedupe_key'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+
+class ChangeLog(models.Model):
+    """
+    One row per change to an object the mobile client syncs, read in id
+    order by the delta sync endpoint (see ``core.sync``). ``class_id`` and
+    ``user_id`` say who may see the change; they are plain integers rather
+    than foreign keys so tombstones outlive the rows they describe.
+    """
+    KIND_CHOICES = (
+        ('class', 'Class'),
+        ('enrollment', 'Enrollment'),
+        ('session', 'Attendance session'),
+        ('record', 'Attendance record'),
+        ('notification', 'Notification'),
+    )
+    ACTION_CHOICES = (
+        ('upsert', 'Created or updated'),
+        ('delete', 'Deleted'),
+    )
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES, default='upsert')
+    object_id = models.BigIntegerField()
+    class_id = models.BigIntegerField(null=True, blank=True)
+    user_id = models.BigIntegerField(null=True, blank=True)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['class_id', 'id'], name='changelog_class_idx'),
+            models.Index(fields=['user_id', 'id'], name='changelog_user_idx'),
+            models.Index(fields=['changed_at'], name='changelog_changed_at_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.title} - {self.user.username}"
\ No newline at end of file
+        return f"{self.action} {self.kind} {self.object_id}"
@@ -0,0 +1,265 @@
+"""
+Notification fan-out.
+
+Notifications are addressed to a target (a class roster, a role, a user
+filter or an explicit list of user ids) and written with chunked bulk
+inserts. A ``dedupe_key`` lets repeated broadcasts inside a time window be
+skipped or coalesced into a single digest row per user.
+
+Each user's unread total is kept in ``NotificationCounter`` so the app
+badge never has to COUNT the notification table.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from accounts.models import User
+from .jobs import enqueue
+from .models import Notification, NotificationCounter
+from .sync import log_changes
+
+
+def resolve_recipients(target):
+    """
+    Turn a target description into a queryset of user ids.
+
+    Supported targets (combinable, all conditions must match):
+        {'class_id': 3}                  students enrolled in the class
+        {'role': 'student'}              active users with the role
+        {'filters': {'semester': '3rd'}} arbitrary User field lookups
+        {'user_ids': [1, 2, 3]}          explicit recipients
+    """
+    users = User.objects.filter(is_active=True)
+    if 'class_id' in target:
+        users = users.filter(enrolled_classes__id=target['class_id'])
+    if 'role' in target:
+        users = users.filter(role=target['role'])
+    if 'filters' in target:
+        users = users.filter(**target['filters'])
+    if 'user_ids' in target:
+        users = users.filter(id__in=target['user_ids'])
+    return users.order_by('id').values_list('id', flat=True)
+
+
+def notify(target, title, message, notification_type, dedupe_key='', window=None,
+           coalesce=False, chunk_size=None):
+    """
+    Create a notification for every recipient of ``target``.
+
+    When ``dedupe_key`` is set, recipients that already got a notification
+    with the same key inside ``window`` are skipped, or, with ``coalesce``,
+    have their unread notification folded into a digest instead.
+
+    Returns the number of rows created.
+    """
+    chunk_size = chunk_size or settings.NOTIFICATION_FANOUT_CHUNK_SIZE
+    if window is None:
+        window = datetime.timedelta(seconds=settings.NOTIFICATION_DEDUPE_WINDOW)
+
+    created = 0
+    chunk = []
+    for user_id in resolve_recipients(target).iterator(chunk_size=chunk_size):
+        chunk.append(user_id)
+        if len(chunk) >= chunk_size:
+            created += _notify_chunk(chunk, title, message, notification_type, dedupe_key, window, coalesce)
+            chunk = []
+    if chunk:
+        created += _notify_chunk(chunk, title, message, notification_type, dedupe_key, window, coalesce)
+    return created
+
+
+def _notify_chunk(user_ids, title, message, notification_type, dedupe_key, window, coalesce):
+    with transaction.atomic():
+        if dedupe_key:
+            recent = Notification.objects.filter(
+                user_id__in=user_ids,
+                dedupe_key=dedupe_key,
+                created_at__gte=timezone.now() - window
+            )
+            if coalesce:
+                # Fold the new notification into the pending digest, one UPDATE per chunk
+                digests = dict(recent.filter(is_read=False).values_list('id', 'user_id'))
+                covered = set(digests.values())
+                Notification.objects.filter(id__in=digests).update(
+                    title=title,
+                    message=message,
+                    digest_count=F('digest_count') + 1,
+                    created_at=timezone.now()  # Resurface the digest for incremental fetches
+                )
+                log_changes('notification', [(pk, None, user_id) for pk, user_id in digests.items()])
+            else:
+                covered = set(recent.values_list('user_id', flat=True))
+            user_ids = [user_id for user_id in user_ids if user_id not in covered]
+
+        notifications = Notification.objects.bulk_create([
+            Notification(
+                user_id=user_id,
+                title=title,
+                message=message,
+                notification_type=notification_type,
+                dedupe_key=dedupe_key
+            )
+            for user_id in user_ids
+        ], batch_size=len(user_ids) or None)
+        log_changes('notification', [(n.pk, None, n.user_id) for n in notifications])
+        increment_unread(user_ids)
+    return len(user_ids)
+
+
+def unread_count(user_id):
+    """
+    Return the user's unread notification count from the maintained counter.
+    """
+    try:
+        return NotificationCounter.objects.values_list('unread_count', flat=True).get(user_id=user_id)
+    except NotificationCounter.DoesNotExist:
+        return recount_unread(user_id)
+
+
+def recount_unread(user_id):
+    """
+    Rebuild the counter from the notification table.
+    """
+    count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+    NotificationCounter.objects.update_or_create(user_id=user_id, defaults={'unread_count': count})
+    return count
+
+
+def increment_unread(user_ids):
+    if not user_ids:
+        return
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id) for user_id in user_ids],
+        ignore_conflicts=True
+    )
+    NotificationCounter.objects.filter(user_id__in=user_ids).update(unread_count=F('unread_count') + 1)
+
+
+def decrement_unread(user_id, amount=1):
+    if amount:
+        NotificationCounter.objects.filter(user_id=user_id).update(
+            unread_count=Greatest(F('unread_count') - amount, 0)
+        )
+
+
+def mark_read(user_id, ids=None, before=None, chunk_size=None):
+    """
+    Mark the user's unread notifications as read, optionally limited to
+    ``ids`` and/or to those created at or before ``before``. Each chunk of
+    ``chunk_size`` takes a SELECT of ids, an UPDATE by id and a change log
+    INSERT, so the parameter lists stay bounded however many are unread.
+    Returns the number of notifications changed.
+    """
+    chunk_size = chunk_size or settings.NOTIFICATION_MARK_READ_CHUNK_SIZE
+    unread = Notification.objects.filter(user_id=user_id, is_read=False)
+    if ids is not None:
+        unread = unread.filter(id__in=ids)
+    if before is not None:
+        unread = unread.filter(created_at__lte=before)
+
+    updated = 0
+    with transaction.atomic():
+        while True:
+            chunk = list(unread.order_by('id').values_list('id', flat=True)[:chunk_size])
+            if chunk:
+                updated += Notification.objects.filter(id__in=chunk, is_read=False).update(is_read=True)
+                log_changes('notification', [(pk, None, user_id) for pk in chunk])
+            if len(chunk) < chunk_size:
+                break
+        decrement_unread(user_id, updated)
+    return updated
+
+
+def set_read(notifications, is_read, chunk_size=None):
+    """
+    Mark the ``notifications`` queryset, of any users, read or unread with
+    an UPDATE per ``chunk_size`` rows, then recount the unread counters of
+    the users affected in one UPDATE. Returns the number changed.
+    """
+    chunk_size = chunk_size or settings.ADMIN_ACTION_CHUNK_SIZE
+    with transaction.atomic():
+        rows = list(notifications.exclude(is_read=is_read).order_by('id').values_list('id', 'user_id'))
+        changed = 0
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            changed += Notification.objects.filter(id__in=[pk for pk, _ in chunk]).update(is_read=is_read)
+            log_changes('notification', [(pk, None, user_id) for pk, user_id in chunk])
+        unread = (
+            Notification.objects.filter(user_id=OuterRef('user_id'), is_read=False)
+            .order_by().values('user_id').annotate(count=Count('id')).values('count')
+        )
+        NotificationCounter.objects.filter(user_id__in={user_id for _, user_id in rows}).update(
+            unread_count=Coalesce(Subquery(unread, output_field=IntegerField()), Value(0))
+        )
+    return changed
+
+
+def notify_later(target, title, message, notification_type, dedupe_key='', window=None, coalesce=False):
+    """
+    Queue the fan-out as a background job. It becomes visible to workers
+    when the current transaction commits.
+    """
+    enqueue('notifications.fan_out', {
+        'target': target,
+        'title': title,
+        'message': message,
+        'notification_type': notification_type,
+        'dedupe_key': dedupe_key,
+        'window': window.total_seconds() if window is not None else None,
+        'coalesce': coalesce,
+    }, priority=settings.NOTIFICATION_FANOUT_PRIORITY)
+
+
+def notify_session_started(session):
+    notify_later(
+        {'class_id': session.class_obj_id},
+        'Attendance session started',
+        f"Attendance for {session.class_obj.course_name} is open for {session.session_date}.",
+        'attendance',
+        dedupe_key=f"session-started:{session.id}"
+    )
+
+
+def notify_class_updated(class_obj):
+    notify_later(
+        {'class_id': class_obj.id},
+        'Class updated',
+        f"Details for {class_obj.course_name} have changed.",
+        'class',
+        dedupe_key=f"class-updated:{class_obj.id}",
+        coalesce=True
+    )
+
+
+def notify_low_attendance(class_obj, threshold=None):
+    """
+    Warn every student of the class whose attendance is below ``threshold``
+    percent. Repeated warnings are suppressed for a day.
+    """
+    if threshold is None:
+        threshold = settings.LOW_ATTENDANCE_THRESHOLD
+
+    stats = class_obj.students.annotate(
+        total=Count('attendance_records', filter=Q(attendance_records__session__class_obj=class_obj)),
+        present=Count('attendance_records', filter=Q(
+            attendance_records__session__class_obj=class_obj,
+            attendance_records__is_present=True
+        ))
+    ).filter(total__gt=0).values_list('id', 'total', 'present')
+
+    user_ids = [user_id for user_id, total, present in stats if present * 100 < threshold * total]
+    if not user_ids:
+        return
+
+    notify_later(
+        {'user_ids': user_ids},
+        'Low attendance',
+        f"Your attendance in {class_obj.course_name} is below {threshold}%.",
+        'attendance',
+        dedupe_key=f"low-attendance:{class_obj.id}",
+        window=datetime.timedelta(days=1)
+    )
@@ -0,0 +1,271 @@
+"""
+On-demand request profiling and slow query logging.
+
+``ProfilingMiddleware`` profiles a request when an admin sends an
+``X-Profile`` header (``trace`` for a deterministic profile of every call,
+anything else for a statistical one) or, at random, a
+``PROFILING_SAMPLE_RATE`` fraction of all requests. Each profile is written
+to ``PROFILING_DIR`` as two files named after the ``X-Profile-Id`` response
+header: ``<id>.folded``, the call stacks in the collapsed format read by
+flamegraph.pl and speedscope, and ``<id>.json``, every SQL statement run with
+its time and the code that ran it. Requests that aren't profiled pay for a
+header lookup.
+
+Under ASGI, the profile of an async view also holds whatever else the
+worker's event loop ran in the meantime.
+
+Independently of profiling, every statement slower than ``SLOW_QUERY_MS``
+is logged to the ``core.slow_queries`` logger.
+"""
+import contextvars
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+slow_query_logger = logging.getLogger('core.slow_queries')
+
+# Frames of these files are bookkeeping, not the origin of a query
+IGNORED_FILES = (__file__, os.path.join(os.path.dirname(__file__), 'metrics.py'))
+ORM_DIR = os.path.join('django', 'db', '')
+
+# Statements of the request being profiled in this context
+_query_log = contextvars.ContextVar('query_log', default=None)
+
+
+def short_path(filename):
+    """
+    ``filename`` relative to the project or to the installed package.
+    """
+    base_dir = str(settings.BASE_DIR)
+    if filename.startswith(base_dir):
+        return os.path.relpath(filename, base_dir)
+    head, sep, tail = filename.rpartition('site-packages' + os.sep)
+    return tail if sep else filename
+
+
+def query_origin():
+    """
+    Where the running query comes from: the innermost project frame, or
+    failing that the innermost frame outside the ORM.
+    """
+    base_dir = str(settings.BASE_DIR)
+    caller = None
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        if frame.filename in IGNORED_FILES or ORM_DIR in frame.filename:
+            continue
+        if frame.filename.startswith(base_dir) and 'site-packages' not in frame.filename:
+            caller = frame
+            break
+        caller = caller or frame
+    return f"{short_path(caller.filename)}:{caller.lineno} in {caller.name}" if caller else None
+
+
+def log_queries(execute, sql, params, many, context):
+    """
+    Database execute wrapper, installed on every connection, that logs
+    statements slower than ``SLOW_QUERY_MS`` and records every statement of
+    a profiled request.
+    """
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = (time.perf_counter() - started) * 1000
+        slow = elapsed >= settings.SLOW_QUERY_MS
+        queries = _query_log.get()
+        if slow or queries is not None:
+            origin = query_origin()
+            if slow:
+                slow_query_logger.warning('%.1f ms %s (from %s)', elapsed, sql, origin)
+            if queries is not None:
+                queries.append({'sql': sql, 'ms': round(elapsed, 3), 'slow': slow, 'origin': origin})
+
+
+def install_query_log(sender, connection, **kwargs):
+    """
+    ``connection_created`` receiver.
+    """
+    if log_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(log_queries)
+
+
+def frame_label(code):
+    return f"{code.co_qualname} ({short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Tracer:
+    """
+    Deterministic profiler: every Python and builtin call of one thread,
+    with its own time (excluding callees) in microseconds per call stack.
+    """
+    def __init__(self):
+        self.stacks = defaultdict(float)
+        self.frames = []
+
+    def __call__(self, frame, event, arg):
+        now = time.perf_counter()
+        if event == 'call':
+            self.frames.append([frame_label(frame.f_code), now, 0.0])
+        elif event == 'c_call':
+            self.frames.append([f"{getattr(arg, '__qualname__', repr(arg))} (builtin)", now, 0.0])
+        elif self.frames:
+            # A return, c_return or c_exception; returns from frames entered
+            # before the tracer started find the stack empty
+            label, started, callees = self.frames.pop()
+            elapsed = now - started
+            path = ';'.join([entry[0] for entry in self.frames] + [label])
+            self.stacks[path] += (elapsed - callees) * 1e6
+            if self.frames:
+                self.frames[-1][2] += elapsed
+
+    def __enter__(self):
+        sys.setprofile(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        sys.setprofile(None)
+
+
+class Sampler:
+    """
+    Statistical profiler: a background thread records the call stack of
+    the calling thread every ``interval`` seconds. Weights are in samples.
+    """
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = defaultdict(float)
+        self.thread_id = threading.get_ident()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='request-sampler', daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            if labels:
+                self.stacks[';'.join(reversed(labels))] += 1
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+def is_admin_token(request):
+    """
+    Whether the request carries an admin's API token. Views authenticate on
+    their own; this only decides whether an ``X-Profile`` header is honoured.
+    """
+    from rest_framework.authtoken.models import Token
+
+    scheme, _, key = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    if scheme != 'Token' or not key:
+        return False
+    return Token.objects.filter(key=key, user__role='admin', user__is_active=True).exists()
+
+
+def write_profile(profile_id, request, response, elapsed, mode, stacks, queries):
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    path = os.path.join(settings.PROFILING_DIR, profile_id)
+    with open(f"{path}.folded", 'w') as f:
+        for stack, weight in sorted(stacks.items()):
+            if round(weight):
+                f.write(f"{stack} {round(weight)}\n")
+    with open(f"{path}.json", 'w') as f:
+        json.dump({
+            'id': profile_id,
+            'method': request.method,
+            # Not the query string: the live stream takes its token there
+            'path': request.path,
+            'status': response.status_code,
+            'mode': mode,
+            'recorded_at': timezone.now().isoformat(),
+            'ms': round(elapsed * 1000, 3),
+            'query_count': len(queries),
+            'query_ms': round(sum(query['ms'] for query in queries), 3),
+            'queries': queries,
+        }, f, indent=2)
+
+
+class ProfilingMiddleware:
+    """
+    Profile requests on demand; see the module docstring.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        mode = self.mode(request, is_admin_token(request) if 'X-Profile' in request.headers else False)
+        if mode is None:
+            return self.get_response(request)
+
+        queries = []
+        token = _query_log.set(queries)
+        profiler = self.profiler(mode)
+        started = time.perf_counter()
+        try:
+            with profiler:
+                response = self.get_response(request)
+        finally:
+            _query_log.reset(token)
+        return self.finish(request, response, time.perf_counter() - started, mode, profiler, queries)
+
+    async def __acall__(self, request):
+        admin = await sync_to_async(is_admin_token)(request) if 'X-Profile' in request.headers else False
+        mode = self.mode(request, admin)
+        if mode is None:
+            return await self.get_response(request)
+
+        queries = []
+        token = _query_log.set(queries)
+        profiler = self.profiler(mode)
+        started = time.perf_counter()
+        try:
+            with profiler:
+                response = await self.get_response(request)
+        finally:
+            _query_log.reset(token)
+        return self.finish(request, response, time.perf_counter() - started, mode, profiler, queries)
+
+    def mode(self, request, admin):
+        if admin:
+            return 'trace' if request.headers['X-Profile'] == 'trace' else 'sample'
+        rate = settings.PROFILING_SAMPLE_RATE
+        if rate and random.random() < rate:
+            return 'sample'
+        return None
+
+    def profiler(self, mode):
+        return Tracer() if mode == 'trace' else Sampler(settings.PROFILING_SAMPLE_INTERVAL)
+
+    def finish(self, request, response, elapsed, mode, profiler, queries):
+        match = request.resolver_match
+        route = match.view_name if match else 'unmatched'
+        profile_id = f"{timezone.now():%Y%m%d-%H%M%S}-{route.replace(':', '-')}-{uuid.uuid4().hex[:8]}"
+        write_profile(profile_id, request, response, elapsed, mode, profiler.stacks, queries)
+        response['X-Profile-Id'] = profile_id
+        return response
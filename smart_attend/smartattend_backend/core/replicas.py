@@ -0,0 +1,117 @@
+"""
+Read replicas for analytical views.
+
+Views decorated with ``@replica_reads`` read from one of
+``DATABASE_REPLICAS`` (the database aliases other than ``default``); every
+other query, and every write, goes to ``default``. A user who has just
+written is pinned to ``default`` for ``REPLICA_PIN_SECONDS`` so replication
+lag never hides their own changes. Pins are kept in the cache, so workers
+need a shared cache (see ``CACHES``) for them to hold across workers.
+
+Without replicas configured, everything reads from ``default``.
+"""
+import contextvars
+import functools
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+# Whether reads in this context may go to a replica
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def pin_key(user_id):
+    return f"db:pinned:{user_id}"
+
+
+def pin(user):
+    """
+    Send ``user``'s reads to ``default`` for the next
+    ``REPLICA_PIN_SECONDS``.
+    """
+    cache.set(pin_key(user.id), 1, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user):
+    return bool(user.is_authenticated and cache.get(pin_key(user.id)))
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not (_use_replica.get() and settings.DATABASE_REPLICAS):
+            return None
+        # Reads inside a transaction must see its writes
+        if connections['default'].in_atomic_block:
+            return None
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        # The rest of the request reads its own writes
+        _use_replica.set(False)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as default
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        return db not in settings.DATABASE_REPLICAS
+
+
+def replica_reads(view):
+    """
+    Let ``view`` read from a replica unless the user is pinned to
+    ``default``. Apply it directly to the view function, below
+    ``@api_view``, so ``request.user`` is authenticated.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not settings.DATABASE_REPLICAS or is_pinned(request.user):
+            return view(request, *args, **kwargs)
+        token = _use_replica.set(True)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+    return wrapper
+
+
+class ReplicaPinMiddleware:
+    """
+    Pin users to ``default`` after each successful write request they make.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self.pin_writer(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if settings.DATABASE_REPLICAS and request.method not in SAFE_METHODS:
+            # Resolving a session user may query the database
+            await sync_to_async(self.pin_writer)(request, response)
+        return response
+
+    def pin_writer(self, request, response):
+        if not settings.DATABASE_REPLICAS or request.method in SAFE_METHODS or response.status_code >= 400:
+            return
+        # DRF sets the user it authenticated on the underlying request
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            pin(user)
@@ -0,0 +1,63 @@
+"""
+Per-user cache of rendered responses.
+
+Entries are keyed by user and path and tagged with the ETag computed from
+the version stamps in ``core.versioning``. A write bumps the versions,
+which changes the ETag and makes the entry stale. No explicit deletes are
+needed.
+
+When an entry goes stale, the first request rebuilds it. Other requests
+for the same key that arrive during the rebuild get the stale body for up
+to ``RESPONSE_CACHE_STALE_TTL`` seconds after the invalidating write,
+instead of all rebuilding at once.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+
+def cache_key(request, view_name):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f"response:{view_name}:{request.user.pk}:{path}"
+
+
+def get_entry(key):
+    return cache.get(key)
+
+
+def build_response(entry, stale=False):
+    response = HttpResponse(entry['body'], content_type='application/json')
+    response['X-Cache'] = 'STALE' if stale else 'HIT'
+    return response
+
+
+def serve(request, key, etag, last_modified, view, args, kwargs):
+    """
+    Return ``(response, etag)`` for the request, from the cache if possible.
+    A stale hit is returned with the ETag it was stored under.
+    """
+    entry = get_entry(key)
+    if entry is not None and entry['etag'] == etag:
+        return build_response(entry), etag
+
+    lock_key = f"{key}:rebuild"
+    locked = entry is not None and cache.add(lock_key, 1, timeout=settings.RESPONSE_CACHE_STALE_TTL)
+    if entry is not None and not locked:
+        # Someone else is rebuilding this entry; a recently invalidated body will do meanwhile
+        if last_modified is None or time.time() - last_modified <= settings.RESPONSE_CACHE_STALE_TTL:
+            return build_response(entry, stale=True), entry['etag']
+
+    try:
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            body = JSONRenderer().render(response.data)
+            cache.set(key, {'etag': etag, 'body': body}, timeout=settings.RESPONSE_CACHE_TIMEOUT)
+            response['X-Cache'] = 'MISS'
+        return response, etag
+    finally:
+        if locked:
+            cache.delete(lock_key)
@@ -51,5 +51,5 @@ class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = ('id', 'user', 'user_name', 'title', 'message', 'notification_type', 
-                  'is_read', 'created_at')
-        read_only_fields = ('id', 'user_name', 'created_at')
\ No newline at end of file
+                  'is_read', 'created_at', 'digest_count')
+        read_only_fields = ('id', 'user_name', 'created_at', 'digest_count')
\ No newline at end of file
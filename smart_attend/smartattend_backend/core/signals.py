@@ -0,0 +1,148 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from accounts.models import User
+from attendance.models import AttendanceRecord, AttendanceSession
+from classes.models import Class, ClassSchedule
+from .models import Notification
+from .notifications import decrement_unread, increment_unread, recount_unread
+from .sync import DELETE, UPSERT, log_changes
+from .versioning import bump, bump_on_commit
+
+
+@receiver(post_save, sender=Notification)
+def update_unread_counter_on_save(sender, instance, created, raw=False, **kwargs):
+    # Bulk paths in core.notifications maintain the counter themselves;
+    # this covers one-off saves such as the admin.
+    if raw:
+        return
+    if created:
+        if not instance.is_read:
+            increment_unread([instance.user_id])
+    else:
+        recount_unread(instance.user_id)
+
+
+@receiver(post_delete, sender=Notification)
+def update_unread_counter_on_delete(sender, instance, **kwargs):
+    if not instance.is_read:
+        decrement_unread(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def bump_user_version(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump(f"user:{instance.pk}")
+
+
+@receiver(post_save, sender=Class)
+@receiver(post_delete, sender=Class)
+def bump_class_version(sender, instance, raw=False, **kwargs):
+    # "classes" covers listings that lose a class (deletes, teacher changes)
+    if not raw:
+        bump(f"class:{instance.pk}", 'classes')
+
+
+def deleted_with(origin, *models):
+    """
+    Whether a post_delete is part of a cascade from one of ``models``, whose
+    own receiver already bumps the scopes involved.
+    """
+    return isinstance(origin, models)
+
+
+@receiver(post_save, sender=ClassSchedule)
+@receiver(post_delete, sender=ClassSchedule)
+def bump_schedule_class_version(sender, instance, raw=False, origin=None, **kwargs):
+    if not raw and not deleted_with(origin, Class):
+        bump(f"class:{instance.class_obj_id}")
+
+
+@receiver(m2m_changed, sender=Class.students.through)
+def bump_roster_version(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        student_ids = pk_set if action != 'pre_clear' else instance.students.values_list('pk', flat=True)
+        bump(f"class:{instance.pk}", *(f"enrollment:user:{pk}" for pk in student_ids))
+    else:
+        class_ids = pk_set if action != 'pre_clear' else instance.enrolled_classes.values_list('pk', flat=True)
+        bump(f"enrollment:user:{instance.pk}", *(f"class:{pk}" for pk in class_ids))
+
+
+@receiver(post_save, sender=AttendanceSession)
+@receiver(post_delete, sender=AttendanceSession)
+def bump_session_version(sender, instance, raw=False, origin=None, **kwargs):
+    if not raw and not deleted_with(origin, Class):
+        bump(f"sessions:class:{instance.class_obj_id}")
+
+
+@receiver(post_save, sender=AttendanceRecord)
+@receiver(post_delete, sender=AttendanceRecord)
+def bump_record_version(sender, instance, raw=False, origin=None, **kwargs):
+    if not raw and not deleted_with(origin, Class, AttendanceSession):
+        bump_on_commit(f"sessions:class:{instance.session.class_obj_id}")
+
+
+# Change log for delta sync (core.sync). Cascades are covered by the
+# tombstone of the class or session they start from.
+
+@receiver(post_save, sender=Class)
+def log_class_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        log_changes('class', [(instance.pk, instance.pk, None)])
+
+
+@receiver(pre_delete, sender=Class)
+def log_class_deletion(sender, instance, **kwargs):
+    # Students lose sight of the class with their enrollment, and the
+    # teacher with the class itself, so both are told directly
+    log_changes('class', [(instance.pk, instance.pk, instance.teacher_id)], DELETE)
+    log_changes('enrollment', [
+        (instance.pk, instance.pk, student_id) for student_id in instance.students.values_list('pk', flat=True)
+    ], DELETE)
+
+
+@receiver(post_save, sender=ClassSchedule)
+@receiver(post_delete, sender=ClassSchedule)
+def log_schedule_change(sender, instance, raw=False, origin=None, **kwargs):
+    # Schedules are sent as part of their class
+    if not raw and not deleted_with(origin, Class):
+        log_changes('class', [(instance.class_obj_id, instance.class_obj_id, None)])
+
+
+@receiver(m2m_changed, sender=Class.students.through)
+def log_enrollment_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    change = UPSERT if action == 'post_add' else DELETE
+    if not reverse:
+        student_ids = pk_set if action != 'pre_clear' else instance.students.values_list('pk', flat=True)
+        log_changes('enrollment', [(instance.pk, instance.pk, pk) for pk in student_ids], change)
+    else:
+        class_ids = pk_set if action != 'pre_clear' else instance.enrolled_classes.values_list('pk', flat=True)
+        log_changes('enrollment', [(pk, pk, instance.pk) for pk in class_ids], change)
+
+
+@receiver(post_save, sender=AttendanceSession)
+@receiver(post_delete, sender=AttendanceSession)
+def log_session_change(sender, instance, raw=False, origin=None, signal=None, **kwargs):
+    if not raw and not deleted_with(origin, Class):
+        change = DELETE if signal is post_delete else UPSERT
+        log_changes('session', [(instance.pk, instance.class_obj_id, None)], change)
+
+
+@receiver(post_save, sender=AttendanceRecord)
+@receiver(post_delete, sender=AttendanceRecord)
+def log_record_change(sender, instance, raw=False, origin=None, signal=None, **kwargs):
+    if not raw and not deleted_with(origin, Class, AttendanceSession):
+        change = DELETE if signal is post_delete else UPSERT
+        log_changes('record', [(instance.pk, instance.session.class_obj_id, instance.student_id)], change)
+
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def log_notification_change(sender, instance, raw=False, signal=None, **kwargs):
+    if not raw:
+        change = DELETE if signal is post_delete else UPSERT
+        log_changes('notification', [(instance.pk, None, instance.user_id)], change)
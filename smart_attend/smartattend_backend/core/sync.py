@@ -0,0 +1,269 @@
+"""
+Delta sync for the mobile client.
+
+Every change to a class (including its schedules), enrollment, session,
+attendance record or notification appends a ``ChangeLog`` row: single saves
+and deletes through ``core.signals``, bulk writes by calling
+``log_changes`` themselves. Rows are inserted once the change commits, so
+their ids follow commit order and a reader can't pass over a change that
+is still in flight.
+
+``GET /api/sync/`` without a cursor returns a snapshot of what the caller
+sees (sessions, records and notifications of the last
+``SYNC_SNAPSHOT_DAYS``) and a cursor. With the cursor it returns only what
+changed since: the current state of every object created or updated, and
+the ids of those deleted. Deleting a class or leaving it removes its
+sessions and records as well; the client drops them locally. Cursors older
+than ``SYNC_RETENTION_DAYS`` get a fresh snapshot with ``reset`` set.
+Snapshots and deltas both come in pages of ``SYNC_PAGE_SIZE``, with
+``has_more`` set until the last one.
+"""
+import datetime
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core import signing
+from django.db import router, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from attendance.models import AttendanceRecord, AttendanceSession
+from classes.models import Class
+from .models import ChangeLog, Notification
+
+UPSERT = 'upsert'
+DELETE = 'delete'
+CURSOR_SALT = 'core.sync'
+KINDS = {'class': 'classes', 'session': 'sessions', 'record': 'records', 'notification': 'notifications'}
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def log_changes(kind, entries, action=UPSERT):
+    """
+    Log a change of ``kind`` for each ``(object_id, class_id, user_id)`` in
+    ``entries`` with a single INSERT once the current transaction commits.
+    Logged inside it, a long transaction's rows would get ids below those
+    of changes committed ahead of it, which readers may already be past.
+    """
+    entries = list(entries)
+    if not entries:
+        return
+
+    def insert():
+        now = timezone.now()
+        ChangeLog.objects.bulk_create([
+            ChangeLog(kind=kind, action=action, object_id=object_id, class_id=class_id, user_id=user_id,
+                      changed_at=now)
+            for object_id, class_id, user_id in entries
+        ])
+
+    transaction.on_commit(insert, using=router.db_for_write(ChangeLog))
+
+
+def make_cursor(change_id, resume=None):
+    """
+    A cursor at ``change_id``; ``resume`` is the ``(kind, after_id)`` a
+    snapshot being paged continues from.
+    """
+    return signing.dumps([change_id, int(time.time()), *(resume or ())], salt=CURSOR_SALT)
+
+
+def parse_cursor(cursor):
+    """
+    Return ``(change_id, resume)`` for ``cursor`` (see ``make_cursor``), or
+    ``None`` if it is too old to be caught up from the log.
+    """
+    try:
+        change_id, issued_at, *resume = signing.loads(cursor, salt=CURSOR_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        raise InvalidCursor(cursor)
+    if time.time() - issued_at > settings.SYNC_RETENTION_DAYS * 86400:
+        return None
+    return change_id, tuple(resume) or None
+
+
+def visible_classes(user):
+    if user.role == 'admin':
+        return Class.objects.all()
+    if user.role == 'teacher':
+        return Class.objects.filter(teacher=user)
+    return Class.objects.filter(students=user)
+
+
+def visible_records(user):
+    records = AttendanceRecord.objects.select_related('student', 'session__class_obj')
+    if user.role == 'admin':
+        return records
+    if user.role == 'teacher':
+        return records.filter(session__class_obj__teacher=user)
+    return records.filter(student=user)
+
+
+def visible_changes(user):
+    """
+    The change log as far as ``user`` may see it. Students see their
+    classes' sessions but only their own records; class tombstones reach
+    them as enrollment changes and reach teachers through ``user_id``.
+    """
+    own = Q(kind='notification', user_id=user.id)
+    if user.role == 'admin':
+        return ChangeLog.objects.filter(own | Q(kind__in=['class', 'session', 'record']))
+    if user.role == 'teacher':
+        taught = Class.objects.filter(teacher=user).values('id')
+        return ChangeLog.objects.filter(
+            own | Q(kind='class', user_id=user.id) | Q(kind__in=['class', 'session', 'record'], class_id__in=taught)
+        )
+    enrolled = Class.students.through.objects.filter(user_id=user.id).values('class_id')
+    return ChangeLog.objects.filter(
+        own | Q(kind__in=['enrollment', 'record'], user_id=user.id)
+        | Q(kind__in=['class', 'session'], class_id__in=enrolled)
+    )
+
+
+def sync(user, cursor=None):
+    """
+    The response body for ``GET /api/sync/``.
+    """
+    position = parse_cursor(cursor) if cursor else None
+    if position is None:
+        return snapshot(user, reset=bool(cursor))
+    since, resume = position
+    if resume is not None:
+        return snapshot(user, since, resume)
+    return delta(user, since)
+
+
+def snapshot(user, since=None, resume=None, reset=False):
+    """
+    A page of the snapshot: up to ``SYNC_PAGE_SIZE`` classes, sessions,
+    records and notifications, in that order and each by id, from
+    ``resume`` on. Every page's cursor points at the change log position
+    read for the first one, so changes made while paging are sent again.
+    """
+    if since is None:
+        since = ChangeLog.objects.aggregate(latest=Max('id'))['latest'] or 0
+    start = timezone.now() - datetime.timedelta(days=settings.SYNC_SNAPSHOT_DAYS)
+    classes = visible_classes(user)
+    sessions = AttendanceSession.objects.with_counts().filter(class_obj__in=classes, session_date__gte=start.date())
+    querysets = {
+        'class': classes.with_details(),
+        'session': sessions,
+        'record': visible_records(user).filter(session__in=sessions.values('id')),
+        'notification': Notification.objects.filter(user=user, created_at__gte=start).select_related('user'),
+    }
+
+    kind, after = resume or ('class', 0)
+    kinds = list(KINDS)
+    page = dict.fromkeys(kinds, [])
+    remaining = settings.SYNC_PAGE_SIZE
+    resume = None
+    for name in kinds[kinds.index(kind):]:
+        start_id = after if name == kind else 0
+        rows = list(querysets[name].filter(id__gt=start_id).order_by('id')[:remaining + 1])
+        page[name] = rows[:remaining]
+        if len(rows) > remaining:
+            resume = (name, page[name][-1].id if page[name] else start_id)
+            break
+        remaining -= len(rows)
+
+    return payload(
+        cursor=make_cursor(since, resume),
+        has_more=resume is not None,
+        reset=reset,
+        classes=page['class'],
+        sessions=page['session'],
+        records=page['record'],
+        notifications=page['notification'],
+    )
+
+
+def delta(user, since):
+    rows = list(
+        visible_changes(user).filter(id__gt=since).order_by('id')
+        .values_list('id', 'kind', 'action', 'object_id', 'changed_at')[:settings.SYNC_PAGE_SIZE + 1]
+    )
+    has_more = len(rows) > settings.SYNC_PAGE_SIZE
+    rows = rows[:settings.SYNC_PAGE_SIZE]
+
+    # The last change to an object decides whether it is sent or deleted.
+    # Joining a class sends it with its recent history; leaving deletes it.
+    latest = {}
+    joined = set()
+    for _, kind, action, object_id, _ in rows:
+        if kind == 'enrollment':
+            kind = 'class'
+            if action == UPSERT:
+                joined.add(object_id)
+            else:
+                joined.discard(object_id)
+        latest[kind, object_id] = action
+    upserts, deletes = defaultdict(set), defaultdict(set)
+    for (kind, object_id), action in latest.items():
+        (upserts if action == UPSERT else deletes)[kind].add(object_id)
+
+    start = timezone.now() - datetime.timedelta(days=settings.SYNC_SNAPSHOT_DAYS)
+    classes = visible_classes(user)
+    sessions = AttendanceSession.objects.with_counts().filter(class_obj__in=classes).filter(
+        Q(id__in=upserts['session']) | Q(class_obj__in=joined, session_date__gte=start.date())
+    )
+    records = visible_records(user).filter(
+        Q(id__in=upserts['record']) | Q(session__class_obj__in=joined, session__session_date__gte=start.date())
+    )
+
+    # Concurrent commits insert their rows a moment apart, so a row may
+    # still be in flight behind the newest ones: the cursor stops at the
+    # first unsettled one. What follows waits for the next poll instead of
+    # being paged right away.
+    settled = timezone.now() - datetime.timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+    cursor = since
+    for change_id, _, _, _, changed_at in rows:
+        if changed_at > settled:
+            has_more = False
+            break
+        cursor = change_id
+
+    return payload(
+        cursor=make_cursor(cursor),
+        has_more=has_more,
+        classes=classes.filter(id__in=upserts['class']).with_details(),
+        sessions=sessions,
+        records=records,
+        notifications=Notification.objects.filter(user=user, id__in=upserts['notification']).select_related('user'),
+        deleted={KINDS[kind]: sorted(ids) for kind, ids in deletes.items()},
+    )
+
+
+def payload(cursor, classes, sessions, records, notifications, deleted=None, reset=False, has_more=False):
+    # Imported here as the serializers' modules log changes themselves
+    from attendance.serializers import AttendanceRecordSerializer, AttendanceSessionSerializer
+    from classes.serializers import ClassSerializer
+    from .serializers import NotificationSerializer
+
+    return {
+        'cursor': cursor,
+        'has_more': has_more,
+        'reset': reset,
+        'classes': ClassSerializer(classes, many=True).data,
+        'sessions': AttendanceSessionSerializer(sessions, many=True).data,
+        'records': AttendanceRecordSerializer(records, many=True).data,
+        'notifications': NotificationSerializer(notifications, many=True).data,
+        'deleted': {name: (deleted or {}).get(name, []) for name in KINDS.values()},
+    }
+
+
+def prune_changes(before, chunk_size=None):
+    """
+    Delete change log rows older than ``before``, ``chunk_size`` rows per
+    DELETE. Returns the number deleted.
+    """
+    chunk_size = chunk_size or settings.SYNC_PRUNE_CHUNK_SIZE
+    deleted = 0
+    while True:
+        ids = list(ChangeLog.objects.filter(changed_at__lt=before).order_by('id').values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        deleted += ChangeLog.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,175 @@
+"""
+Synthetic institution generator for benchmarks and tests.
+
+Everything is written with ``bulk_create`` in batches, so signals don't fire
+and years of history load in seconds. Pass the same ``seed`` to get the
+same data.
+"""
+import datetime
+import itertools
+import json
+import random
+from types import SimpleNamespace
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from accounts.models import User
+from attendance.models import AttendanceRecord, AttendanceSession, QRCode
+from attendance.rollups import rebuild_rollups
+from classes.models import Class, ClassSchedule
+from .models import AttendanceAnalytics, FacialRecognitionData, Notification
+
+BATCH_SIZE = 2000
+WEEKDAYS = [value for value, label in ClassSchedule.WEEKDAY_CHOICES[:5]]
+
+
+def bulk_insert(model, rows):
+    """
+    Insert an iterable of unsaved instances ``BATCH_SIZE`` at a time without
+    holding them all in memory.
+    """
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, BATCH_SIZE)):
+        model.objects.bulk_create(batch)
+
+
+def generate_institution(teachers=5, students=200, classes=10, roster_size=60, days=20,
+                         meetings_per_week=5, attendance_rate=0.8, notifications=100,
+                         password='x', seed=0):
+    """
+    Create an institution and return its notable rows as a namespace.
+
+    ``teachers`` teach ``classes`` classes between them, each class meets
+    ``meetings_per_week`` weekdays and enrolls ``roster_size`` of the
+    ``students``. Every meeting in the last ``days`` days gets a session
+    with a full roster of records, present with ``attendance_rate``
+    probability. Past sessions are closed with their final counts.
+
+    The returned namespace holds ``admin``, ``teacher`` and ``student``
+    (users with ``password`` and a token; the teacher teaches
+    ``class_obj`` and the student is enrolled in every class), plus
+    ``students`` (the other students), ``classes``, ``class_obj``, today's
+    open ``session`` of it with an active ``qr_code``, and one of the
+    student's ``notification``s.
+    """
+    rng = random.Random(seed)
+    today = timezone.localdate()
+    hashed = make_password(password)
+
+    with transaction.atomic():
+        admin = User.objects.create(username='admin', email='admin@example.com', role='admin', password=hashed)
+        teacher_objs = User.objects.bulk_create([
+            User(username='teacher' if i == 0 else f"teacher{i}", email=f"teacher{i}@example.com",
+                 role='teacher', password=hashed)
+            for i in range(teachers)
+        ])
+        student = User.objects.create(username='student', email='student@example.com', role='student', password=hashed)
+        others = User.objects.bulk_create([
+            User(username=f"student{i}", email=f"student{i}@example.com", role='student', password=hashed)
+            for i in range(students)
+        ], batch_size=BATCH_SIZE)
+        teacher = teacher_objs[0]
+        Token.objects.bulk_create([Token(user=user, key=Token.generate_key()) for user in (admin, teacher, student)])
+
+        class_objs = Class.objects.bulk_create([
+            Class(
+                course_id=f"CS{100 + i}", course_name=f"Course {i}", semester=str(1 + i % 8), section='ABCD'[i % 4],
+                teacher=teacher_objs[i % teachers], room_number=str(100 + i),
+                latitude=12.971599, longitude=77.594566,
+                start_time=datetime.time(8 + i % 8, 0), end_time=datetime.time(9 + i % 8, 0)
+            )
+            for i in range(classes)
+        ])
+        rosters = {
+            class_obj.id: [student] + rng.sample(others, min(roster_size - 1, len(others)))
+            for class_obj in class_objs
+        }
+        Class.students.through.objects.bulk_create([
+            Class.students.through(class_id=class_id, user_id=member.id)
+            for class_id, members in rosters.items() for member in members
+        ], batch_size=BATCH_SIZE)
+
+        meetings = {class_obj.id: set(rng.sample(WEEKDAYS, meetings_per_week)) for class_obj in class_objs}
+        # The class tests act on meets today so it has an open session
+        meetings[class_objs[0].id].add(ClassSchedule.WEEKDAY_CHOICES[today.weekday()][0])
+        ClassSchedule.objects.bulk_create([
+            ClassSchedule(class_obj=class_obj, weekday=weekday, start_time=class_obj.start_time, end_time=class_obj.end_time)
+            for class_obj in class_objs for weekday in sorted(meetings[class_obj.id])
+        ])
+
+        sessions = []
+        for day in range(days):
+            date = today - datetime.timedelta(days=day)
+            weekday = ClassSchedule.WEEKDAY_CHOICES[date.weekday()][0]
+            for class_obj in class_objs:
+                if weekday not in meetings[class_obj.id]:
+                    continue
+                if date == today:
+                    sessions.append(AttendanceSession(
+                        class_obj=class_obj, session_date=date,
+                        start_time=datetime.time(0, 0), end_time=datetime.time(23, 59)
+                    ))
+                    continue
+                presence = [rng.random() < attendance_rate for _ in rosters[class_obj.id]]
+                session = AttendanceSession(
+                    class_obj=class_obj, session_date=date, start_time=class_obj.start_time,
+                    end_time=class_obj.end_time, is_active=False, closed_at=timezone.now(),
+                    final_total=len(presence), final_present=sum(presence)
+                )
+                session.presence = presence
+                sessions.append(session)
+        AttendanceSession.objects.bulk_create(sessions, batch_size=BATCH_SIZE)
+
+        teacher_ids = {class_obj.id: class_obj.teacher_id for class_obj in class_objs}
+        bulk_insert(AttendanceRecord, (
+            AttendanceRecord(
+                session=session, student=member, is_present=present, method='manual',
+                recorded_by_id=teacher_ids[session.class_obj_id]
+            )
+            for session in sessions if hasattr(session, 'presence')
+            for member, present in zip(rosters[session.class_obj_id], session.presence)
+        ))
+
+        rebuild_rollups()
+
+        session = next(s for s in sessions if s.class_obj_id == class_objs[0].id and s.session_date == today)
+        qr_code = QRCode.objects.create(
+            session=session, code=f"synthetic-{seed}", expires_at=timezone.now() + datetime.timedelta(minutes=15)
+        )
+        FacialRecognitionData.objects.create(user=student, facial_encoding=json.dumps([0.1] * 128))
+        AttendanceAnalytics.objects.bulk_create([AttendanceAnalytics(class_obj=class_obj) for class_obj in class_objs])
+        Notification.objects.bulk_create([
+            Notification(user=student, title=f"Notice {i}", message='Hello', notification_type='system', is_read=i % 2 == 0)
+            for i in range(notifications)
+        ], batch_size=BATCH_SIZE)
+
+    return SimpleNamespace(
+        admin=admin, teacher=teacher, student=student, students=others,
+        classes=class_objs, class_obj=class_objs[0], session=session, qr_code=qr_code,
+        notification=Notification.objects.filter(user=student).first()
+    )
+
+
+def load_institution():
+    """
+    Rebuild the namespace ``generate_institution`` returned from a database
+    it already populated, e.g. to benchmark a running server.
+    """
+    admin = User.objects.get(username='admin')
+    teacher = User.objects.get(username='teacher')
+    student = User.objects.get(username='student')
+    session = AttendanceSession.objects.select_related('class_obj').filter(
+        class_obj__teacher=teacher, session_date=timezone.localdate(), is_active=True
+    ).order_by('class_obj_id').first()
+    if session is None:
+        raise ValueError('No open session today; the data was generated on an earlier day.')
+    return SimpleNamespace(
+        admin=admin, teacher=teacher, student=student,
+        students=list(User.objects.filter(role='student').exclude(id=student.id).order_by('id')),
+        classes=list(Class.objects.order_by('id')), class_obj=session.class_obj, session=session,
+        qr_code=session.qr_codes.filter(is_active=True).first(),
+        notification=Notification.objects.filter(user=student).first()
+    )
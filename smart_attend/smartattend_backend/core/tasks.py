@@ -0,0 +1,52 @@
+"""
+Background job handlers for the core app.
+"""
+import datetime
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from attendance.models import AttendanceRecord
+from classes.models import Class
+from .jobs import job
+from .models import AttendanceAnalytics
+from .notifications import notify, notify_low_attendance
+from .sync import prune_changes
+
+
+@job('notifications.fan_out')
+def fan_out_notifications(target, title, message, notification_type, dedupe_key='', window=None, coalesce=False):
+    notify(
+        target, title, message, notification_type,
+        dedupe_key=dedupe_key,
+        window=datetime.timedelta(seconds=window) if window is not None else None,
+        coalesce=coalesce
+    )
+
+
+@job('analytics.refresh')
+def refresh_analytics(class_id):
+    """
+    Recompute a class' attendance analytics and warn students below the
+    attendance threshold.
+    """
+    class_obj = Class.objects.get(id=class_id)
+    totals = AttendanceRecord.objects.filter(session__class_obj=class_obj).aggregate(
+        records=Count('id'),
+        present=Count('id', filter=Q(is_present=True))
+    )
+    average = (totals['present'] / totals['records'] * 100) if totals['records'] else 0
+
+    analytics = AttendanceAnalytics.objects.filter(class_obj=class_obj).first() or AttendanceAnalytics(class_obj=class_obj)
+    analytics.total_sessions = class_obj.attendance_sessions.count()
+    analytics.total_attendance = totals['present']
+    analytics.average_attendance = round(average, 2)
+    analytics.save()
+
+    notify_low_attendance(class_obj)
+
+
+@job('sync.prune', every=settings.SYNC_PRUNE_INTERVAL)
+def prune_change_log():
+    prune_changes(timezone.now() - datetime.timedelta(days=settings.SYNC_RETENTION_DAYS))
@@ -0,0 +1,55 @@
+"""
+Test helpers shared by the apps' test suites.
+"""
+import datetime
+import re
+
+from django.db import connection, transaction
+
+from classes.models import Class
+from .synthetic import generate_institution
+
+
+def make_class(teacher, students=(), **kwargs):
+    defaults = {
+        'course_id': 'CS101',
+        'course_name': 'Algorithms',
+        'semester': '3rd',
+        'section': 'A',
+        'room_number': '101',
+        'latitude': 12.971599,
+        'longitude': 77.594566,
+        'start_time': datetime.time(9, 0),
+        'end_time': datetime.time(10, 0),
+    }
+    defaults.update(kwargs)
+    class_obj = Class.objects.create(teacher=teacher, **defaults)
+    class_obj.students.set(students)
+    return class_obj
+
+
+def seed_campus():
+    """
+    A campus big enough for N+1 queries to show: one teacher with 10
+    classes of 60 students and four weeks of history. See
+    ``core.synthetic.generate_institution`` for what the namespace holds.
+    """
+    return generate_institution(teachers=1, students=200, classes=10, roster_size=60, days=28)
+
+
+def full_scans(queryset):
+    """
+    Return the tables the database plans to read in full to answer
+    ``queryset``. Scans of an index (including a partial one) don't count.
+
+    PostgreSQL prefers sequential scans on the tiny tables of a test
+    database, so they are disabled while planning; a ``Seq Scan`` in the
+    plan then means no usable index exists.
+    """
+    if connection.vendor == 'postgresql':
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+        return re.findall(r'Seq Scan on (\w+)', plan)
+    plan = queryset.explain()
+    return re.findall(r'\bSCAN (\w+)$', plan, re.MULTILINE)
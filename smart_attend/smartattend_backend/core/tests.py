@@ -1,3 +1,1241 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import time
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core import signing
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection, router, transaction
+from django.http import HttpResponse
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, resolve, reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from accounts.models import User
+from classes.models import Class
+from attendance.models import AttendanceRecord, AttendanceSession, QRCode
+from attendance.scheduling import expired_sessions
+from .models import AttendanceAnalytics, ChangeLog, EntityVersion, FacialRecognitionData, Job, LocationVerification, Notification, NotificationCounter
+from . import idempotency, metrics
+from .benchmarking import EXPECTED_STATUS, endpoint_requests, send
+from .jobs import backoff, claim, enqueue, heartbeat, job, periodic, release_stale, run_pending, schedule_periodic
+from .profiling import ProfilingMiddleware
+from .replicas import is_pinned, pin, replica_reads
+from .writer import Writer, write
+from .notifications import mark_read, notify, notify_later, unread_count
+from .response_cache import cache_key
+from .throttling import LoadSheddingMiddleware, take
+from .sync import CURSOR_SALT, make_cursor, prune_changes
+from .versioning import bump
+from .testing import full_scans, make_class, seed_campus
+
+
+class NotificationFanOutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher', password='x', role='teacher')
+        cls.students = [
+            User.objects.create_user(f"student{i}", password='x', role='student')
+            for i in range(5)
+        ]
+        cls.class_obj = make_class(cls.teacher, cls.students)
+
+    def test_class_target_creates_one_row_per_student_in_chunks(self):
+        with CaptureQueriesContext(connection) as ctx:
+            created = notify({'class_id': self.class_obj.id}, 'Hello', 'World', 'class', chunk_size=3)
+
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "core_notification" ')]
+        self.assertEqual(len(inserts), 2)
+        self.assertEqual(created, 5)
+        self.assertEqual(Notification.objects.filter(user__in=self.students).count(), 5)
+        self.assertFalse(Notification.objects.filter(user=self.teacher).exists())
+
+    def test_role_target(self):
+        created = notify({'role': 'teacher'}, 'Staff meeting', 'At noon', 'system')
+
+        self.assertEqual(created, 1)
+        self.assertTrue(Notification.objects.filter(user=self.teacher).exists())
+
+    def test_dedupe_key_skips_recipients_inside_window(self):
+        notify({'user_ids': [self.students[0].id]}, 'Started', 'Go', 'attendance', dedupe_key='k')
+        created = notify({'class_id': self.class_obj.id}, 'Started', 'Go', 'attendance', dedupe_key='k')
+
+        self.assertEqual(created, 4)
+        self.assertEqual(Notification.objects.filter(dedupe_key='k').count(), 5)
+
+    def test_coalesce_folds_burst_into_digest(self):
+        target = {'user_ids': [self.students[0].id]}
+        for i in range(3):
+            notify(target, 'Class updated', f"Change {i}", 'class', dedupe_key='c', coalesce=True)
+
+        notification = Notification.objects.get(user=self.students[0], dedupe_key='c')
+        self.assertEqual(notification.digest_count, 3)
+        self.assertEqual(notification.message, 'Change 2')
+
+    def test_notify_later_queues_a_job(self):
+        notify_later({'class_id': self.class_obj.id}, 'Later', 'Later', 'system',
+                     dedupe_key='later', window=datetime.timedelta(hours=1))
+        self.assertFalse(Notification.objects.exists())
+
+        run_pending()
+
+        self.assertEqual(Notification.objects.count(), 5)
+
+
+class UnreadNotificationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('student', password='x', role='student')
+        cls.other = User.objects.create_user('other', password='x', role='student')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+        notify({'user_ids': [self.user.id, self.other.id]}, 'One', 'One', 'system')
+        notify({'user_ids': [self.user.id]}, 'Two', 'Two', 'system')
+        Notification.objects.create(user=self.user, title='Three', message='Three', notification_type='system')
+
+    def test_counter_tracks_bulk_and_single_creates(self):
+        self.assertEqual(unread_count(self.user.id), 3)
+        self.assertEqual(unread_count(self.other.id), 1)
+
+    def test_unread_count_endpoint_reads_counter_only(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('unread-notification-count'))
+        self.assertEqual(response.data, {'unread_count': 3})
+
+    def test_bulk_mark_read_by_ids(self):
+        ids = list(Notification.objects.filter(user=self.user, title__in=['One', 'Two']).values_list('id', flat=True))
+        ids.append(Notification.objects.get(user=self.other).id)  # not ours, ignored
+
+        response = self.client.post(reverse('mark-notifications-read'), {'ids': ids}, format='json')
+
+        self.assertEqual(response.data, {'updated': 2, 'unread_count': 1})
+        self.assertFalse(Notification.objects.get(user=self.other).is_read)
+
+    def test_bulk_mark_read_before_timestamp(self):
+        response = self.client.post(
+            reverse('mark-notifications-read'), {'before': timezone.now().isoformat()}, format='json'
+        )
+
+        self.assertEqual(response.data['updated'], 3)
+        self.assertEqual(NotificationCounter.objects.get(user=self.user).unread_count, 0)
+
+    def test_mark_read_works_in_bounded_chunks(self):
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            self.assertEqual(mark_read(self.user.id, before=timezone.now(), chunk_size=2), 3)
+
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "core_notification"')]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(unread_count(self.user.id), 0)
+        self.assertEqual(ChangeLog.objects.filter(kind='notification', user_id=self.user.id).count(), 3)
+
+    def test_single_mark_read_is_idempotent(self):
+        notification = Notification.objects.filter(user=self.user).first()
+        url = reverse('mark-notification-read', args=[notification.id])
+        self.client.post(url)
+        self.client.post(url)
+
+        self.assertEqual(unread_count(self.user.id), 2)
+
+    def test_incremental_fetch_since(self):
+        since = Notification.objects.get(user=self.user, title='Two').created_at
+
+        response = self.client.get(reverse('get-notifications'), {'since': since.isoformat()})
+
+        self.assertEqual([n['title'] for n in response.data], ['Three'])
+
+    def test_incremental_fetch_pages_forward_from_oldest(self):
+        since = Notification.objects.get(user=self.user, title='One').created_at - datetime.timedelta(seconds=1)
+
+        response = self.client.get(reverse('get-notifications'), {'since': since.isoformat(), 'limit': 2})
+        self.assertEqual([n['title'] for n in response.data], ['One', 'Two'])
+        response = self.client.get(reverse('get-notifications'),
+                                   {'since': response.data[-1]['created_at'], 'limit': 2})
+        self.assertEqual([n['title'] for n in response.data], ['Three'])
+
+    def test_rejects_bad_limit_and_before(self):
+        for limit in ('-1', '0', 'ten'):
+            self.assertEqual(self.client.get(reverse('get-notifications'), {'limit': limit}).status_code, 400)
+        response = self.client.post(reverse('mark-notifications-read'), {'before': 123}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_delete_of_unread_notification_decrements_counter(self):
+        Notification.objects.filter(user=self.user, title='Three').get().delete()
+
+        self.assertEqual(unread_count(self.user.id), 2)
+
+
+class ResponseCacheTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher', password='x', role='teacher')
+        cls.students = [User.objects.create_user(f"s{i}", password='x', role='student') for i in range(3)]
+        cls.class_obj = make_class(cls.teacher, cls.students)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.teacher)
+        self.url = reverse('get-classes')
+
+    def test_second_request_is_served_from_cache(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+
+        with self.assertNumQueries(2):  # visible class ids + versions, no serialization
+            second = self.client.get(self.url)
+
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_roster_change_invalidates_entry(self):
+        self.client.get(self.url)
+
+        self.class_obj.students.remove(self.students[0])
+        response = self.client.get(self.url)
+
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()[0]['student_count'], 2)
+
+    def test_stale_entry_served_while_another_request_rebuilds(self):
+        stale_etag = self.client.get(self.url)['ETag']
+        self.class_obj.students.remove(self.students[0])
+
+        request = RequestFactory().get(self.url)
+        request.user = self.teacher
+        cache.add(f"{cache_key(request, 'get_classes')}:rebuild", 1)
+        response = self.client.get(self.url)
+
+        self.assertEqual(response['X-Cache'], 'STALE')
+        self.assertEqual(response['ETag'], stale_etag)
+        self.assertEqual(response.json()[0]['student_count'], 3)
+
+    def test_bump_increments_versions_in_the_database(self):
+        before = EntityVersion.objects.get(scope='classes').version
+
+        bump('classes', 'class:99')
+
+        versions = dict(EntityVersion.objects.filter(scope__in=['classes', 'class:99']).values_list('scope', 'version'))
+        self.assertEqual(versions, {'classes': before + 1, 'class:99': 1})
+
+
+class AsyncVerificationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher', password='x', role='teacher')
+        cls.student = User.objects.create_user('student', password='x', role='student')
+        cls.class_obj = make_class(cls.teacher, [cls.student])
+        cls.token = Token.objects.create(user=cls.student)
+        FacialRecognitionData.objects.create(user=cls.student, facial_encoding='[0.1, 0.2, 0.3]')
+
+    def post(self, url, data):
+        return self.async_client.post(
+            url, data, content_type='application/json', headers={'Authorization': f"Token {self.token.key}"}
+        )
+
+    async def test_verify_location_inside_radius(self):
+        response = await self.post(reverse('async-verify-location'), {
+            'class_id': self.class_obj.id, 'latitude': 12.9716, 'longitude': 77.5946
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['is_verified'])
+        self.assertEqual(await LocationVerification.objects.acount(), 1)
+
+    async def test_verify_location_unknown_class(self):
+        response = await self.post(reverse('async-verify-location'), {
+            'class_id': 0, 'latitude': 0, 'longitude': 0
+        })
+
+        self.assertEqual(response.status_code, 404)
+
+    async def test_verify_facial_data(self):
+        response = await self.post(reverse('async-verify-facial-data'), {
+            'class_id': self.class_obj.id, 'facial_encoding': [0.1, 0.2, 0.3]
+        })
+
+        self.assertEqual(response.json(), {'verified': True, 'similarity': 1.0})
+
+
+calls = []
+
+
+@job('tests.record')
+def record_call(value, fail_times=0):
+    calls.append(value)
+    if calls.count(value) <= fail_times:
+        raise RuntimeError('boom')
+
+
+@job('tests.outlive_lock')
+def outlive_lock():
+    # The lock times out mid-run and another worker claims the job
+    Job.objects.filter(name='tests.outlive_lock').update(locked_by='other-worker', locked_at=timezone.now())
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_jobs_run_by_priority(self):
+        enqueue('tests.record', {'value': 'low'})
+        enqueue('tests.record', {'value': 'high'}, priority=10)
+
+        self.assertEqual(run_pending(), 2)
+        self.assertEqual(calls, ['high', 'low'])
+        self.assertEqual(set(Job.objects.values_list('status', flat=True)), {'done'})
+
+    def test_dedupe_key_returns_pending_job(self):
+        first = enqueue('tests.record', {'value': 1}, dedupe_key='same')
+        second = enqueue('tests.record', {'value': 2}, dedupe_key='same')
+
+        self.assertEqual(first.id, second.id)
+        run_pending()
+        third = enqueue('tests.record', {'value': 3}, dedupe_key='same')
+        self.assertNotEqual(third.id, first.id)
+
+    def test_failed_job_is_retried_with_backoff(self):
+        queued = enqueue('tests.record', {'value': 'flaky', 'fail_times': 1})
+
+        with self.assertLogs('core.jobs', 'WARNING'):
+            run_pending()
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'queued')
+        self.assertGreater(queued.run_at, timezone.now())
+        self.assertIn('RuntimeError', queued.last_error)
+
+        Job.objects.filter(id=queued.id).update(run_at=timezone.now())
+        run_pending()
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'done')
+        self.assertEqual(queued.attempts, 2)
+
+    def test_job_fails_after_max_attempts(self):
+        queued = enqueue('tests.record', {'value': 'broken', 'fail_times': 99}, max_attempts=1)
+
+        with self.assertLogs('core.jobs', 'ERROR'):
+            run_pending()
+
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'failed')
+
+    def test_stale_job_fails_once_out_of_attempts(self):
+        crashing = enqueue('tests.record', {'value': 'oom'}, max_attempts=2)
+
+        def lose_a_run():
+            claim('dead-worker', 1)
+            Job.objects.filter(id=crashing.id).update(locked_at=timezone.now() - datetime.timedelta(hours=1))
+            return release_stale(timeout=60)
+
+        self.assertEqual(lose_a_run(), 1)
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.assertEqual(lose_a_run(), 0)
+
+        crashing.refresh_from_db()
+        self.assertEqual((crashing.status, crashing.attempts), ('failed', 2))
+        self.assertEqual(calls, [])
+
+    def test_run_that_outlived_its_lock_leaves_the_new_run_alone(self):
+        queued = enqueue('tests.outlive_lock')
+
+        with self.assertLogs('core.jobs', 'WARNING'):
+            run_pending()
+
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.locked_by), ('running', 'other-worker'))
+
+    def test_backoff_grows_exponentially(self):
+        self.assertLess(backoff(1), backoff(3))
+
+    @override_settings(JOBS_ALWAYS_EAGER=True)
+    def test_eager_mode_runs_inline(self):
+        enqueue('tests.record', {'value': 'now'})
+
+        self.assertEqual(calls, ['now'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_periodic_jobs_keep_one_run_pending(self):
+        schedule_periodic()
+        schedule_periodic()
+
+        pending = Job.objects.filter(dedupe_key__startswith='periodic:')
+        self.assertEqual(sorted(pending.values_list('name', flat=True)), sorted(periodic))
+        self.assertTrue(all(queued.run_at > timezone.now() for queued in pending))
+
+
+class RunJobsCommandTests(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_run_jobs_command_once(self):
+        queued = enqueue('tests.record', {'value': 'cmd'})
+
+        # The loop waits on the job instead of polling the in-memory test
+        # database alongside it, which SQLite reports as a locked table
+        stderr = io.StringIO()
+        call_command('run_jobs', '--once', '--workers', '1', '--poll-interval', '5',
+                     stdout=io.StringIO(), stderr=stderr)
+
+        self.assertEqual(calls, ['cmd'])
+        self.assertEqual(stderr.getvalue(), '')
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.locked_by), ('done', ''))
+
+    def test_heartbeat_keeps_long_jobs_locked(self):
+        queued = enqueue('tests.record', {'value': 'slow'})
+        [claimed] = claim('worker', 1)
+        Job.objects.filter(id=queued.id).update(locked_at=timezone.now() - datetime.timedelta(hours=1))
+
+        with heartbeat(queued.id, claimed.locked_by, interval=0.01):
+            time.sleep(0.2)
+
+        self.assertEqual(release_stale(timeout=60), 0)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'running')
+
+
+class AnalyticsRefreshTests(APITestCase):
+    def test_update_analytics_queues_refresh_and_returns_immediately(self):
+        teacher = User.objects.create_user('teacher', password='x', role='teacher')
+        students = [User.objects.create_user(f"s{i}", password='x', role='student') for i in range(2)]
+        class_obj = make_class(teacher, students)
+        session = AttendanceSession.objects.create(
+            class_obj=class_obj, session_date=datetime.date(2026, 1, 5),
+            start_time=datetime.time(9, 0), end_time=datetime.time(10, 0)
+        )
+        AttendanceRecord.objects.create(session=session, student=students[0], is_present=True, method='manual')
+        AttendanceRecord.objects.create(session=session, student=students[1], is_present=False, method='manual')
+        self.client.force_authenticate(teacher)
+
+        response = self.client.post(reverse('update-analytics', args=[class_obj.id]))
+        self.client.post(reverse('update-analytics', args=[class_obj.id]))
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(Job.objects.filter(name='analytics.refresh').count(), 1)
+
+        run_pending()
+
+        analytics = AttendanceAnalytics.objects.get(class_obj=class_obj)
+        self.assertEqual((analytics.total_sessions, analytics.total_attendance), (1, 1))
+        self.assertEqual(float(analytics.average_attendance), 50.0)
+        self.assertEqual(list(Notification.objects.values_list('user', flat=True)), [students[1].id])
+
+
+class MetricsTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='x', role='admin')
+        cls.student = User.objects.create_user('student', password='x', role='student')
+        cls.admin_token = Token.objects.create(user=cls.admin)
+        cls.student_token = Token.objects.create(user=cls.student)
+
+    def setUp(self):
+        metrics_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(metrics_dir.cleanup)
+        self.enterContext(override_settings(METRICS_DIR=metrics_dir.name))
+        metrics.registry.clear()
+
+    def scrape(self, token=None):
+        return self.client.get(reverse('metrics'), headers={'Authorization': f"Token {(token or self.admin_token).key}"})
+
+    def sample(self, text, line_start):
+        return [float(line.rsplit(' ', 1)[1]) for line in text.splitlines() if line.startswith(line_start)]
+
+    def test_records_requests_per_route(self):
+        headers = {'Authorization': f"Token {self.student_token.key}"}
+        self.client.get(reverse('user-profile'), headers=headers)
+        self.client.get(reverse('user-profile'), headers=headers)
+        self.client.get('/api/nowhere/')
+
+        response = self.scrape()
+
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        text = response.content.decode()
+        self.assertIn('# TYPE smartattend_http_request_duration_seconds histogram', text)
+        self.assertIn('smartattend_http_requests_total{route="user-profile",method="GET",status="200"} 2', text)
+        self.assertIn('smartattend_http_requests_total{route="unmatched",method="GET",status="404"} 1', text)
+        self.assertIn('smartattend_http_request_duration_seconds_bucket{route="user-profile",method="GET",le="+Inf"} 2', text)
+        # Token lookup and the profile itself, twice
+        self.assertEqual(self.sample(text, 'smartattend_http_request_queries_sum{route="user-profile"'), [4])
+        self.assertGreater(self.sample(text, 'smartattend_http_response_size_bytes_sum{route="user-profile"')[0], 0)
+
+    async def test_counts_queries_of_async_views(self):
+        await self.async_client.post(
+            reverse('async-verify-location'), {'class_id': 0, 'latitude': 0, 'longitude': 0},
+            content_type='application/json', headers={'Authorization': f"Token {self.student_token.key}"}
+        )
+
+        samples = metrics.collect()
+
+        labels = (('route', 'async-verify-location'), ('method', 'POST'))
+        self.assertEqual(samples['smartattend_http_request_queries_count', labels], 1)
+        self.assertGreater(samples['smartattend_http_request_queries_sum', labels], 0)
+
+    def test_adds_up_every_worker(self):
+        labels = [['route', 'user-profile'], ['method', 'GET'], ['status', '200']]
+        with open(os.path.join(metrics.settings.METRICS_DIR, '1.json'), 'w') as f:
+            json.dump([['smartattend_http_requests_total', labels, 5]], f)
+        self.client.get(reverse('user-profile'), headers={'Authorization': f"Token {self.student_token.key}"})
+
+        text = self.scrape().content.decode()
+
+        self.assertIn('smartattend_http_requests_total{route="user-profile",method="GET",status="200"} 6', text)
+
+    def test_admin_only(self):
+        self.assertEqual(self.scrape(self.student_token).status_code, 403)
+
+
+class ProfilingTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='x', role='admin')
+        cls.student = User.objects.create_user('student', password='x', role='student')
+        cls.admin_token = Token.objects.create(user=cls.admin)
+        cls.student_token = Token.objects.create(user=cls.student)
+
+    def setUp(self):
+        profile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(profile_dir.cleanup)
+        self.profile_dir = profile_dir.name
+        self.enterContext(override_settings(PROFILING_DIR=self.profile_dir))
+
+    def get(self, token, **headers):
+        return self.client.get(reverse('get-students'), headers={'Authorization': f"Token {token.key}", **headers})
+
+    def read(self, response, extension):
+        with open(os.path.join(self.profile_dir, f"{response['X-Profile-Id']}.{extension}")) as f:
+            return f.read()
+
+    def test_admin_trace(self):
+        response = self.get(self.admin_token, **{'X-Profile': 'trace'})
+
+        self.assertEqual(response.status_code, 200)
+        report = json.loads(self.read(response, 'json'))
+        self.assertEqual((report['mode'], report['status'], report['path']), ('trace', 200, reverse('get-students')))
+        self.assertEqual(report['query_count'], len(report['queries']))
+        # Token lookup by DRF, then the view's own query
+        self.assertIn('authtoken_token', report['queries'][0]['sql'])
+        self.assertTrue(report['queries'][-1]['origin'].startswith(os.path.join('accounts', 'views.py')))
+        stacks = self.read(response, 'folded').splitlines()
+        self.assertTrue(any('get_students (accounts' in line for line in stacks))
+        self.assertTrue(all(line.rsplit(' ', 1)[1].isdigit() for line in stacks))
+
+    def test_header_ignored_for_non_admins(self):
+        response = self.get(self.student_token, **{'X-Profile': 'trace'})
+
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(os.listdir(self.profile_dir), [])
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_query_string_is_not_recorded(self):
+        response = self.client.get(reverse('get-students'), {'token': self.admin_token.key})
+
+        report = self.read(response, 'json')
+        self.assertNotIn(self.admin_token.key, report)
+        self.assertEqual(json.loads(report)['path'], reverse('get-students'))
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_sampled_requests(self):
+        response = self.get(self.student_token)
+
+        self.assertEqual(json.loads(self.read(response, 'json'))['mode'], 'sample')
+
+    def test_unprofiled_requests_skip_the_token_lookup(self):
+        middleware = ProfilingMiddleware(lambda request: None)
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f"Token {self.admin_token.key}")
+
+        with self.assertNumQueries(0):
+            middleware(request)
+
+    @override_settings(SLOW_QUERY_MS=0)
+    def test_slow_queries_are_logged(self):
+        with self.assertLogs('core.slow_queries', 'WARNING') as logs:
+            User.objects.count()
+
+        self.assertIn('(from core/tests.py:', logs.output[0])
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def request(self, user=None):
+        request = RequestFactory().get('/')
+        request.user = user or AnonymousUser()
+        return request
+
+    def read_db(self, user=None):
+        return replica_reads(lambda request: Notification.objects.all().db)(self.request(user))
+
+    def test_only_decorated_views_read_from_the_replica(self):
+        self.assertEqual(self.read_db(), 'replica')
+        self.assertEqual(Notification.objects.all().db, 'default')
+
+    def test_pinned_users_read_from_default(self):
+        user = User(id=1)
+        pin(user)
+
+        self.assertEqual(self.read_db(user), 'default')
+        self.assertEqual(self.read_db(User(id=2)), 'replica')
+
+    def test_reads_after_a_write_stay_on_default(self):
+        def view(request):
+            router.db_for_write(Notification)
+            return Notification.objects.all().db
+
+        self.assertEqual(replica_reads(view)(self.request()), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        self.assertEqual(self.read_db(), 'default')
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(router.allow_migrate('replica', 'core'))
+        self.assertTrue(router.allow_migrate('default', 'core'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaPinTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user('student', password='x', role='student')
+        cls.token = Token.objects.create(user=cls.student)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_writers_are_pinned(self):
+        headers = {'Authorization': f"Token {self.token.key}"}
+        self.client.get(reverse('user-profile'), headers=headers)
+        self.assertFalse(is_pinned(self.student))
+
+        self.client.put(reverse('update-profile'), {'first_name': 'Ada'}, format='json', headers=headers)
+
+        self.assertTrue(is_pinned(self.student))
+
+    def test_failed_writes_dont_pin(self):
+        self.client.post(reverse('verify-location'), {'class_id': 0}, format='json',
+                         headers={'Authorization': f"Token {self.token.key}"})
+
+        self.assertFalse(is_pinned(self.student))
+
+
+class IdempotencyTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher', password='x', role='teacher')
+        cls.student = User.objects.create_user('student', password='x', role='student')
+        cls.class_obj = make_class(cls.teacher, [cls.student])
+        cls.session = AttendanceSession.objects.create(
+            class_obj=cls.class_obj, session_date=datetime.date(2026, 1, 5),
+            start_time=datetime.time(9, 0), end_time=datetime.time(10, 0)
+        )
+        cls.tokens = {user.pk: Token.objects.create(user=user).key for user in (cls.teacher, cls.student)}
+
+    def setUp(self):
+        cache.clear()
+
+    def post(self, name, user, data, key, client=None):
+        return (client or self.client).post(
+            reverse(name), data, content_type='application/json',
+            headers={'Authorization': f"Token {self.tokens[user.pk]}", 'Idempotency-Key': key}
+        )
+
+    def test_retry_replays_the_first_response(self):
+        data = {'class_id': self.class_obj.id, 'session_date': '2026-01-12', 'start_time': '09:00', 'end_time': '10:00'}
+        first = self.post('create-session', self.teacher, data, 'abc')
+
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.post('create-session', self.teacher, data, 'abc')
+
+        self.assertEqual((first.status_code, retry.status_code), (201, 201))
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        # Only the token lookup
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(AttendanceSession.objects.filter(session_date='2026-01-12').count(), 1)
+
+    def test_keys_are_per_user_and_request(self):
+        QRCode.objects.create(session=self.session, code='abc', expires_at=timezone.now() + datetime.timedelta(minutes=5))
+        self.assertEqual(self.post('scan-qr', self.student, {'code': 'abc'}, 'k').status_code, 200)
+
+        self.assertEqual(self.post('scan-qr', self.student, {'code': 'other'}, 'k').status_code, 422)
+        # The same key from another user is a different request
+        response = self.post('scan-qr', self.teacher, {'code': 'abc'}, 'k')
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+    def test_retry_while_the_first_request_runs(self):
+        key = idempotency.cache_key(self.student.pk, 'attendance.views.scan_qr_code', 'k')
+        cache.add(f"{key}:lock", 1)
+
+        response = self.post('scan-qr', self.student, {'code': 'abc'}, 'k')
+
+        self.assertEqual(response.status_code, 409)
+
+    def test_async_views(self):
+        QRCode.objects.create(session=self.session, code='abc', expires_at=timezone.now() + datetime.timedelta(minutes=5))
+
+        async def scan_twice():
+            first = await self.post('async-scan-qr', self.student, {'code': 'abc'}, 'k', self.async_client)
+            retry = await self.post('async-scan-qr', self.student, {'code': 'abc'}, 'k', self.async_client)
+            return first, retry
+        first, retry = async_to_sync(scan_twice)()
+
+        # Without the key the retry would find the code used up
+        self.assertEqual((first.status_code, retry.status_code), (200, 200))
+        self.assertEqual(retry.json(), first.json())
+
+
+def throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], **rates},
+    })
+
+
+class ThrottlingTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher', password='x', role='teacher')
+        cls.student = User.objects.create_user('student', password='x', role='student')
+        cls.class_obj = make_class(cls.teacher, [cls.student])
+        cls.session = AttendanceSession.objects.create(
+            class_obj=cls.class_obj, session_date=datetime.date(2026, 1, 5),
+            start_time=datetime.time(9, 0), end_time=datetime.time(10, 0)
+        )
+        cls.tokens = {user.pk: Token.objects.create(user=user).key for user in (cls.teacher, cls.student)}
+
+    def setUp(self):
+        caches['throttle'].clear()
+
+    def post(self, url, user, data, client=None):
+        return (client or self.client).post(url, data, content_type='application/json',
+                                            headers={'Authorization': f"Token {self.tokens[user.pk]}"})
+
+    def test_bucket_refills_over_time(self):
+        with mock.patch('core.throttling.time.time', return_value=1000):
+            self.assertEqual([take('bucket', '2/min') for _ in range(2)], [0, 0])
+            self.assertEqual(take('bucket', '2/min'), 30)
+        with mock.patch('core.throttling.time.time', return_value=1030):
+            self.assertEqual(take('bucket', '2/min'), 0)
+
+    @throttle_rates(verification='2/min')
+    def test_endpoint_class_limit(self):
+        location = {'class_id': self.class_obj.id, 'latitude': 12.971599, 'longitude': 77.594566}
+        for _ in range(2):
+            self.assertEqual(self.post(reverse('verify-location'), self.student, location).status_code, 200)
+
+        response = self.post(reverse('verify-location'), self.student, location)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        # The async endpoint shares the bucket; other endpoints don't
+        async def verify_async():
+            return await self.post(reverse('async-verify-location'), self.student, location, self.async_client)
+        response = async_to_sync(verify_async)()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        headers = {'Authorization': f"Token {self.tokens[self.student.pk]}"}
+        self.assertEqual(self.client.get(reverse('user-profile'), headers=headers).status_code, 200)
+
+    @throttle_rates(anon='1/min')
+    def test_anonymous_clients_cannot_pick_their_bucket(self):
+        # nginx appends the address it saw to whatever the client sent
+        def login(forwarded_for, email):
+            return self.client.post(reverse('login'), {'email': email, 'password': 'x'},
+                                    headers={'X-Forwarded-For': f"{forwarded_for}, 203.0.113.5"})
+
+        self.assertEqual(login('198.51.100.1', 'a@example.com').status_code, 400)
+        self.assertEqual(login('198.51.100.2', 'b@example.com').status_code, 429)
+
+    @throttle_rates(login='2/min')
+    def test_login_attempts_per_address_and_email(self):
+        def login(email, address='203.0.113.5'):
+            return self.client.post(reverse('login'), {'email': email, 'password': 'x'}, REMOTE_ADDR=address)
+
+        self.assertEqual([login('A@example.com').status_code, login('a@example.com ').status_code], [400, 400])
+        self.assertEqual(login('a@example.com').status_code, 429)
+        # Classmates behind the same address keep their own attempts
+        self.assertEqual(login('b@example.com').status_code, 400)
+        self.assertEqual(login('a@example.com', '203.0.113.6').status_code, 400)
+
+    @throttle_rates(session='1/min')
+    def test_session_limit_spares_teachers(self):
+        url = reverse('mark-attendance', args=[self.session.id])
+        for _ in range(3):
+            response = self.post(url, self.teacher, {'student_id': self.student.id, 'is_present': True})
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.post(url, self.student, {'is_present': True}).status_code, 200)
+        self.assertEqual(self.post(url, self.student, {'is_present': True}).status_code, 429)
+
+    @override_settings(LOAD_SHED_MAX_IN_FLIGHT=2)
+    def test_overloaded_worker_sheds_low_priority_views(self):
+        middleware = LoadSheddingMiddleware(lambda request: HttpResponse())
+        factory = RequestFactory()
+        middleware.in_flight = 2
+
+        response = middleware(factory.post(reverse('verify-facial-data')))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '5')
+        self.assertEqual(middleware(factory.post(reverse('mark-attendance', args=[self.session.id]))).status_code, 200)
+
+        middleware.in_flight = 1
+        self.assertEqual(middleware(factory.post(reverse('verify-facial-data'))).status_code, 200)
+        self.assertEqual(middleware.in_flight, 1)
+
+    def test_shed_and_throttled_responses_get_cors_headers(self):
+        # Browsers drop responses without CORS headers, hiding the 429 and its Retry-After
+        cors = settings.MIDDLEWARE.index('corsheaders.middleware.CorsMiddleware')
+        for name in ('core.metrics.MetricsMiddleware', 'core.profiling.ProfilingMiddleware',
+                     'core.throttling.LoadSheddingMiddleware'):
+            self.assertGreater(settings.MIDDLEWARE.index(name), cors)
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class SyncTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher', password='x', role='teacher')
+        cls.student = User.objects.create_user('student', password='x', role='student')
+        cls.classmate = User.objects.create_user('classmate', password='x', role='student')
+        cls.class_obj = make_class(cls.teacher, [cls.student, cls.classmate])
+        cls.session = AttendanceSession.objects.create(
+            class_obj=cls.class_obj, session_date=timezone.localdate(),
+            start_time=datetime.time(9, 0), end_time=datetime.time(10, 0)
+        )
+        cls.record = AttendanceRecord.objects.create(session=cls.session, student=cls.student, recorded_by=cls.teacher)
+        AttendanceRecord.objects.create(session=cls.session, student=cls.classmate, recorded_by=cls.teacher)
+
+    def sync(self, user, cursor=None):
+        self.client.force_authenticate(user)
+        response = self.client.get(reverse('sync'), {'cursor': cursor} if cursor else {})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_snapshot_then_changes_only(self):
+        snapshot = self.sync(self.student)
+        self.assertEqual([c['id'] for c in snapshot['classes']], [self.class_obj.id])
+        self.assertEqual([s['id'] for s in snapshot['sessions']], [self.session.id])
+        self.assertEqual([r['id'] for r in snapshot['records']], [self.record.id])
+
+        delta = self.sync(self.student, snapshot['cursor'])
+        self.assertEqual((delta['classes'], delta['sessions'], delta['records']), ([], [], []))
+
+        self.record.is_present = True
+        with self.captureOnCommitCallbacks(execute=True):
+            self.record.save()
+        delta = self.sync(self.student, delta['cursor'])
+        self.assertEqual([r['id'] for r in delta['records']], [self.record.id])
+        self.assertTrue(delta['records'][0]['is_present'])
+        self.assertEqual(self.sync(self.student, delta['cursor'])['records'], [])
+
+    def test_students_only_see_their_own_records(self):
+        cursor = self.sync(self.student)['cursor']
+        classmate_record = AttendanceRecord.objects.get(student=self.classmate)
+        classmate_record.is_present = True
+        with self.captureOnCommitCallbacks(execute=True):
+            classmate_record.save()
+
+        self.assertEqual(self.sync(self.student, cursor)['records'], [])
+        teacher_delta = self.sync(self.teacher, make_cursor(0))
+        self.assertIn(classmate_record.id, [r['id'] for r in teacher_delta['records']])
+
+    def test_deletes_are_sent_as_tombstones(self):
+        cursor = self.sync(self.student)['cursor']
+        session_id, class_id = self.session.id, self.class_obj.id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.session.delete()
+
+        delta = self.sync(self.student, cursor)
+        self.assertEqual(delta['deleted']['sessions'], [session_id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.class_obj.delete()
+        for user in (self.student, self.teacher):
+            self.assertEqual(self.sync(user, delta['cursor'])['deleted']['classes'], [class_id])
+
+    def test_joining_and_leaving_a_class(self):
+        newcomer = User.objects.create_user('newcomer', password='x', role='student')
+        cursor = self.sync(newcomer)['cursor']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.class_obj.students.add(newcomer)
+        delta = self.sync(newcomer, cursor)
+        self.assertEqual([c['id'] for c in delta['classes']], [self.class_obj.id])
+        self.assertEqual([s['id'] for s in delta['sessions']], [self.session.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            newcomer.enrolled_classes.remove(self.class_obj)
+        delta = self.sync(newcomer, delta['cursor'])
+        self.assertEqual(delta['classes'], [])
+        self.assertEqual(delta['deleted']['classes'], [self.class_obj.id])
+
+    def test_notifications(self):
+        cursor = self.sync(self.student)['cursor']
+        with self.captureOnCommitCallbacks(execute=True):
+            notify({'class_id': self.class_obj.id}, 'Moved', 'Room 9', 'general')
+
+        delta = self.sync(self.student, cursor)
+        self.assertEqual([n['title'] for n in delta['notifications']], ['Moved'])
+
+    def test_pages_through_changes(self):
+        cursor = self.sync(self.teacher)['cursor']
+        with self.captureOnCommitCallbacks(execute=True):
+            for present in (True, False, True):
+                self.record.is_present = present
+                self.record.save()
+            self.session.save()
+
+        with self.settings(SYNC_PAGE_SIZE=2, SYNC_SETTLE_SECONDS=0):
+            delta = self.sync(self.teacher, cursor)
+            self.assertTrue(delta['has_more'])
+            delta = self.sync(self.teacher, delta['cursor'])
+        self.assertFalse(delta['has_more'])
+        self.assertEqual([s['id'] for s in delta['sessions']], [self.session.id])
+
+    @override_settings(SYNC_SETTLE_SECONDS=60)
+    def test_cursor_stays_behind_unsettled_changes(self):
+        cursor = self.sync(self.student)['cursor']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.record.save()
+
+        delta = self.sync(self.student, cursor)
+        self.assertEqual([r['id'] for r in delta['records']], [self.record.id])
+        self.assertEqual(self.sync(self.student, delta['cursor'])['records'], delta['records'])
+
+    @override_settings(SYNC_SETTLE_SECONDS=60, SYNC_PAGE_SIZE=1)
+    def test_full_page_of_unsettled_changes_does_not_move_the_cursor(self):
+        cursor = make_cursor(ChangeLog.objects.order_by('-id').values_list('id', flat=True).first() or 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.record.save()
+            self.session.save()
+
+        delta = self.sync(self.teacher, cursor)
+        self.assertFalse(delta['has_more'])
+        self.assertEqual([r['id'] for r in delta['records']], [self.record.id])
+        self.assertEqual([r['id'] for r in self.sync(self.teacher, delta['cursor'])['records']], [self.record.id])
+
+    @override_settings(SYNC_PAGE_SIZE=2)
+    def test_snapshot_is_paged(self):
+        pages = [self.sync(self.teacher)]
+        while pages[-1]['has_more']:
+            pages.append(self.sync(self.teacher, pages[-1]['cursor']))
+
+        self.assertEqual(len(pages), 2)  # a class, a session and two records
+        self.assertTrue(all(len(page['classes'] + page['sessions'] + page['records']) <= 2 for page in pages))
+        self.assertEqual(sorted(r['id'] for page in pages for r in page['records']),
+                         sorted(AttendanceRecord.objects.values_list('id', flat=True)))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.record.save()
+        self.assertEqual([r['id'] for r in self.sync(self.teacher, pages[-1]['cursor'])['records']], [self.record.id])
+
+    def test_invalid_and_expired_cursors(self):
+        self.client.force_authenticate(self.student)
+        response = self.client.get(reverse('sync'), {'cursor': 'forged'})
+        self.assertEqual(response.status_code, 400)
+
+        issued = int(time.time()) - 31 * 86400
+        expired = signing.dumps([0, issued], salt=CURSOR_SALT)
+        snapshot = self.sync(self.student, expired)
+        self.assertTrue(snapshot['reset'])
+        self.assertEqual([r['id'] for r in snapshot['records']], [self.record.id])
+
+    def test_change_committed_after_a_newer_one_is_not_skipped(self):
+        cursor = self.sync(self.teacher)['cursor']
+        # A long transaction changes the record, and is still open when a
+        # later change to the session commits
+        with self.captureOnCommitCallbacks() as in_flight:
+            self.record.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.session.save()
+
+        delta = self.sync(self.teacher, cursor)
+        self.assertEqual(([s['id'] for s in delta['sessions']], delta['records']), ([self.session.id], []))
+
+        for commit in in_flight:
+            commit()
+        delta = self.sync(self.teacher, delta['cursor'])
+        self.assertEqual([r['id'] for r in delta['records']], [self.record.id])
+
+    def test_prune_drops_old_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.session.save()
+            self.record.save()
+        old = ChangeLog.objects.update(changed_at=timezone.now() - datetime.timedelta(days=40))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.record.save()
+
+        self.assertEqual(prune_changes(timezone.now() - datetime.timedelta(days=30), chunk_size=2), old)
+        self.assertEqual(ChangeLog.objects.count(), 1)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'SQLite only')
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', password='x', role='admin')
+        cls.teacher = User.objects.create_user('teacher', password='x', role='teacher')
+        cls.students = [User.objects.create_user(f"student{i}", password='x', role='student') for i in range(4)]
+        cls.class_obj = make_class(cls.teacher, cls.students)
+        cls.other_class = make_class(cls.teacher, cls.students, course_id='CS102', course_name='Databases')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.days = 0
+
+    def add_rows(self, class_obj):
+        self.days += 1
+        session = AttendanceSession.objects.create(
+            class_obj=class_obj, session_date=datetime.date(2026, 1, self.days),
+            start_time=datetime.time(9, 0), end_time=datetime.time(10, 0)
+        )
+        QRCode.objects.create(session=session, code=f"code-{session.id}", expires_at=timezone.now())
+        for student in self.students:
+            AttendanceRecord.objects.create(session=session, student=student, method='manual')
+            LocationVerification.objects.create(user=student, class_obj=class_obj, latitude=12.97, longitude=77.59)
+            Notification.objects.create(user=student, title='Hi', message='Hello', notification_type='system')
+
+    def changelist(self, model, **params):
+        url = reverse(f"admin:{model._meta.app_label}_{model._meta.model_name}_changelist")
+        return self.client.get(url, params)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.add_rows(self.class_obj)
+        for model in [AttendanceSession, AttendanceRecord, QRCode, LocationVerification, Notification, Class]:
+            with self.subTest(model=model.__name__):
+                with CaptureQueriesContext(connection) as few:
+                    self.assertEqual(self.changelist(model).status_code, 200)
+                self.add_rows(self.other_class)
+                with CaptureQueriesContext(connection) as many:
+                    self.changelist(model)
+                self.assertEqual(len(many), len(few), '\n'.join(query['sql'] for query in many))
+
+    def test_filters_on_a_class_through_an_autocomplete_box(self):
+        self.add_rows(self.class_obj)
+        self.add_rows(self.other_class)
+
+        response = self.changelist(AttendanceRecord, session__class_obj__id=self.class_obj.id)
+
+        self.assertEqual(response.context['cl'].result_count, len(self.students))
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertContains(response, 'Algorithms')
+
+    def test_unfiltered_count_comes_from_statistics_for_big_tables(self):
+        self.add_rows(self.class_obj)
+        with mock.patch('core.changelists.estimated_count', return_value=5_000_000):
+            unfiltered = self.changelist(AttendanceRecord)
+            filtered = self.changelist(AttendanceRecord, is_present__exact='0')
+
+        self.assertEqual(unfiltered.context['cl'].result_count, 5_000_000)
+        self.assertEqual(filtered.context['cl'].result_count, len(self.students))
+        self.assertIsNone(filtered.context['cl'].full_result_count)
+
+    def test_notification_actions_update_and_recount(self):
+        self.add_rows(self.class_obj)
+        self.assertEqual(unread_count(self.students[0].id), 1)
+        ids = list(Notification.objects.values_list('id', flat=True))
+        url = reverse('admin:core_notification_changelist')
+
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            self.client.post(url, {'action': 'mark_read', '_selected_action': ids})
+
+        self.assertFalse(Notification.objects.filter(is_read=False).exists())
+        self.assertEqual(unread_count(self.students[0].id), 0)
+        self.assertEqual(ChangeLog.objects.filter(kind='notification', object_id__in=ids).count(), len(ids))
+        self.assertFalse([query for query in queries if 'UPDATE "core_notification" ' in query['sql'] and '"id" = ' in query['sql']])
+
+
+class DashboardTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='x', role='admin')
+        cls.teacher = User.objects.create_user('teacher', password='x', role='teacher')
+        cls.student = User.objects.create_user('student', password='x', role='student')
+        cls.class_obj = make_class(cls.teacher, [cls.student])
+        cls.session = AttendanceSession.objects.create(
+            class_obj=cls.class_obj, session_date=timezone.localdate(),
+            start_time=datetime.time(9, 0), end_time=datetime.time(10, 0)
+        )
+        AttendanceRecord.objects.create(session=cls.session, student=cls.student, method='qr', is_present=True)
+        Notification.objects.create(user=cls.student, title='Hi', message='Hello', notification_type='system')
+
+    def get(self, user, **params):
+        self.client.force_authenticate(user)
+        return self.client.get(reverse('dashboard'), params)
+
+    def test_student_dashboard_matches_the_separate_endpoints(self):
+        response = self.get(self.student)
+
+        self.assertEqual(set(response.data), {'profile', 'classes', 'sessions', 'notifications', 'attendance'})
+        self.assertEqual(response.data['profile'], self.client.get(reverse('user-profile')).data)
+        self.assertEqual(response.data['classes'], self.client.get(reverse('get-classes')).data)
+        self.assertEqual(response.data['sessions'], self.client.get(reverse('get-sessions')).data)
+        self.assertEqual(response.data['notifications']['unread_count'], 1)
+        self.assertEqual(response.data['attendance'], [{
+            'class_id': self.class_obj.id, 'class_name': 'Algorithms', 'total_classes': 1,
+            'present_classes': 1, 'absent_classes': 0, 'attendance_percentage': 100.0,
+        }])
+
+    def test_queries_do_not_grow_with_classes(self):
+        self.get(self.student)
+        with CaptureQueriesContext(connection) as few:
+            self.get(self.student)
+        for index in range(3):
+            class_obj = make_class(self.teacher, [self.student], course_id=f"CS2{index}")
+            session = AttendanceSession.objects.create(
+                class_obj=class_obj, session_date=timezone.localdate(),
+                start_time=datetime.time(9, 0), end_time=datetime.time(10, 0)
+            )
+            AttendanceRecord.objects.create(session=session, student=self.student, method='manual')
+        with CaptureQueriesContext(connection) as many:
+            response = self.get(self.student)
+
+        self.assertEqual(len(response.data['classes']), 4)
+        self.assertEqual(len(many), len(few))
+
+    def test_sections_are_per_role_and_selectable(self):
+        response = self.get(self.admin)
+        self.assertEqual(set(response.data), {'profile', 'overview', 'sessions', 'notifications'})
+        self.assertEqual(response.data['overview'], {'students': 1, 'teachers': 1, 'classes': 1, 'open_sessions': 1})
+
+        response = self.get(self.teacher, sections='sessions, profile')
+        self.assertEqual(set(response.data), {'sessions', 'profile'})
+
+        response = self.get(self.teacher, sections='attendance')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error': 'Unknown section: attendance'})
+
+
+class WriterTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('student', password='x', role='student')
+        self.writer = Writer()
+
+    def notify(self, title):
+        return Notification.objects.create(user=self.user, title=title, message='', notification_type='system')
+
+    def test_batches_queued_writes_into_one_transaction(self):
+        release = threading.Event()
+        blocker = self.writer.submit(release.wait)
+        futures = [self.writer.submit(self.notify, str(i)) for i in range(20)]
+        release.set()
+
+        titles = [future.result(timeout=5).title for future in futures]
+
+        self.assertTrue(blocker.result(timeout=5))
+        self.assertEqual(titles, [str(i) for i in range(20)])
+        self.assertEqual(Notification.objects.count(), 20)
+        self.assertLessEqual(self.writer.batches, 3)
+
+    def test_failed_write_leaves_the_rest_of_the_batch(self):
+        def fail():
+            self.notify('lost')
+            raise ValueError('boom')
+
+        release = threading.Event()
+        self.writer.submit(release.wait)
+        failed = self.writer.submit(fail)
+        kept = self.writer.submit(self.notify, 'kept')
+        release.set()
+
+        with self.assertRaisesMessage(ValueError, 'boom'):
+            failed.result(timeout=5)
+        kept.result(timeout=5)
+        self.assertEqual(list(Notification.objects.values_list('title', flat=True)), ['kept'])
+
+    @override_settings(SQLITE_WRITER=True)
+    def test_writes_inside_a_transaction_run_inline(self):
+        with transaction.atomic():
+            self.assertIs(write(threading.current_thread), threading.current_thread())
+
+    def test_connections_are_tuned(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+
+class QueryPlanTests(TestCase):
+    """
+    Hot queries must be answered from an index. A failure here means an
+    index was dropped or a query changed shape so it no longer uses one.
+    """
+    def hot_queries(self):
+        now = timezone.now()
+        return {
+            'session by class and date': AttendanceSession.objects.filter(class_obj_id=1, session_date=now.date()),
+            'open sessions to close': expired_sessions(now),
+            'student attendance history': AttendanceRecord.objects.filter(student_id=1, is_present=True),
+            'session roster': AttendanceRecord.objects.filter(session_id=1),
+            'notification page': Notification.objects.filter(user_id=1).order_by('-created_at')[:50],
+            'unread notifications': Notification.objects.filter(user_id=1, is_read=False),
+            'users by role': User.objects.filter(role='student'),
+            'enrolled classes': Class.objects.filter(students=1),
+            'active QR code': QRCode.objects.filter(code='abc', is_active=True),
+            'expired QR codes': QRCode.objects.filter(is_active=True, expires_at__lte=now),
+            'due jobs': Job.objects.filter(status='queued', run_at__lte=now).order_by('-priority', 'run_at', 'id'),
+            'scope versions': EntityVersion.objects.filter(scope__in=['classes', 'class:1']),
+            'class changes': ChangeLog.objects.filter(class_id=1, id__gt=100),
+            'user changes': ChangeLog.objects.filter(user_id=1, id__gt=100),
+            'changes to prune': ChangeLog.objects.filter(changed_at__lt=now),
+        }
+
+    def test_hot_queries_use_indexes(self):
+        for name, queryset in self.hot_queries().items():
+            with self.subTest(name):
+                self.assertEqual(full_scans(queryset), [])
+
+    def test_full_scan_is_detected(self):
+        self.assertEqual(full_scans(User.objects.filter(is_staff=True)), ['accounts_user'])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class QueryBudgetTests(APITestCase):
+    """
+    Every URL is requested once against a seeded campus and must stay within
+    the ``@query_budget`` declared on its view. Budgets don't depend on data
+    size, so a view that starts querying per row fails here.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.campus = seed_campus()
+
+    def test_every_endpoint_has_a_budget(self):
+        patterns = [pattern for pattern in get_resolver().url_patterns if str(pattern.pattern).startswith('api/')]
+        self.assertEqual({pattern.name for pattern in patterns}, set(endpoint_requests(self.campus)))
+        for pattern in patterns:
+            with self.subTest(pattern.name):
+                self.assertTrue(hasattr(pattern.callback, 'query_budget'))
+
+    def test_endpoints_stay_within_budget(self):
+        for name, (method, user, kwargs, body) in endpoint_requests(self.campus).items():
+            url = reverse(name, kwargs=kwargs)
+            budget = resolve(url).func.query_budget
+            cache.clear()
+            with self.subTest(name), transaction.atomic():
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = send(self.client, self.async_client, method, user, url, body)
+                    elapsed = (time.perf_counter() - started) * 1000
+                transaction.set_rollback(True)
+
+                if name in EXPECTED_STATUS:
+                    self.assertEqual(response.status_code, EXPECTED_STATUS[name])
+                else:
+                    self.assertLess(response.status_code, 300, getattr(response, 'content', b'')[:300])
+                executed = [q['sql'] for q in queries if 'SAVEPOINT' not in q['sql']]
+                self.assertLessEqual(len(executed), budget.queries, '\n'.join(executed))
+                self.assertLessEqual(elapsed, budget.ms)
@@ -0,0 +1,244 @@
+"""
+Rate limiting and load shedding.
+
+Throttles are token buckets kept in the ``throttle`` cache, which workers
+must share (see ``CACHES``). A bucket holds up to N tokens for a rate of
+``N/period`` and refills continuously, so a client may burst N requests
+and then continue at the steady rate. Every request takes a token from
+each bucket that applies to it:
+
+    user          per user: ``user`` for students, ``staff`` for teachers
+                  and admins, ``anon`` per client address
+    session       per student and attendance session, on views with a
+                  ``session_id``
+    <scope>       per user and endpoint class, on views marked with
+                  ``@throttle_scope``; per client address and submitted
+                  value of the scope's ``field`` if it has one (login)
+
+Anonymous clients are told apart by address. Behind a proxy that is the
+entry ``NUM_PROXIES`` from the end of ``X-Forwarded-For``, the one our
+own proxy added, so a client can't pick its bucket by sending the header.
+
+Rates are ``DEFAULT_THROTTLE_RATES`` in ``REST_FRAMEWORK``. An empty bucket
+means a 429 with ``Retry-After`` set to when the next token arrives. The
+read-modify-write of a bucket isn't atomic, so concurrent requests of one
+client may get slightly more than their rate.
+
+``LoadSheddingMiddleware`` counts the requests each worker is handling.
+Once ``LOAD_SHED_MAX_IN_FLIGHT`` are in flight, new requests to views
+marked ``@low_priority`` are refused with a 429 so the rest, teacher
+roll-taking in particular, keep their share of the worker.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+STAFF_ROLES = ('teacher', 'admin')
+
+
+def throttle_scope(scope, field=None):
+    """
+    Put a view in the endpoint class ``scope``, with a bucket per value of
+    the request's ``field`` as well if given. Place it above ``@api_view``
+    (or ``@async_api_view``).
+    """
+    def decorator(view):
+        view.throttle_scope = scope
+        view.throttle_field = field
+        return view
+    return decorator
+
+
+def low_priority(view):
+    """
+    Let ``LoadSheddingMiddleware`` refuse ``view`` first under load. Place it
+    above ``@api_view`` (or ``@async_api_view``).
+    """
+    view.low_priority = True
+    return view
+
+
+def parse_rate(rate):
+    """
+    ``'30/min'`` -> ``(30, 0.5)``: bucket size and tokens per second.
+    """
+    count, period = rate.split('/')
+    seconds = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+    return int(count), int(count) / seconds
+
+
+def take(key, rate):
+    """
+    Take a token from the bucket at ``key``. Returns 0 if there was one,
+    otherwise the seconds until there will be.
+    """
+    capacity, refill = parse_rate(rate)
+    bucket_cache = caches['throttle']
+    now = time.time()
+    tokens, updated = bucket_cache.get(key) or (capacity, now)
+    tokens = min(capacity, tokens + (now - updated) * refill)
+    if tokens < 1:
+        return (1 - tokens) / refill
+    # A bucket left alone long enough to refill needn't be kept
+    bucket_cache.set(key, (tokens - 1, now), timeout=math.ceil(capacity / refill))
+    return 0
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    A throttle that takes a token from the bucket ``get_bucket`` names.
+    """
+    def __init__(self):
+        self.delay = None
+
+    def get_bucket(self, request, view):
+        """
+        ``(scope, ident)`` of the bucket for the request, or ``None`` if this
+        throttle doesn't apply to it.
+        """
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        bucket = self.get_bucket(request, view)
+        if bucket is None:
+            return True
+        scope, ident = bucket
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return True
+        self.delay = take(f"throttle:{scope}:{ident}", rate)
+        return not self.delay
+
+    def wait(self):
+        return self.delay
+
+
+def user_ident(request):
+    user = getattr(request, 'user', None)
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+class UserThrottle(TokenBucketThrottle):
+    def get_bucket(self, request, view):
+        user_id = user_ident(request)
+        if user_id is None:
+            return 'anon', self.get_ident(request)
+        return ('staff' if request.user.role in STAFF_ROLES else 'user'), user_id
+
+
+class SessionThrottle(TokenBucketThrottle):
+    def get_bucket(self, request, view):
+        match = request.resolver_match
+        session_id = match.kwargs.get('session_id') if match else None
+        user_id = user_ident(request)
+        if session_id is None or user_id is None or request.user.role in STAFF_ROLES:
+            return None
+        return 'session', f"{session_id}:{user_id}"
+
+
+class EndpointThrottle(TokenBucketThrottle):
+    def get_bucket(self, request, view):
+        match = request.resolver_match
+        scope = getattr(match.func, 'throttle_scope', None) if match else None
+        if scope is None:
+            return None
+        user_id = user_ident(request)
+        ident = user_id if user_id is not None else self.get_ident(request)
+        field = getattr(match.func, 'throttle_field', None)
+        if field is None:
+            return scope, ident
+        data = getattr(request, 'data', None)
+        value = data.get(field) if hasattr(data, 'get') else None
+        # Hashed: the value is user input and shouldn't sit in cache keys as is
+        digest = hashlib.sha256(str(value or '').strip().lower().encode()).hexdigest()[:32]
+        return scope, f"{ident}:{digest}"
+
+
+def throttle_delay(request):
+    """
+    For views outside DRF: seconds to wait if a default throttle refuses
+    the request, else 0.
+    """
+    delays = []
+    for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+        throttle = throttle_class()
+        if not throttle.allow_request(request, None):
+            delays.append(throttle.wait())
+    return max(delays, default=0)
+
+
+def retry_response(message, delay):
+    response = JsonResponse({'detail': message}, status=429)
+    response['Retry-After'] = str(math.ceil(delay))
+    return response
+
+
+def throttled(delay):
+    return retry_response(f"Request was throttled. Expected available in {math.ceil(delay)} seconds.", delay)
+
+
+class LoadSheddingMiddleware:
+    """
+    Refuse ``@low_priority`` views while the worker is overloaded; see the
+    module docstring.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if self.should_shed(request):
+            return shed()
+        self.enter()
+        try:
+            return self.get_response(request)
+        finally:
+            self.leave()
+
+    async def __acall__(self, request):
+        if self.should_shed(request):
+            return shed()
+        self.enter()
+        try:
+            return await self.get_response(request)
+        finally:
+            self.leave()
+
+    def enter(self):
+        with self.lock:
+            self.in_flight += 1
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def should_shed(self, request):
+        # Views are only looked up once the worker is overloaded
+        if self.in_flight < settings.LOAD_SHED_MAX_IN_FLIGHT:
+            return False
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        return getattr(match.func, 'low_priority', False)
+
+
+def shed():
+    return retry_response('Server is busy, retry later.', settings.LOAD_SHED_RETRY_AFTER)
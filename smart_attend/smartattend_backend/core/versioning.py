@@ -0,0 +1,127 @@
+"""
+Version stamps and conditional GET support.
+
+Writes bump the version of the scopes they touch (see ``core.signals``):
+
+    user:<id>             a user's profile
+    class:<id>            a class, its schedules and its roster
+    classes               any class created, edited or deleted
+    enrollment:user:<id>  the set of classes a student is enrolled in
+    sessions:class:<id>   the sessions of a class and their records
+
+Read views declare which scopes their response depends on with
+``@conditional``. The ETag is derived from those versions, so a matching
+``If-None-Match`` gets a 304 before the view builds its response.
+
+Versions are counters incremented by the database, so they only move
+forward whatever the clocks of the hosts writing them say.
+"""
+import hashlib
+from functools import wraps
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from . import response_cache
+from .models import EntityVersion
+
+
+def bump(*scopes):
+    """
+    Increment the version of every scope, starting missing ones at 1, in a
+    single upsert.
+    """
+    scopes = sorted(set(scopes))  # a fixed lock order for concurrent bumps
+    if not scopes:
+        return
+    connection = connections[router.db_for_write(EntityVersion)]
+    table = connection.ops.quote_name(EntityVersion._meta.db_table)
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (scope, version, updated_at) VALUES {', '.join(['(%s, 1, %s)'] * len(scopes))} "
+            f"ON CONFLICT (scope) DO UPDATE SET version = {table}.version + 1, updated_at = EXCLUDED.updated_at",
+            [param for scope in scopes for param in (scope, now)]
+        )
+
+
+def bump_on_commit(*scopes):
+    """
+    Bump ``scopes`` once the current transaction commits. Attendance record
+    writes use this: every check-in of a class bumps the same row, which
+    would otherwise stay locked until the check-in's transaction ends and
+    serialize the rest of a scan storm behind it.
+    """
+    transaction.on_commit(lambda: bump(*scopes), using=router.db_for_write(EntityVersion))
+
+
+def get_versions(scopes):
+    return {
+        scope: (version, updated_at)
+        for scope, version, updated_at in EntityVersion.objects.filter(
+            scope__in=set(scopes)
+        ).values_list('scope', 'version', 'updated_at')
+    }
+
+
+def fingerprint(request, scopes):
+    """
+    Return ``(etag, last_modified)`` for the response to ``request`` given
+    the scopes it depends on. Scopes that were never written count as
+    version 0.
+    """
+    versions = get_versions(scopes)
+    parts = [str(request.user.pk), request.get_full_path()]
+    # With the time of the bump, so versions counted again from 1 after the
+    # database is reset don't match ETags or cached bodies from before
+    for scope in sorted(set(scopes)):
+        version, updated_at = versions.get(scope, (0, None))
+        parts.append(f"{scope}={version}@{updated_at}")
+    etag = '"%s"' % hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+    timestamps = [updated_at for version, updated_at in versions.values()]
+    last_modified = int(max(timestamps).timestamp()) if timestamps else None
+    return etag, last_modified
+
+
+def conditional(scopes_func, cache=False):
+    """
+    ETag/Last-Modified support for DRF function views. Place it below
+    ``@api_view``/``@permission_classes`` so the user is authenticated.
+
+    ``scopes_func(request, *args, **kwargs)`` returns the scopes the
+    response depends on, or ``None`` to serve the request unconditionally.
+    With ``cache=True`` rendered responses are also kept in the per-user
+    response cache (see ``core.response_cache``).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            scopes = scopes_func(request, *args, **kwargs)
+            if scopes is None:
+                return view(request, *args, **kwargs)
+
+            etag, last_modified = fingerprint(request, scopes)
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                if cache:
+                    key = response_cache.cache_key(request, view.__name__)
+                    response, etag = response_cache.serve(request, key, etag, last_modified, view, args, kwargs)
+                else:
+                    response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            set_validators(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ('Authorization',))
@@ -2,17 +2,33 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from django.http import HttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.conf import settings
 from .models import LocationVerification, FacialRecognitionData, AttendanceAnalytics, Notification
 from .serializers import (
     LocationVerificationSerializer, FacialRecognitionDataSerializer, 
     AttendanceAnalyticsSerializer, NotificationSerializer
 )
 from classes.models import Class
+from . import metrics
+from .budgets import query_budget
+from .throttling import low_priority, throttle_scope
+from .idempotency import idempotent
+from .replicas import replica_reads
+from .jobs import enqueue
+from .writer import write
+from .notifications import unread_count, mark_read
+from . import sync as delta_sync
+from . import dashboard as dashboards
 import json
 import math
 
 
+@query_budget(4)
+@low_priority
+@throttle_scope('verification')
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def verify_location(request):
@@ -46,7 +62,8 @@ def verify_location(request):
     is_verified = distance <= 100
     
     # Create location verification record
-    verification = LocationVerification.objects.create(
+    verification = write(
+        LocationVerification.objects.create,
         user=request.user,
         class_obj=class_obj,
         latitude=latitude,
@@ -77,8 +94,10 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     return c * r * 1000  # Return distance in meters
 
 
+@query_budget(4)
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def save_facial_data(request):
     """
     Save facial recognition data for a user
@@ -100,6 +119,9 @@ def save_facial_data(request):
     return Response(serializer.data)
 
 
+@query_budget(4)
+@low_priority
+@throttle_scope('verification')
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def verify_facial_data(request):
@@ -163,17 +185,52 @@ def compare_facial_encodings(encoding1, encoding2):
     return similarity
 
 
+@query_budget(2)
+@low_priority
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_notifications(request):
     """
-    Get user notifications
+    Get user notifications, newest first.
+
+    ``since`` (ISO 8601) only returns notifications created or re-surfaced
+    after that moment, oldest first, for incremental fetches: pass the last
+    one's ``created_at`` as the next ``since`` until a page comes back
+    short. ``limit`` caps the page size.
     """
     notifications = Notification.objects.filter(user=request.user).order_by('-created_at')
-    serializer = NotificationSerializer(notifications, many=True)
+    
+    since = request.query_params.get('since')
+    if since:
+        since = parse_datetime(since)
+        if since is None:
+            return Response({'error': 'Invalid since timestamp'}, status=status.HTTP_400_BAD_REQUEST)
+        # Oldest first, so a burst longer than a page isn't cut off
+        notifications = notifications.filter(created_at__gt=since).order_by('created_at')
+    
+    try:
+        limit = min(int(request.query_params.get('limit', settings.NOTIFICATION_PAGE_SIZE)),
+                    settings.NOTIFICATION_MAX_PAGE_SIZE)
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        return Response({'error': 'Invalid limit'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    serializer = NotificationSerializer(notifications.select_related('user')[:limit], many=True)
     return Response(serializer.data)
 
 
+@query_budget(5)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_unread_count(request):
+    """
+    Get the number of unread notifications for the app badge
+    """
+    return Response({'unread_count': unread_count(request.user.id)})
+
+
+@query_budget(3)
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def mark_notification_read(request, notification_id):
@@ -185,15 +242,43 @@ def mark_notification_read(request, notification_id):
     except Notification.DoesNotExist:
         return Response({'error': 'Notification not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    notification.is_read = True
-    notification.save()
+    if not notification.is_read:
+        mark_read(request.user.id, ids=[notification.id])
+        notification.is_read = True
     
     serializer = NotificationSerializer(notification)
     return Response(serializer.data)
 
 
+@query_budget(9)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def mark_notifications_read(request):
+    """
+    Mark several notifications as read, selected by an ``ids`` list and/or
+    everything created at or before ``before``
+    """
+    ids = request.data.get('ids')
+    before = request.data.get('before')
+    
+    if ids is None and before is None:
+        return Response({'error': 'Provide ids or before'}, status=status.HTTP_400_BAD_REQUEST)
+    if ids is not None and not (isinstance(ids, list) and all(isinstance(i, int) for i in ids)):
+        return Response({'error': 'ids must be a list of integers'}, status=status.HTTP_400_BAD_REQUEST)
+    if before is not None:
+        before = parse_datetime(before) if isinstance(before, str) else None
+        if before is None:
+            return Response({'error': 'Invalid before timestamp'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    updated = mark_read(request.user.id, ids=ids, before=before)
+    return Response({'updated': updated, 'unread_count': unread_count(request.user.id)})
+
+
+@query_budget(5)
+@low_priority
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@replica_reads
 def get_analytics(request, class_id):
     """
     Get attendance analytics for a class
@@ -216,11 +301,14 @@ def get_analytics(request, class_id):
     return Response(serializer.data)
 
 
+@query_budget(5)
+@low_priority
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def update_analytics(request, class_id):
     """
-    Update attendance analytics for a class
+    Queue a recomputation of a class' attendance analytics. Returns the
+    current figures immediately with 202 Accepted.
     """
     if request.user.role != 'teacher':
         return Response({'error': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
@@ -233,9 +321,54 @@ def update_analytics(request, class_id):
     # Get or create analytics record
     analytics, created = AttendanceAnalytics.objects.get_or_create(class_obj=class_obj)
     
-    # Update analytics (this would typically be done automatically)
-    # For now, we'll just update the last_updated field
-    analytics.save()
+    enqueue('analytics.refresh', {'class_id': class_obj.id}, dedupe_key=f"analytics.refresh:{class_obj.id}")
     
     serializer = AttendanceAnalyticsSerializer(analytics)
-    return Response(serializer.data)
\ No newline at end of file
+    return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+
+@query_budget(2)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_metrics(request):
+    """
+    Request metrics of every worker in Prometheus text format (admin only)
+    """
+    if request.user.role != 'admin':
+        return Response({'error': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
+    
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@query_budget(8)
+@low_priority
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync(request):
+    """
+    Classes, sessions, records and notifications for the mobile client: a
+    snapshot without ``cursor``, only what changed since it with one (see
+    ``core.sync``)
+    """
+    try:
+        return Response(delta_sync.sync(request.user, request.query_params.get('cursor')))
+    except delta_sync.InvalidCursor:
+        return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+
+
+@query_budget(11)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@replica_reads
+def dashboard(request):
+    """
+    The home screen in one request: the sections of the user's role, or
+    those listed in ``sections`` (see ``core.dashboard``)
+    """
+    sections = request.query_params.get('sections')
+    if sections is not None:
+        sections = [name.strip() for name in sections.split(',') if name.strip()]
+    try:
+        return Response(dashboards.dashboard(request.user, sections))
+    except dashboards.UnknownSection as e:
+        return Response({'error': f"Unknown section: {e}"}, status=status.HTTP_400_BAD_REQUEST)
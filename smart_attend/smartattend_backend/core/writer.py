@@ -0,0 +1,117 @@
+"""
+Serialized writes for SQLite.
+
+SQLite lets one connection write at a time, and request threads that all
+write directly spend their time waiting on each other's locks. With
+``SQLITE_WRITER`` on, check-in writes are handed to a single writer thread
+per process instead. It takes everything queued and applies it in one
+transaction, each write in its own savepoint so a failing write doesn't
+undo the others, and commits once for the whole batch. Reads stay on the
+request threads and, under WAL, run while the writer commits.
+
+``write`` blocks until the write is committed and returns its result or
+raises its exception; ``awrite`` is its async counterpart. Writes made
+inside a transaction, or with the writer off, run inline.
+"""
+import asyncio
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+
+class Writer:
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.batches = 0
+
+    def reset(self):
+        # A forked child doesn't inherit the writer thread
+        self.__init__()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='sqlite-writer', daemon=True)
+                self.thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        self.start()
+        self.queue.put((fn, args, kwargs, future))
+        return future
+
+    def next_batch(self):
+        batch = [self.queue.get()]
+        while len(batch) < settings.SQLITE_WRITER_BATCH_SIZE:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while True:
+            batch = self.next_batch()
+            close_old_connections()
+            try:
+                with transaction.atomic():
+                    outcomes = [self.apply(fn, args, kwargs) for fn, args, kwargs, future in batch]
+            except Exception as e:
+                # The transaction couldn't start or commit
+                for *_, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            for (*_, future), (ok, value) in zip(batch, outcomes):
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    def apply(self, fn, args, kwargs):
+        try:
+            with transaction.atomic():
+                return True, fn(*args, **kwargs)
+        except Exception as e:
+            return False, e
+
+
+writer = Writer()
+os.register_at_fork(after_in_child=writer.reset)
+
+
+def use_writer():
+    return (
+        settings.SQLITE_WRITER and connection.vendor == 'sqlite'
+        and not connection.in_atomic_block
+        and threading.current_thread() is not writer.thread
+    )
+
+
+def write(fn, *args, **kwargs):
+    """
+    Run ``fn(*args, **kwargs)`` on the writer thread and return its result
+    once committed.
+    """
+    if not use_writer():
+        return fn(*args, **kwargs)
+    return writer.submit(fn, *args, **kwargs).result(timeout=settings.SQLITE_WRITER_TIMEOUT)
+
+
+async def awrite(fn, *args, **kwargs):
+    """
+    Async ``write``.
+    """
+    # Whether the ORM's connection is in a transaction is only known on the
+    # thread the async ORM runs queries in
+    if not await sync_to_async(use_writer)():
+        return await sync_to_async(fn)(*args, **kwargs)
+    future = asyncio.wrap_future(writer.submit(fn, *args, **kwargs))
+    return await asyncio.wait_for(future, settings.SQLITE_WRITER_TIMEOUT)
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 from decouple import config
 
@@ -50,6 +51,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'core.metrics.MetricsMiddleware',
+    'core.profiling.ProfilingMiddleware',
+    'core.throttling.LoadSheddingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,6 +61,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.replicas.ReplicaPinMiddleware',
 ]
 
 ROOT_URLCONF = 'smartattend.urls'
@@ -83,16 +88,30 @@ WSGI_APPLICATION = 'smartattend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite by default in development and PostgreSQL in production. Set
+# DB_ENGINE=sqlite to run a small deployment on SQLite alone; its connections
+# use WAL so reads don't wait for writes, and check-in writes go through one
+# writer thread per process (see core.writer).
+DB_ENGINE = config('DB_ENGINE', default='sqlite' if DEBUG else 'postgresql')
+
+if DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config('SQLITE_PATH', default=str(BASE_DIR / 'db.sqlite3')),
+            'OPTIONS': {
+                'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; PRAGMA cache_size=-20000',
+                # Take the write lock when a transaction starts, so it waits
+                # for the busy timeout instead of failing on its first write
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': config('SQLITE_BUSY_TIMEOUT', default=20, cast=int),  # seconds
+            },
+        }
     }
-}
 
 # For production, you can override with environment variables
 # Example for PostgreSQL:
-if not DEBUG:
+else:
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.postgresql',
@@ -104,6 +123,32 @@ if not DEBUG:
         }
     }
 
+# Optional read replica for analytical views (see core.replicas). Set
+# DB_REPLICA_HOST for a PostgreSQL replica, or DB_REPLICA_NAME to a second
+# SQLite file in development. Tests read the default database instead.
+if config('DB_REPLICA_HOST', default=''):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': config('DB_REPLICA_HOST'),
+        'PORT': config('DB_REPLICA_PORT', default=DATABASES['default'].get('PORT', '')),
+        'TEST': {'MIRROR': 'default'},
+    }
+elif config('DB_REPLICA_NAME', default=''):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': config('DB_REPLICA_NAME'),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+REPLICA_PIN_SECONDS = 10  # seconds a user's reads stay on default after they write
+
+# SQLite writer thread (core.writer)
+SQLITE_WRITER = config('SQLITE_WRITER', default=DB_ENGINE == 'sqlite', cast=bool)
+SQLITE_WRITER_BATCH_SIZE = 200  # writes committed in one transaction at most
+SQLITE_WRITER_TIMEOUT = 30  # seconds a request waits for its write
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -150,6 +195,26 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache
+# Set CACHE_BACKEND=django.core.cache.backends.redis.RedisCache and
+# CACHE_LOCATION=redis://redis:6379/1 to share the cache between workers.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='smartattend'),
+    },
+    # Rate limit buckets (core.throttling)
+    'throttle': {
+        'BACKEND': config('THROTTLE_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('THROTTLE_CACHE_LOCATION', default='smartattend-throttle'),
+    },
+}
+
+RESPONSE_CACHE_TIMEOUT = 300  # seconds a rendered listing is kept
+RESPONSE_CACHE_STALE_TTL = 10  # seconds a stale listing may be served while it is rebuilt
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60  # seconds a response is replayed for retries with its Idempotency-Key
+IDEMPOTENCY_LOCK_TIMEOUT = 60  # seconds retries wait out a first request before running again
+
 # Custom User Model
 AUTH_USER_MODEL = 'accounts.User'
 
@@ -164,8 +229,33 @@ REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
     ],
+    # Token buckets per user, per student and session, and per endpoint
+    # class (see core.throttling)
+    'DEFAULT_THROTTLE_CLASSES': [
+        'core.throttling.UserThrottle',
+        'core.throttling.SessionThrottle',
+        'core.throttling.EndpointThrottle',
+    ],
+    # Proxies in front of the app, each appending to X-Forwarded-For: nginx
+    # in production (nginx/nginx.conf). Anonymous clients are throttled by
+    # the address the last of them saw; set 0 when serving directly.
+    'NUM_PROXIES': config('NUM_PROXIES', default=1, cast=int),
+    'DEFAULT_THROTTLE_RATES': {
+        'anon': '60/min',
+        'login': '5/min',
+        'user': '300/min',
+        'staff': '1200/min',
+        'session': '60/min',
+        'checkin': '30/min',
+        'verification': '20/min',
+    },
 }
 
+# Load shedding: requests a worker handles at once before it refuses
+# @low_priority views
+LOAD_SHED_MAX_IN_FLIGHT = config('LOAD_SHED_MAX_IN_FLIGHT', default=64, cast=int)
+LOAD_SHED_RETRY_AFTER = 5  # seconds
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -174,4 +264,71 @@ CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:5000",
 ]
 
-CORS_ALLOW_ALL_ORIGINS = True
\ No newline at end of file
+CORS_ALLOW_ALL_ORIGINS = True
+
+# Notifications
+NOTIFICATION_FANOUT_PRIORITY = 5
+NOTIFICATION_FANOUT_CHUNK_SIZE = 500
+NOTIFICATION_DEDUPE_WINDOW = 15 * 60  # seconds
+NOTIFICATION_PAGE_SIZE = 50
+NOTIFICATION_MAX_PAGE_SIZE = 200
+NOTIFICATION_MARK_READ_CHUNK_SIZE = 1000  # notifications marked read per UPDATE
+LOW_ATTENDANCE_THRESHOLD = 75  # percent
+
+# Live attendance updates. attendance.live.PostgresBackend needs a cache
+# shared between workers (see CACHE_BACKEND) to know which sessions are watched.
+LIVE_SESSION_BACKEND = config('LIVE_SESSION_BACKEND', default='attendance.live.LocalBackend')
+LIVE_SESSION_HEARTBEAT = 15  # seconds between keep-alive comments on idle streams
+
+# Background jobs (python manage.py run_jobs)
+JOBS_ALWAYS_EAGER = config('JOBS_ALWAYS_EAGER', default=False, cast=bool)
+JOBS_MAX_ATTEMPTS = 5
+JOBS_BACKOFF_BASE = 10  # seconds before the first retry, doubled on each attempt
+JOBS_BACKOFF_MAX = 3600  # seconds
+JOBS_LOCK_TIMEOUT = 15 * 60  # seconds before a running job is presumed abandoned
+JOBS_HEARTBEAT_INTERVAL = 60  # seconds between lock refreshes of a running job
+
+# Scheduled sessions
+SESSION_MATERIALIZE_DAYS = 7  # days ahead to create sessions from class schedules
+SESSION_MATERIALIZE_INTERVAL = 60 * 60  # seconds
+SESSION_OPEN_INTERVAL = 60  # seconds between sweeps opening scheduled sessions
+SESSION_CLOSE_INTERVAL = 60  # seconds between sweeps closing ended sessions
+ROLLUP_REBUILD_CHUNK_SIZE = 500  # sessions per refresh in rebuild_rollups
+
+# QR code housekeeping
+QR_SWEEP_INTERVAL = 5 * 60  # seconds between sweeps
+QR_RETENTION_DAYS = 7  # inactive codes older than this are deleted
+QR_PURGE_CHUNK_SIZE = 1000
+
+# Offline check-ins (POST /api/attendance/offline/)
+OFFLINE_CHECKIN_MAX_BATCH = 100  # check-ins per upload
+OFFLINE_CHECKIN_CLOCK_SKEW = 5 * 60  # seconds a device's clock may be off
+
+# Delta sync (GET /api/sync/)
+SYNC_PAGE_SIZE = 500  # change log rows or snapshot objects per response
+SYNC_SNAPSHOT_DAYS = 30  # days of sessions and notifications in a snapshot
+SYNC_RETENTION_DAYS = 30  # change log rows (and cursors) older than this are dropped
+SYNC_SETTLE_SECONDS = 5  # seconds concurrent commits may take to log their changes out of order
+SYNC_PRUNE_INTERVAL = 60 * 60  # seconds between sweeps of the change log
+SYNC_PRUNE_CHUNK_SIZE = 1000
+
+# Home-screen dashboards (GET /api/dashboard/)
+DASHBOARD_SESSION_DAYS = 7  # days of past sessions listed
+DASHBOARD_SESSION_LIMIT = 20
+DASHBOARD_NOTIFICATION_LIMIT = 10
+
+# Admin changelists
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 100000  # rows before unfiltered counts come from table statistics
+ADMIN_ACTION_CHUNK_SIZE = 1000  # rows per UPDATE in bulk admin actions
+
+# Request metrics (GET /api/metrics/). Every worker of a server must share
+# METRICS_DIR; clear it when the server restarts.
+METRICS_DIR = config('METRICS_DIR', default=os.path.join(tempfile.gettempdir(), 'smartattend-metrics'))
+METRICS_FLUSH_INTERVAL = 1  # seconds between writes of a worker's metrics file
+
+# Request profiling: admins send X-Profile: trace (or sample); a fraction of
+# all requests can be sampled as well. Profiles are written to PROFILING_DIR.
+PROFILING_DIR = config('PROFILING_DIR', default=os.path.join(tempfile.gettempdir(), 'smartattend-profiles'))
+PROFILING_SAMPLE_RATE = config('PROFILING_SAMPLE_RATE', default=0.0, cast=float)
+PROFILING_SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+SLOW_QUERY_MS = config('SLOW_QUERY_MS', default=500, cast=float)  # logged to core.slow_queries
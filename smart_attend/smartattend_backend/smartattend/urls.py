@@ -20,8 +20,10 @@ from django.conf import settings
 from django.conf.urls.static import static
 from accounts.views import register_user, login_user, logout_user, user_profile, update_profile, get_students, get_teachers
 from classes.views import get_classes, create_class, get_class_detail, update_class, delete_class, enroll_students, get_teacher_classes, get_student_classes
-from attendance.views import get_attendance_sessions, create_attendance_session, get_session_detail, mark_attendance, generate_qr_code, scan_qr_code, get_class_attendance_summary, get_student_attendance
-from core.views import verify_location, save_facial_data, verify_facial_data, get_notifications, mark_notification_read, get_analytics, update_analytics
+from attendance.views import get_attendance_sessions, create_attendance_session, get_session_detail, mark_attendance, generate_qr_code, scan_qr_code, upload_offline_checkins, get_class_attendance_summary, get_student_attendance, get_attendance_trends
+from attendance import async_views as attendance_async
+from core import async_views as core_async
+from core.views import verify_location, save_facial_data, verify_facial_data, get_notifications, get_unread_count, mark_notification_read, mark_notifications_read, get_analytics, update_analytics, get_metrics, sync, dashboard
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -51,21 +53,35 @@ urlpatterns = [
     path('api/attendance/sessions/', get_attendance_sessions, name='get-sessions'),
     path('api/attendance/sessions/create/', create_attendance_session, name='create-session'),
     path('api/attendance/sessions/<int:session_id>/', get_session_detail, name='session-detail'),
+    path('api/attendance/sessions/<int:session_id>/stream/', attendance_async.session_stream, name='session-stream'),
     path('api/attendance/sessions/<int:session_id>/mark/', mark_attendance, name='mark-attendance'),
     path('api/attendance/sessions/<int:session_id>/qr/generate/', generate_qr_code, name='generate-qr'),
     path('api/attendance/qr/scan/', scan_qr_code, name='scan-qr'),
+    path('api/attendance/offline/', upload_offline_checkins, name='offline-checkins'),
     path('api/attendance/classes/<int:class_id>/summary/', get_class_attendance_summary, name='class-attendance-summary'),
     path('api/attendance/student/<int:student_id>/', get_student_attendance, name='student-attendance'),
     path('api/attendance/student/', get_student_attendance, name='my-attendance'),
+    path('api/attendance/trends/', get_attendance_trends, name='attendance-trends'),
     
     # Core functionality URLs
     path('api/location/verify/', verify_location, name='verify-location'),
     path('api/facial/save/', save_facial_data, name='save-facial-data'),
     path('api/facial/verify/', verify_facial_data, name='verify-facial-data'),
     path('api/notifications/', get_notifications, name='get-notifications'),
+    path('api/notifications/unread-count/', get_unread_count, name='unread-notification-count'),
+    path('api/notifications/read/', mark_notifications_read, name='mark-notifications-read'),
     path('api/notifications/<int:notification_id>/read/', mark_notification_read, name='mark-notification-read'),
     path('api/analytics/class/<int:class_id>/', get_analytics, name='get-analytics'),
     path('api/analytics/class/<int:class_id>/update/', update_analytics, name='update-analytics'),
+    path('api/metrics/', get_metrics, name='metrics'),
+    path('api/sync/', sync, name='sync'),
+    path('api/dashboard/', dashboard, name='dashboard'),
+    
+    # Async check-in URLs (served natively under ASGI)
+    path('api/async/attendance/sessions/<int:session_id>/mark/', attendance_async.mark_attendance, name='async-mark-attendance'),
+    path('api/async/attendance/qr/scan/', attendance_async.scan_qr_code, name='async-scan-qr'),
+    path('api/async/location/verify/', core_async.verify_location, name='async-verify-location'),
+    path('api/async/facial/verify/', core_async.verify_facial_data, name='async-verify-facial-data'),
 ]
 
 # Serve media files during development